@@ -1,11 +1,10 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import os
-import time
 from dotenv import load_dotenv
+from page_waits import wait_for
+from browser_session import RESERVE_URL, launch_chrome, quit_driver
+from site_login import login
 
 load_dotenv()
 EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
@@ -23,61 +22,21 @@ def analyze_reserve_flow():
     options.add_argument(f'--user-data-dir={user_data_dir}')
     options.add_argument('--profile-directory=Default')
 
-    driver = webdriver.Chrome(options=options)
+    driver = launch_chrome(options, user_data_dir)
 
     try:
         print("予約ページ解析を開始します...")
-        driver.get('https://reserve.fumotoppara.net/reserved/reserved-date-selection')
-        time.sleep(5)
+        driver.get(RESERVE_URL)
+        wait_for(driver, 'page_ready', raise_on_timeout=False)
 
         print(f"現在のURL: {driver.current_url}")
 
         # ログイン確認
         if "reserved-date-selection" not in driver.current_url:
-            print("ログインが必要です。ログイン処理を開始します...")
-            if "login" not in driver.current_url and driver.current_url != 'https://reserve.fumotoppara.net/':
-                 driver.get('https://reserve.fumotoppara.net/')
-                 time.sleep(3)
-            
-            wait = WebDriverWait(driver, 10)
-            inputs = driver.find_elements(By.TAG_NAME, 'input')
-            email_input = None
-            password_input = None
-            
-            for inp in inputs:
-                input_type = inp.get_attribute('type')
-                placeholder = inp.get_attribute('placeholder')
-                if input_type == 'text' or input_type == 'email':
-                    if placeholder and ('メール' in placeholder or 'mail' in placeholder.lower()):
-                        email_input = inp
-                    elif email_input is None and input_type != 'password':
-                        email_input = inp
-                if input_type == 'password':
-                    password_input = inp
-            
-            if email_input and password_input:
-                email_input.clear()
-                email_input.send_keys(EMAIL_ADDRESS)
-                password_input.clear()
-                password_input.send_keys(PASSWORD)
-                
-                buttons = driver.find_elements(By.TAG_NAME, 'button')
-                login_btn = None
-                for btn in buttons:
-                    if 'ログイン' in btn.text:
-                        login_btn = btn
-                        break
-                
-                if login_btn:
-                    login_btn.click()
-                    time.sleep(5)
-                    print("ログインしました。")
-                else:
-                    print("ログインボタンが見つかりません")
-                    return
-            else:
-                print("入力欄が見つかりません")
+            if not login(driver, EMAIL_ADDRESS, PASSWORD):
+                print("ログインできませんでした")
                 return
+            print("ログインしました。")
 
         # 3月のカレンダーを表示
         print("3月のカレンダーを表示...")
@@ -90,7 +49,7 @@ def analyze_reserve_flow():
         
         if target_month_btn:
             target_month_btn.click()
-            time.sleep(3)
+            wait_for(driver, 'calendar_month', 3)
             
             # 3/27のセルを探してクリック
             # ヘッダーから列を探す
@@ -133,7 +92,7 @@ def analyze_reserve_flow():
                             # セルの中の要素をクリックしてみる
                             target_cell.find_element(By.TAG_NAME, 'div').click()
                             
-                        time.sleep(3)
+                        wait_for(driver, 'popup_visible', raise_on_timeout=False)
                         
                         # 泊数選択などのポップアップが出るか確認
                         # スクリーンショットを撮る
@@ -155,7 +114,7 @@ def analyze_reserve_flow():
                                 if "予約" in btn.text and "進む" in btn.text or "予約する" in btn.text:
                                     print("予約ボタンを発見！クリックします...")
                                     btn.click()
-                                    time.sleep(5)
+                                    wait_for(driver, 'detail_form', raise_on_timeout=False)
                                     
                                     # 予約詳細ページに到達
                                     print("予約詳細ページに到達しました。情報を保存します。")
@@ -178,7 +137,7 @@ def analyze_reserve_flow():
         driver.save_screenshot('error_analyze.png')
     
     finally:
-        driver.quit()
+        quit_driver(driver)
 
 if __name__ == "__main__":
     analyze_reserve_flow()
@@ -0,0 +1,202 @@
+import requests
+from requests.adapters import HTTPAdapter
+import os
+import json
+import datetime
+
+from calendar_extractor import DEFAULT_PLAN, build_date_statuses
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ブラウザ（chrome_data）でログインした状態のCookieを書き出しておくファイル
+COOKIES_FILE = os.path.join(BASE_DIR, 'chrome_data', 'session_cookies.json')
+
+
+class AvailabilityApiError(Exception):
+    """
+    APIの応答が想定と違う・ログインが切れているなど、ブラウザでの取得に切り替えるべきエラー
+    """
+
+
+def export_cookies(driver, path=COOKIES_FILE):
+    """
+    ログイン済みブラウザのCookieをファイルに保存する（HTTPクライアントで使い回すため）
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(driver.get_cookies(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Cookieの保存に失敗しました: {e}")
+
+
+def load_cookies(path=COOKIES_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def format_remaining(remaining):
+    """
+    数値の残数をカレンダー表示と同じ文字列（〇/△ 残N/×）に変換する
+    """
+    if remaining is None:
+        return '×'
+    remaining = int(remaining)
+    if remaining <= 0:
+        return '×'
+    if remaining >= 999:
+        return '〇'
+    return f'△ 残{remaining}'
+
+
+def normalize_date(value, year):
+    """
+    "2026-03-27" / "2026/03/27" / "3/27" をすべて "2026-03-27" にそろえる
+    """
+    value = str(value).strip()
+    try:
+        return datetime.datetime.strptime(value[:10].replace('/', '-'), "%Y-%m-%d").strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    if '/' in value:
+        m, d = map(int, value.split('/')[:2])
+        return f"{year}-{m:02d}-{d:02d}"
+    raise AvailabilityApiError(f"日付の形式が不明です: {value}")
+
+
+def parse_availability(payload, year, month, plan=DEFAULT_PLAN):
+    """
+    APIの応答を {"2026-03-27": "△ 残2", ...} に変換する
+    対応している形:
+      ・カレンダー表と同じ {"headers": [...], "rows": [...]}
+      ・{"2026-03-27": "〇", ...}（"dates" / "data" の下にあってもよい）
+      ・[{"date": ..., "status": ... または "remaining": ..., "plan": ...}, ...]
+    どれにも当てはまらない場合は AvailabilityApiError
+    """
+    if isinstance(payload, dict):
+        if 'headers' in payload and 'rows' in payload:
+            return build_date_statuses(payload, year, month, plan)
+        for key in ('dates', 'data', 'items', 'calendar'):
+            if key in payload:
+                return parse_availability(payload[key], year, month, plan)
+        if payload and all(isinstance(v, (str, int)) for v in payload.values()):
+            return {normalize_date(k, year): v if isinstance(v, str) else format_remaining(v)
+                    for k, v in payload.items()}
+
+    if isinstance(payload, list):
+        statuses = {}
+        for item in payload:
+            if not isinstance(item, dict) or 'date' not in item:
+                raise AvailabilityApiError("日付を含まない要素があります")
+            item_plan = item.get('plan') or item.get('siteName') or item.get('site_name')
+            if item_plan and plan not in item_plan:
+                continue
+            if 'status' in item:
+                status = item['status']
+            elif 'remaining' in item:
+                status = format_remaining(item['remaining'])
+            else:
+                raise AvailabilityApiError("空き状況を含まない要素があります")
+            statuses[normalize_date(item['date'], year)] = status
+        return statuses
+
+    raise AvailabilityApiError("APIの応答形式が想定と異なります")
+
+
+class AvailabilityClient:
+    """
+    ブラウザを使わずに予約サイトのAPIから空き状況を取得するクライアント
+    requests.Session をサイクルをまたいで使い回すため、接続はKeep-Aliveで再利用される
+
+    api_config の例 (config.json の "availability_api"):
+      {
+        "url": "https://reserve.fumotoppara.net/api/...",
+        "params": {"year": "{year}", "month": "{month}"},
+        "headers": {}
+      }
+    """
+
+    def __init__(self, api_config, cookies_path=COOKIES_FILE, timeout=10):
+        if not api_config.get('url'):
+            raise AvailabilityApiError("availability_api.url が設定されていません")
+        self.url = api_config['url']
+        self.params = api_config.get('params', {})
+        self.plan = api_config.get('plan', DEFAULT_PLAN)
+        self.timeout = api_config.get('timeout', timeout)
+        self.cookies_path = cookies_path
+        self.cookies_mtime = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+        self.session.headers.update(api_config.get('headers', {}))
+
+    def refresh_cookies(self):
+        """
+        ブラウザ側でCookieが書き出し直されていれば読み込み直す
+        """
+        if not os.path.exists(self.cookies_path):
+            return
+        mtime = os.path.getmtime(self.cookies_path)
+        if mtime == self.cookies_mtime:
+            return
+        self.session.cookies.clear()
+        for cookie in load_cookies(self.cookies_path):
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        self.cookies_mtime = mtime
+
+    def fetch_month(self, year, month):
+        self.refresh_cookies()
+        params = {k: str(v).format(year=year, month=month) for k, v in self.params.items()}
+        url = self.url.format(year=year, month=month)
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout, allow_redirects=False)
+        except requests.RequestException as e:
+            raise AvailabilityApiError(f"APIへの接続に失敗しました: {e}")
+
+        if response.status_code in (301, 302, 303, 307, 308, 401, 403):
+            raise AvailabilityApiError(f"ログインが必要です (HTTP {response.status_code})")
+        if response.status_code != 200:
+            raise AvailabilityApiError(f"APIがエラーを返しました (HTTP {response.status_code})")
+        try:
+            payload = response.json()
+        except ValueError:
+            raise AvailabilityApiError("APIの応答がJSONではありません")
+        statuses = parse_availability(payload, year, month, self.plan)
+        if not statuses:
+            raise AvailabilityApiError(f"{year}年{month}月の空き状況が応答に含まれていません")
+        return statuses
+
+    def fetch_months(self, months):
+        all_statuses = {}
+        for year, month in months:
+            all_statuses.update(self.fetch_month(year, month))
+        return all_statuses
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_config = None
+
+
+def get_client(api_config):
+    """
+    設定が変わらない限り同じクライアント（＝同じ接続プール）を返す
+    """
+    global _client, _client_config
+    if _client is None or api_config != _client_config:
+        if _client:
+            _client.close()
+        _client = AvailabilityClient(api_config)
+        _client_config = api_config
+    return _client
@@ -0,0 +1,135 @@
+import datetime
+import glob
+import json
+import os
+
+from calendar_extractor import DEFAULT_PLAN
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_DIR = os.path.join(BASE_DIR, 'logs', 'events')
+
+
+def diff_snapshots(previous, current, plan=DEFAULT_PLAN):
+    """
+    前回と今回の {日付: ステータス} を比べて、変化した日付だけをイベントとして返す
+    今回取得していない日付（previous にだけある日付）は変化なしとして扱う
+    """
+    events = []
+    for date_str in sorted(current):
+        before = previous.get(date_str)
+        after = current[date_str]
+        if before != after:
+            events.append({'date': date_str, 'plan': plan, 'from': before, 'to': after})
+    return events
+
+
+def format_event(event):
+    """
+    "2026-03-27 × -> △ 残2" の形にする（キャンプ宿泊以外は先頭にプラン名を付ける）
+    """
+    before = event['from'] if event['from'] is not None else '(初回)'
+    plan = event.get('plan', DEFAULT_PLAN)
+    prefix = f"[{plan}] " if plan != DEFAULT_PLAN else ""
+    return f"{prefix}{event['date']} {before} -> {event['to']}"
+
+
+class EventLog:
+    """
+    空き状況の変化だけを追記していくログ（logs/events/YYYY-MM-DD.jsonl、1行1イベント）
+    変化のないチェックでは何も書かないので、チェック間隔を短くしてもログはほとんど増えない
+    """
+
+    def __init__(self, events_dir=EVENTS_DIR):
+        self.events_dir = events_dir
+
+    def path_for(self, day):
+        return os.path.join(self.events_dir, f"{day}.jsonl")
+
+    def append(self, events, observed_at=None):
+        if not events:
+            return
+        observed_at = observed_at or datetime.datetime.now()
+        ts = observed_at.strftime('%Y-%m-%dT%H:%M:%S')
+        os.makedirs(self.events_dir, exist_ok=True)
+        try:
+            with open(self.path_for(observed_at.strftime('%Y-%m-%d')), 'a', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(dict(event, ts=ts), ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"ログ保存エラー: {e}")
+
+    def files(self):
+        return sorted(glob.glob(os.path.join(self.events_dir, '*.jsonl')))
+
+    def iter_events(self, since=None, until=None):
+        """
+        since <= ts <= until のイベントを古い順に返す（ts は "YYYY-MM-DDTHH:MM:SS" の文字列）
+        """
+        for path in self.files():
+            day = os.path.basename(path)[:10]
+            if since and day < since[:10]:
+                continue
+            if until and day > until[:10]:
+                break
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if since and event['ts'] < since:
+                        continue
+                    if until and event['ts'] > until:
+                        return
+                    yield event
+
+    def tail(self, n=50):
+        """
+        最新のファイル（通常は今日の分）の末尾 n 件を新しい順に返す
+        ファイルを後ろからブロック単位で読むので、ファイルが大きくても先頭までは読まない
+        """
+        files = self.files()
+        if not files:
+            return []
+        with open(files[-1], 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= n:
+                read_size = min(8192, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+        lines = [line for line in data.split(b'\n') if line.strip()]
+        if position > 0:
+            # 途中から読んだ先頭の行は欠けている可能性がある
+            lines = lines[1:]
+        return [json.loads(line.decode('utf-8')) for line in reversed(lines[-n:])]
+
+    def state_at(self, when=None, plan=DEFAULT_PLAN):
+        """
+        指定した時刻（省略時は現在）の {日付: ステータス} をイベントを先頭から適用して組み立てる
+        """
+        until = when.strftime('%Y-%m-%dT%H:%M:%S') if isinstance(when, datetime.datetime) else when
+        state = {}
+        for event in self.iter_events(until=until):
+            if event.get('plan', DEFAULT_PLAN) == plan:
+                state[event['date']] = event['to']
+        return state
+
+    def plan_states_at(self, when=None, base=None, since=None, target_from=None):
+        """
+        state_at の全プラン版 {プラン: {日付: ステータス}}
+        base（since の時点のスナップショット）を渡すと、先頭からではなく since 以降のイベントだけを重ねる
+        target_from を渡すと、その日より前の日付（過ぎた日付）は含めない
+        """
+        until = when.strftime('%Y-%m-%dT%H:%M:%S') if isinstance(when, datetime.datetime) else when
+        since = since.strftime('%Y-%m-%dT%H:%M:%S') if isinstance(since, datetime.datetime) else since
+        states = {plan: dict(statuses) for plan, statuses in (base or {}).items()}
+        for event in self.iter_events(since=since, until=until):
+            states.setdefault(event.get('plan', DEFAULT_PLAN), {})[event['date']] = event['to']
+        if target_from:
+            for statuses in states.values():
+                for date_str in [d for d in statuses if d < target_from]:
+                    del statuses[date_str]
+        return {plan: statuses for plan, statuses in states.items() if statuses}
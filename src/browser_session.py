@@ -0,0 +1,269 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+import os
+import time
+import threading
+
+from page_waits import wait_for
+from metrics import span
+from browser_watchdog import reap_orphans
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 予約サイトのURL（tests/mock_reserve_site.py の模擬サイトに向けるときは環境変数 RESERVE_BASE_URL で変更する）
+RESERVE_BASE_URL = os.getenv('RESERVE_BASE_URL', 'https://reserve.fumotoppara.net').rstrip('/')
+RESERVE_URL = f'{RESERVE_BASE_URL}/reserved/reserved-date-selection'
+
+
+# 軽量モードで読み込まないURL（DevTools の Network.setBlockedURLs の形式）
+# 空き状況の読み取りと予約の操作に必要なのはHTML・JS・CSSだけなので、画像・フォント・動画と外部の計測用スクリプトは止める
+LEAN_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3',
+    '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*',
+]
+
+# 軽量モードのディスクキャッシュの上限（バイト）
+LEAN_DISK_CACHE_SIZE = 32 * 1024 * 1024
+
+
+def build_chrome_options(user_data_dir=None, lean=False):
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--lang=ja-JP')
+
+    if lean:
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-background-networking')
+        options.add_argument('--disable-component-update')
+        options.add_argument('--disable-default-apps')
+        options.add_argument('--disable-remote-fonts')
+        options.add_argument('--mute-audio')
+        options.add_argument(f'--disk-cache-size={LEAN_DISK_CACHE_SIZE}')
+        options.add_argument('--blink-settings=imagesEnabled=false')
+
+    if user_data_dir is None:
+        user_data_dir = os.path.join(BASE_DIR, 'chrome_data')
+    options.add_argument(f'--user-data-dir={user_data_dir}')
+    options.add_argument('--profile-directory=Default')
+    return options
+
+
+def block_resources(driver, urls=LEAN_BLOCKED_URLS):
+    """
+    表示中のタブで、urls に当てはまるリクエストを送らないようにする（タブごとに設定が必要）
+    """
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(urls)})
+        return True
+    except (WebDriverException, AttributeError) as e:
+        # Chrome 以外のドライバーなど DevTools が使えない場合はそのまま読み込む
+        print(f"不要なリソースのブロックを設定できませんでした: {e}")
+        return False
+
+
+def launch_chrome(options, user_data_dir):
+    """
+    プロファイルに取り残された Chrome を片付けてから起動する
+    起動の途中で失敗したときも、できかけのプロセスを残さない
+    """
+    reap_orphans(user_data_dir)
+    try:
+        return webdriver.Chrome(options=options)
+    except Exception:
+        reap_orphans(user_data_dir)
+        raise
+
+
+def quit_driver(driver):
+    """
+    ブラウザを終了する（終了できなければ chromedriver を強制終了し、残った Chrome は次回の起動時に片付ける）
+    """
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"ブラウザの終了に失敗しました。プロセスを強制終了します: {e}")
+        try:
+            driver.service.process.kill()
+        except Exception:
+            pass
+
+
+class BrowserSession:
+    """
+    監視サイクルをまたいで使い回す常駐ブラウザセッション
+    ・ドライバーが落ちている／応答しない場合は自動で再起動する
+    ・読み込み済みのカレンダーページはそのまま再利用する
+    ・lean=True（軽量モード）では画像・フォント・外部スクリプトを読み込まず、GPUと拡張機能を止める
+      カレンダーが表示されなかったときは fall_back_to_full() で通常のブラウザに戻す
+    """
+
+    def __init__(self, user_data_dir=None, probe_timeout=15, page_load_timeout=60, max_page_age=1800, lean=False):
+        self.user_data_dir = user_data_dir or os.path.join(BASE_DIR, 'chrome_data')
+        # 設定で指定された軽量モードと、実際に使っているモード（うまく表示できなかった場合は通常に戻す）
+        self.lean_requested = lean
+        self.lean = lean
+        self.probe_timeout = probe_timeout
+        self.page_load_timeout = page_load_timeout
+        # これ以上古いページは念のため再読み込みする（秒）
+        self.max_page_age = max_page_age
+
+        self.driver = None
+        self.main_handle = None
+        self.started_at = None
+        self.page_loaded_at = None
+        # 直前の ensure_calendar_page が読み込み済みのページを使い回したか
+        self.page_reused = False
+        self.restart_count = 0
+        # 今のブラウザをチェック（カレンダーの取得）に使った回数（browser_watchdog が作り直す目安にする）
+        # 合間のログイン状態の更新は数えない
+        self.checks = 0
+
+        # ログイン状態（site_login が更新する）: ログインした時刻・ログイン中と確認できた時刻・Cookieの期限
+        self.logged_in_at = None
+        self.verified_at = None
+        self.session_expires_at = None
+
+    def start(self):
+        options = build_chrome_options(self.user_data_dir, lean=self.lean)
+        with span('chrome_launch'):
+            self.driver = launch_chrome(options, self.user_data_dir)
+            self.configure_tab(self.driver)
+        self.driver.set_page_load_timeout(self.page_load_timeout)
+        self.driver.set_script_timeout(self.probe_timeout)
+        self.started_at = time.time()
+        self.page_loaded_at = None
+        self.verified_at = None
+        self.checks = 0
+        # カレンダーのチェックに使うタブ（自動予約用のタブとは別）
+        self.main_handle = self.driver.current_window_handle
+        return self.driver
+
+    def quit(self):
+        driver = self.driver
+        self.driver = None
+        self.page_loaded_at = None
+        if driver:
+            quit_driver(driver)
+
+    def driver_pid(self):
+        """
+        chromedriver のPID（Chrome 本体はその子プロセス）。起動していなければ None
+        """
+        try:
+            return self.driver.service.process.pid
+        except AttributeError:
+            return None
+
+    def configure_tab(self, driver):
+        """
+        新しく開いたタブにも軽量モードの設定をする
+        """
+        if self.lean:
+            block_resources(driver)
+
+    def set_lean(self, lean):
+        """
+        設定で軽量モードが切り替えられたら、次に使うときに切り替えたモードで起動し直す
+        """
+        if lean == self.lean_requested:
+            return
+        self.lean_requested = lean
+        self.lean = lean
+        self.quit()
+
+    def fall_back_to_full(self, reason):
+        """
+        軽量モードでカレンダーが表示されなかった場合に、通常のブラウザで起動し直す
+        （以後はこのセッションを閉じるまで通常のまま使う）。切り替えたら True
+        """
+        if not self.lean:
+            return False
+        print(f"軽量モードでは{reason}。通常のブラウザに切り替えます")
+        self.lean = False
+        self.restart()
+        return True
+
+    def restart(self):
+        print("ブラウザを再起動します...")
+        self.quit()
+        self.restart_count += 1
+        return self.start()
+
+    def is_alive(self):
+        """
+        ドライバーが生きていて応答するかを確認する
+        WebDriverの呼び出しがハングしても監視ループが止まらないよう、別スレッドでタイムアウト付きで確認する
+        """
+        if self.driver is None:
+            return False
+
+        result = {}
+
+        def probe():
+            try:
+                result['state'] = self.driver.execute_script('return document.readyState')
+            except Exception as e:
+                result['error'] = e
+
+        t = threading.Thread(target=probe, daemon=True)
+        t.start()
+        t.join(self.probe_timeout)
+
+        if t.is_alive():
+            print(f"ブラウザが{self.probe_timeout}秒以上応答しません（ハングを検出）")
+            return False
+        if 'error' in result:
+            print(f"ブラウザとの接続が切れています: {result['error']}")
+            return False
+        return True
+
+    def get_driver(self):
+        if self.driver is None:
+            return self.start()
+        if not self.is_alive():
+            return self.restart()
+        return self.driver
+
+    def reset_page(self):
+        """
+        次回のチェックでカレンダーページを読み込み直させる（エラー後など）
+        """
+        self.page_loaded_at = None
+
+    def ensure_calendar_page(self):
+        """
+        カレンダーページが表示された状態のドライバーを返す
+        既に読み込み済みで新しければ再読み込みしない
+        """
+        driver = self.get_driver()
+        if driver.current_window_handle != self.main_handle:
+            driver.switch_to.window(self.main_handle)
+
+        if self.page_loaded_at is not None and time.time() - self.page_loaded_at < self.max_page_age:
+            try:
+                if "reserved-date-selection" in driver.current_url:
+                    self.page_reused = True
+                    return driver
+            except WebDriverException:
+                driver = self.restart()
+
+        self.page_reused = False
+        with span('page_load'):
+            driver.get(RESERVE_URL)
+            ready = wait_for(driver, 'page_ready', raise_on_timeout=False)
+        if not ready and self.fall_back_to_full("ページが表示されませんでした"):
+            driver = self.driver
+            with span('page_load'):
+                driver.get(RESERVE_URL)
+                wait_for(driver, 'page_ready', raise_on_timeout=False)
+        self.page_loaded_at = time.time()
+        return driver
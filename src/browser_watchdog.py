@@ -0,0 +1,277 @@
+import glob
+import os
+import signal
+import socket
+import time
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROC_DIR = '/proc'
+
+# config.json の browser_max_checks / browser_max_memory_mb を省略したときの値（0 ならその条件では作り直さない）
+DEFAULT_MAX_CHECKS = 300
+DEFAULT_MAX_MEMORY_MB = 1024
+
+# 終了を頼んでから強制終了するまでの秒数
+TERMINATE_TIMEOUT = 3.0
+
+# Chrome がプロファイルに作るロック（SingletonLock は "ホスト名-PID" を指すシンボリックリンク）
+SINGLETON_FILES = ('SingletonLock', 'SingletonSocket', 'SingletonCookie')
+
+# 親がこれらのプロセスになっていれば、起動したプログラムはもういない（孤児として引き取られた）
+INIT_NAMES = ('init', 'systemd', 'tini', 'dumb-init', 'docker-init')
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def read_processes(proc_dir=PROC_DIR):
+    """
+    動いているプロセスの {PID: (親のPID, プロセス名)}（/proc がなければ空）
+    """
+    processes = {}
+    for path in glob.glob(os.path.join(proc_dir, '[0-9]*', 'stat')):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                data = f.read()
+        except OSError:
+            continue
+        # プロセス名は括弧の中にあり、空白や括弧を含むことがあるので最後の ")" で区切る
+        head, _, rest = data.rpartition(')')
+        pid_text, _, name = head.partition(' (')
+        fields = rest.split()
+        if len(fields) < 2 or fields[0] == 'Z':
+            continue
+        processes[int(pid_text)] = (int(fields[1]), name)
+    return processes
+
+
+def descendants(pid, processes):
+    """
+    pid の子孫の PID を親から順に返す
+    """
+    children = {}
+    for child, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(child)
+    result = []
+    queue = list(children.get(pid, []))
+    while queue:
+        child = queue.pop(0)
+        result.append(child)
+        queue.extend(children.get(child, []))
+    return result
+
+
+def rss_bytes(pid, proc_dir=PROC_DIR):
+    """
+    プロセスの常駐メモリ（RSS）。読めなければ 0
+    """
+    try:
+        with open(os.path.join(proc_dir, str(pid), 'statm'), 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def read_cmdline(pid, proc_dir=PROC_DIR):
+    try:
+        with open(os.path.join(proc_dir, str(pid), 'cmdline'), 'rb') as f:
+            return [arg.decode('utf-8', 'replace') for arg in f.read().split(b'\0') if arg]
+    except OSError:
+        return []
+
+
+def tree_usage(pid, processes=None, proc_dir=PROC_DIR):
+    """
+    chromedriver（pid）とその子孫（Chrome 本体・レンダラーなど）のプロセス数と RSS の合計
+    RSS は共有メモリを重複して数えるので実際より多めになる（メモリ不足を避ける目安としては安全側）
+    """
+    if processes is None:
+        processes = read_processes(proc_dir)
+    if pid not in processes:
+        return None
+    pids = [pid] + descendants(pid, processes)
+    return {'pid': pid, 'processes': len(pids), 'rss': sum(rss_bytes(p, proc_dir) for p in pids)}
+
+
+def read_singleton_lock(user_data_dir):
+    """
+    プロファイルの SingletonLock が指す (ホスト名, PID)。ロックがなければ None
+    """
+    try:
+        target = os.readlink(os.path.join(user_data_dir, 'SingletonLock'))
+    except OSError:
+        return None
+    host, _, pid_text = target.rpartition('-')
+    try:
+        return host, int(pid_text)
+    except ValueError:
+        return None
+
+
+def is_chrome_process(name):
+    return 'chrom' in name.lower()
+
+
+def find_owner(pid, processes):
+    """
+    Chrome / chromedriver をさかのぼって、それらを起動したプロセスを返す -> (いちばん上の Chrome 系のPID, 起動したプロセスのPID)
+    """
+    top = pid
+    parent = processes.get(pid, (0, ''))[0]
+    while parent in processes and is_chrome_process(processes[parent][1]):
+        top = parent
+        parent = processes[parent][0]
+    return top, parent
+
+
+def is_orphan(pid, processes):
+    """
+    Chrome を起動したプログラム（監視プログラムや単発のスクリプト）が終了していて、誰にも使われていないか
+    """
+    _, owner = find_owner(pid, processes)
+    return owner <= 1 or owner not in processes or processes[owner][1] in INIT_NAMES
+
+
+def profile_pids(user_data_dir, processes, proc_dir=PROC_DIR):
+    """
+    プロファイル user_data_dir を使っている Chrome のPID（ロックの持ち主とコマンドラインに指定のあるもの）
+    """
+    user_data_dir = os.path.abspath(user_data_dir)
+    pids = set()
+    lock = read_singleton_lock(user_data_dir)
+    # PIDが別のプロセスに使い回されていることもあるので、Chrome のプロセスのときだけ
+    if lock and lock[0] == socket.gethostname() and is_chrome_process(processes.get(lock[1], (0, ''))[1]):
+        pids.add(lock[1])
+    flag = f'--user-data-dir={user_data_dir}'
+    for pid, (_, name) in processes.items():
+        if is_chrome_process(name) and any(arg.rstrip('/') == flag for arg in read_cmdline(pid, proc_dir)):
+            pids.add(pid)
+    return pids
+
+
+def terminate(pids, timeout=TERMINATE_TIMEOUT):
+    """
+    SIGTERM で終了を頼み、timeout 秒たっても残っていれば SIGKILL で終了させる
+    """
+    remaining = set(pids)
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        for pid in list(remaining):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                remaining.discard(pid)
+            except PermissionError:
+                remaining.discard(pid)
+        deadline = time.time() + timeout
+        while remaining and time.time() < deadline:
+            time.sleep(0.05)
+            remaining = {pid for pid in remaining if os.path.exists(os.path.join(PROC_DIR, str(pid)))}
+        if not remaining:
+            break
+    return remaining
+
+
+def reap_orphans(user_data_dir, proc_dir=PROC_DIR):
+    """
+    プロファイルを使ったまま取り残された Chrome / chromedriver を終了させ、残ったロックを消す
+    （webdriver.Chrome() が起動の途中で失敗したときや、スクリプトが quit() の前に落ちたときに残る）
+    終了させたプロセスの数を返す
+    """
+    processes = read_processes(proc_dir)
+    targets = set()
+    for pid in profile_pids(user_data_dir, processes, proc_dir):
+        if is_orphan(pid, processes):
+            top, _ = find_owner(pid, processes)
+            targets.add(top)
+            targets.update(descendants(top, processes))
+    if targets:
+        print(f"取り残されたブラウザのプロセスを終了します（{os.path.basename(user_data_dir)}: {len(targets)}個）")
+        terminate(targets)
+
+    lock = read_singleton_lock(user_data_dir)
+    if lock:
+        host, pid = lock
+        # 別のホスト名のロック（コンテナを作り直した場合など）と、持ち主の Chrome がいないロックは消す
+        if host != socket.gethostname() or not is_chrome_process(read_processes(proc_dir).get(pid, (0, ''))[1]):
+            for name in SINGLETON_FILES:
+                try:
+                    os.remove(os.path.join(user_data_dir, name))
+                except OSError:
+                    pass
+    return len(targets)
+
+
+def profile_dirs(base_dir=BASE_DIR):
+    """
+    このプロジェクトの Chrome のプロファイル（chrome_data・アカウントごとの chrome_data_*・並列取得用の各ワーカー）
+    """
+    dirs = sorted(glob.glob(os.path.join(base_dir, 'chrome_data')) + glob.glob(os.path.join(base_dir, 'chrome_data_*')))
+    workers = [path for path in dirs if os.path.basename(path) == 'chrome_data_workers']
+    for path in workers:
+        dirs.remove(path)
+        dirs.extend(sorted(glob.glob(os.path.join(path, '*'))))
+    return [path for path in dirs if os.path.isdir(path)]
+
+
+class BrowserWatchdog:
+    """
+    常駐ブラウザのプロセスとメモリを見張り、長く使って膨らんだブラウザを作り直す
+    ・ブラウザごとに chromedriver とその子孫のプロセス数・RSS を測る
+    ・max_checks 回チェックに使ったか、RSS が max_memory_mb を超えたら起動し直す
+    チェックの途中でブラウザを落とさないよう、監視ループのチェックの合間に呼び出す
+    """
+
+    def __init__(self, max_checks=DEFAULT_MAX_CHECKS, max_memory_mb=DEFAULT_MAX_MEMORY_MB, proc_dir=PROC_DIR):
+        self.max_checks = max_checks
+        self.max_memory_mb = max_memory_mb
+        self.proc_dir = proc_dir
+        self.recycle_count = 0
+
+    def configure_from(self, config):
+        self.max_checks = config.get('browser_max_checks', DEFAULT_MAX_CHECKS)
+        self.max_memory_mb = config.get('browser_max_memory_mb', DEFAULT_MAX_MEMORY_MB)
+
+    def measure(self, sessions):
+        """
+        {名前: BrowserSession} の使用状況 {名前: {'pid', 'processes', 'rss', 'checks'}}（起動していないブラウザは含めない）
+        """
+        processes = read_processes(self.proc_dir)
+        usage = {}
+        for name, session in sessions.items():
+            pid = session.driver_pid()
+            if pid is None:
+                continue
+            result = tree_usage(pid, processes, self.proc_dir) or {'pid': pid, 'processes': 0, 'rss': 0}
+            result['checks'] = session.checks
+            usage[name] = result
+        return usage
+
+    def recycle_reason(self, usage):
+        if self.max_memory_mb and usage['rss'] > self.max_memory_mb * 1024 * 1024:
+            return f"メモリが{usage['rss'] // (1024 * 1024)}MBになりました"
+        if self.max_checks and usage['checks'] >= self.max_checks:
+            return f"{usage['checks']}回のチェックに使いました"
+        return None
+
+    def supervise(self, sessions):
+        """
+        sessions（{名前: BrowserSession}）を測り、条件を超えたブラウザを起動し直す。使用状況を返す
+        """
+        usage = self.measure(sessions)
+        for name, result in usage.items():
+            reason = self.recycle_reason(result)
+            if reason:
+                print(f"ブラウザ（{name}）を作り直します: {reason}")
+                session = sessions[name]
+                try:
+                    session.restart()
+                except Exception as e:
+                    # 起動できなくても監視は止めない（次のチェックの get_driver() で起動し直す）
+                    print(f"ブラウザ（{name}）の起動に失敗しました: {e}")
+                    session.reset_page()
+                    session.quit()
+                self.recycle_count += 1
+        return usage
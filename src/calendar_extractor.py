@@ -0,0 +1,194 @@
+# カレンダー表の読み取りを1回の execute_script で行う
+# ヘッダーの日付と各プラン行（キャンプ宿泊など）のセルをまとめてJSONで受け取るので、月ごとの通信は1往復で済む
+
+from selenium.webdriver.common.by import By
+
+DEFAULT_PLAN = 'キャンプ宿泊'
+
+# ヘッダー行の列番号とデータ行のセル番号のずれ（左上の角セルの分）
+INDEX_OFFSET = -1
+
+EXTRACT_CALENDAR_JS = """
+var table = document.querySelector('table.calendar-table') || document.querySelector('table');
+if (!table) { return null; }
+var norm = function (el) {
+    return (el.innerText || el.textContent || '').replace(/\\s+/g, ' ').trim();
+};
+var trs = table.querySelectorAll('tr');
+if (!trs.length) { return null; }
+var headerCells = trs[0].querySelectorAll('th');
+if (!headerCells.length) { headerCells = trs[0].querySelectorAll('td'); }
+var headers = [];
+for (var i = 0; i < headerCells.length; i++) { headers.push(norm(headerCells[i])); }
+var rows = [];
+for (var r = 1; r < trs.length; r++) {
+    var th = trs[r].querySelector('th');
+    var tds = trs[r].querySelectorAll('td');
+    var cells = [];
+    for (var c = 0; c < tds.length; c++) { cells.push(norm(tds[c])); }
+    rows.push({label: th ? norm(th) : norm(trs[r]), row_index: r, cells: cells});
+}
+return {headers: headers, rows: rows};
+"""
+
+# 月ボタンを押す前に呼び、その後にページが書き換わったら window.__calendarRedrawn を true にする
+# 同じ月を表示したままのタブでは月の表示だけでは描画し直されたか分からないので、表やローディング表示の変化を見る
+# （押したボタン自体の見た目の変化は数えない）
+WATCH_REDRAW_JS = """
+if (window.__calendarObserver) { window.__calendarObserver.disconnect(); }
+window.__calendarRedrawn = false;
+var observer = new MutationObserver(function (mutations) {
+    for (var i = 0; i < mutations.length; i++) {
+        var target = mutations[i].target;
+        var el = target.nodeType === 1 ? target : target.parentNode;
+        if (el && el.closest && el.closest('button')) { continue; }
+        window.__calendarRedrawn = true;
+        observer.disconnect();
+        return;
+    }
+});
+observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true});
+window.__calendarObserver = observer;
+"""
+
+# 行番号・セル番号からクリック対象の要素を返す [セル内のdiv, セル自体]
+FIND_CELL_JS = """
+var table = document.querySelector('table.calendar-table') || document.querySelector('table');
+var tr = table.querySelectorAll('tr')[arguments[0]];
+var td = tr.querySelectorAll('td')[arguments[1]];
+return [td.querySelector('div'), td];
+"""
+
+
+def extract_calendar(driver):
+    """
+    表示中のカレンダーを {'headers': [...], 'rows': [{'label', 'row_index', 'cells'}]} として取得する
+    表が見つからない場合は None
+    """
+    return driver.execute_script(EXTRACT_CALENDAR_JS)
+
+
+def parse_header_dates(headers):
+    """
+    ヘッダーの文字列（例: "3/27 金"）から {"3/27": 列番号} を作る
+    """
+    date_col_indices = {}
+    for i, text in enumerate(headers):
+        parts = text.strip().split(' ')
+        if parts and '/' in parts[0]:
+            date_col_indices[parts[0]] = i
+    return date_col_indices
+
+
+def find_plan_row(grid, plan=DEFAULT_PLAN):
+    for row in grid['rows']:
+        if plan in row['label']:
+            return row
+    return None
+
+
+def build_date_statuses(grid, year, month, plan=DEFAULT_PLAN):
+    """
+    カレンダーの内容を {"2026-03-27": "△ 残2", ...} の形に変換する
+    year, month は表示中の（クリックした）月。表示範囲が年をまたぐ場合は翌年として扱う
+    """
+    if not grid:
+        return {}
+
+    row = find_plan_row(grid, plan)
+    if not row:
+        return {}
+    return row_statuses(parse_header_dates(grid['headers']), row['cells'], year, month)
+
+
+def row_statuses(columns, cells, year, month):
+    """
+    1行分のセルを、ヘッダーの日付の列 {"3/27": 列番号} に合わせて {日付: ステータス} にする
+    """
+    statuses = {}
+    for date_md, header_index in columns.items():
+        data_index = header_index + INDEX_OFFSET
+        if 0 <= data_index < len(cells):
+            m, d = map(int, date_md.split('/'))
+            y = year + 1 if m < month else year
+            statuses[f"{y}-{m:02d}-{d:02d}"] = cells[data_index]
+    return statuses
+
+
+def build_plan_statuses(grid, year, month):
+    """
+    表のすべての行（プラン）について {プラン名: {"2026-03-27": "△ 残2", ...}} を作る
+    1回の表示で全プランの空き状況が分かるので、日帰りと宿泊を別々に読み込まなくてよい
+    """
+    plans = {}
+    if not grid:
+        return plans
+    columns = parse_header_dates(grid['headers'])
+    for row in grid['rows']:
+        if row['label']:
+            plans[row['label']] = row_statuses(columns, row['cells'], year, month)
+    return plans
+
+
+def merge_plan_statuses(target, source):
+    """
+    プランごとの空き状況 source を target に書き足す（同じプランの日付はまとめる）
+    """
+    for plan, statuses in source.items():
+        target.setdefault(plan, {}).update(statuses)
+    return target
+
+
+def locate_cell(grid, target_date, plan=DEFAULT_PLAN):
+    """
+    指定日のセルの位置 (行番号, セル番号) を返す。見つからない場合は例外
+    """
+    search_date_text = f"{target_date.month}/{target_date.day}"
+    header_index = parse_header_dates(grid['headers']).get(search_date_text)
+    if header_index is None:
+        raise Exception(f"日付 {search_date_text} がカレンダーに見つかりません")
+
+    row = find_plan_row(grid, plan)
+    if not row:
+        raise Exception(f"「{plan}」の行が見つかりません")
+
+    cell_index = header_index + INDEX_OFFSET
+    if not (0 <= cell_index < len(row['cells'])):
+        raise Exception("クリック対象のセルインデックスが不正です")
+    return row['row_index'], cell_index
+
+
+def click_cell(driver, row_index, cell_index):
+    inner, cell = driver.execute_script(FIND_CELL_JS, row_index, cell_index)
+    # クリック（div要素をクリックするのが確実かも）
+    try:
+        inner.click()
+    except Exception:
+        cell.click()
+
+
+def watch_calendar_redraw(driver):
+    """
+    これ以降にカレンダーが描画し直されたかを記録し始める（page_waits の calendar_redrawn で待つ）
+    """
+    driver.execute_script(WATCH_REDRAW_JS)
+
+
+def click_month_button(driver, month):
+    """
+    「3月」などの月ボタンをクリックする。見つからなければ False
+    """
+    buttons = driver.find_elements(By.TAG_NAME, 'button')
+    target_month_btn = None
+    for btn in buttons:
+        text = btn.text.strip()
+        # "1月" が "11月" に一致しないよう、完全一致を優先する
+        if text == f'{month}月':
+            target_month_btn = btn
+            break
+        if target_month_btn is None and f'{month}月' in text:
+            target_month_btn = btn
+    if not target_month_btn:
+        return False
+    target_month_btn.click()
+    return True
@@ -0,0 +1,125 @@
+# ブラウザを使わずに、保存したページ（driver.page_source や web/ のHTML）からカレンダー表を読み取る
+# calendar_extractor の EXTRACT_CALENDAR_JS と同じ形 {'headers': [...], 'rows': [...]} を返すので、
+# build_date_statuses などの解釈はブラウザで読み取った場合とそのまま共通にできる
+
+import re
+from html.parser import HTMLParser
+
+from calendar_extractor import DEFAULT_PLAN, build_date_statuses
+
+# カレンダー表の開始タグ（class に calendar-table を含む table）。なければ最初の table を使う
+_CALENDAR_TABLE_RE = re.compile(r'<table\b[^>]*\bclass="[^"]*\bcalendar-table\b', re.IGNORECASE)
+_TABLE_RE = re.compile(r'<table\b', re.IGNORECASE)
+
+_REMAINING_RE = re.compile(r'残(\d+)')
+
+
+class _TableEnd(Exception):
+    """
+    表の終わりまで読んだら、残りのHTMLは解析せずに打ち切る
+    """
+
+
+class CalendarTableParser(HTMLParser):
+    """
+    最初の table の中だけを読み、行ごとのヘッダーセル（th）とデータセル（td）の文字列を集める
+    文字列は innerText と同じく空白・改行を1つの空白にまとめる
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.rows = []
+        self.row = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self.depth += 1
+            return
+        if self.depth != 1:
+            return
+        if tag == 'tr':
+            self.row = {'th': [], 'td': [], 'text': []}
+            self.rows.append(self.row)
+        elif tag in ('th', 'td') and self.row is not None:
+            self.cell = []
+            self.row[tag].append(self.cell)
+        elif tag in ('br', 'p') and self.cell is not None:
+            self.cell.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag == 'table':
+            self.depth -= 1
+            if self.depth == 0:
+                raise _TableEnd()
+        elif self.depth == 1 and tag in ('th', 'td'):
+            self.cell = None
+        elif self.depth == 1 and tag == 'tr':
+            self.row = None
+
+    def handle_data(self, data):
+        if self.depth != 1 or self.row is None:
+            return
+        self.row['text'].append(data)
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+def normalize_text(parts):
+    return ' '.join(''.join(parts).split())
+
+
+def find_table_start(html):
+    match = _CALENDAR_TABLE_RE.search(html) or _TABLE_RE.search(html)
+    return match.start() if match else None
+
+
+def parse_calendar(html):
+    """
+    ページのHTMLからカレンダー表を {'headers': [...], 'rows': [{'label', 'row_index', 'cells'}]} として読み取る
+    表が見つからない場合は None（extract_calendar と同じ）
+    """
+    start = find_table_start(html)
+    if start is None:
+        return None
+    parser = CalendarTableParser()
+    try:
+        parser.feed(html[start:])
+        parser.close()
+    except _TableEnd:
+        pass
+    if not parser.rows:
+        return None
+
+    header = parser.rows[0]
+    header_cells = header['th'] or header['td']
+    rows = []
+    for row_index, row in enumerate(parser.rows[1:], start=1):
+        label = normalize_text(row['th'][0]) if row['th'] else normalize_text(row['text'])
+        rows.append({'label': label, 'row_index': row_index, 'cells': [normalize_text(cell) for cell in row['td']]})
+    return {'headers': [normalize_text(cell) for cell in header_cells], 'rows': rows}
+
+
+def parse_status(status_text):
+    """
+    セルの文字列を (記号, 残数) にする（〇は999、残数の書かれていない△は1、それ以外は ('×', 0)）
+    """
+    status_text = status_text.replace('\n', ' ').strip()
+    if '〇' in status_text:
+        return '〇', 999
+    elif '△' in status_text:
+        match = _REMAINING_RE.search(status_text)
+        if match:
+            return '△', int(match.group(1))
+        else:
+            return '△', 1
+    else:
+        return '×', 0
+
+
+def parse_page(html, year, month, plan=DEFAULT_PLAN):
+    """
+    ページのHTMLから指定プランの {日付: ステータス} を作る（year, month は表示中の月）
+    """
+    return build_date_statuses(parse_calendar(html), year, month, plan)
@@ -1,12 +1,14 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import os
-import time
 import requests
+import json
+import datetime
 from dotenv import load_dotenv
+from page_waits import wait_for
+from browser_session import RESERVE_URL, launch_chrome, quit_driver
+from site_login import login
+from availability_client import get_client, AvailabilityApiError
 
 # .envファイルから情報を読み込む
 load_dotenv()
@@ -37,7 +39,45 @@ def send_line_message(message):
     except Exception as e:
         print(f"LINE通知の送信に失敗しました: {e}")
 
+def check_calendar_via_api():
+    """
+    ブラウザを使わずHTTPで3月の空きを確認する
+    APIが設定されていない・使えない場合は None を返す（ブラウザでの確認に切り替える）
+    """
+    config_path = os.path.join(os.getcwd(), 'config', 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            api_config = json.load(f).get('availability_api')
+    except Exception:
+        return None
+    if not api_config:
+        return None
+
+    today = datetime.date.today()
+    year = today.year if today.month <= 3 else today.year + 1
+    try:
+        statuses = get_client(api_config).fetch_month(year, 3)
+    except AvailabilityApiError as e:
+        print(f"HTTPでの取得に失敗したため、ブラウザで確認します: {e}")
+        return None
+
+    available_dates = []
+    for date_str, status in sorted(statuses.items()):
+        m, d = int(date_str[5:7]), int(date_str[8:10])
+        if m == 3 and ('〇' in status or '△' in status):
+            available_dates.append(f"{m}/{d} ({status})")
+    return available_dates
+
 def check_calendar():
+    available_dates = check_calendar_via_api()
+    if available_dates is not None:
+        if available_dates:
+            message = "【ふもとっぱら空き通知】\n3月の以下の日程で「キャンプ宿泊」に空きがあります！\n\n" + "\n".join(available_dates)
+            send_line_message(message)
+        else:
+            print("残念ながら、3月のキャンプ宿泊に空きはありませんでした。")
+        return
+
     options = Options()
     options.add_argument('--headless') 
     options.add_argument('--no-sandbox')
@@ -50,58 +90,19 @@ def check_calendar():
     options.add_argument('--profile-directory=Default')
 
     print("ブラウザを起動します...")
-    driver = webdriver.Chrome(options=options)
+    driver = launch_chrome(options, user_data_dir)
 
     try:
         print("予約サイトにアクセスしています...")
-        driver.get('https://reserve.fumotoppara.net/reserved/reserved-date-selection')
-        time.sleep(5)
+        driver.get(RESERVE_URL)
+        wait_for(driver, 'page_ready', raise_on_timeout=False)
 
         # ログイン確認
         if "reserved-date-selection" not in driver.current_url:
-            print("ログインが必要です。ログイン処理を開始します...")
-            if "login" not in driver.current_url and driver.current_url != 'https://reserve.fumotoppara.net/':
-                 driver.get('https://reserve.fumotoppara.net/')
-                 time.sleep(3)
-            
-            wait = WebDriverWait(driver, 10)
-            inputs = driver.find_elements(By.TAG_NAME, 'input')
-            email_input = None
-            password_input = None
-            
-            for inp in inputs:
-                input_type = inp.get_attribute('type')
-                placeholder = inp.get_attribute('placeholder')
-                if input_type == 'text' or input_type == 'email':
-                    if placeholder and ('メール' in placeholder or 'mail' in placeholder.lower()):
-                        email_input = inp
-                    elif email_input is None and input_type != 'password':
-                        email_input = inp
-                if input_type == 'password':
-                    password_input = inp
-            
-            if email_input and password_input:
-                email_input.clear()
-                email_input.send_keys(EMAIL_ADDRESS)
-                password_input.clear()
-                password_input.send_keys(PASSWORD)
-                
-                buttons = driver.find_elements(By.TAG_NAME, 'button')
-                login_btn = None
-                for btn in buttons:
-                    if 'ログイン' in btn.text:
-                        login_btn = btn
-                        break
-                
-                if login_btn:
-                    login_btn.click()
-                    time.sleep(5)
-                else:
-                    print("ログインボタンが見つかりません")
-                    return
-            else:
-                print("入力欄が見つかりません")
+            if not login(driver, EMAIL_ADDRESS, PASSWORD):
+                print("ログインできませんでした")
                 return
+            print("ログインしました。")
 
         # 3月を表示
         print("3月のカレンダーをチェックします...")
@@ -114,7 +115,7 @@ def check_calendar():
         
         if target_month_btn:
             target_month_btn.click()
-            time.sleep(3)
+            wait_for(driver, 'calendar_month', 3)
             
             # テーブルの解析
             # 日付行と状況行を取得
@@ -192,7 +193,7 @@ def check_calendar():
     
     finally:
         print("ブラウザを終了します。")
-        driver.quit()
+        quit_driver(driver)
 
 if __name__ == "__main__":
     check_calendar()
@@ -0,0 +1,259 @@
+import ctypes
+import ctypes.util
+import datetime
+import json
+import os
+import select
+import struct
+import threading
+
+from calendar_extractor import DEFAULT_PLAN
+from set_evaluator import WEEKDAYS
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(BASE_DIR, 'config', 'config.json')
+
+DEFAULT_CONFIG = {"notification_sets": [], "check_interval": 600}
+
+# inotify の定数（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def parse_set_date(n_set, key, label):
+    try:
+        return datetime.datetime.strptime(n_set[key], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"セット「{n_set['name']}」の{label}が正しくありません: {n_set[key]}")
+
+
+def validate_set(n_set):
+    if not isinstance(n_set, dict):
+        raise ValueError("セットの形式が正しくありません")
+    is_range = n_set.get('type') == 'range'
+    date_keys = ('range_start', 'range_end') if is_range else ('start_date',)
+    for key in ('id', 'name') + date_keys:
+        if key not in n_set:
+            raise ValueError(f"セットに {key} がありません")
+    nights = n_set.get('nights', 1)
+    if not isinstance(nights, int) or nights < 1:
+        raise ValueError(f"セット「{n_set['name']}」の泊数が正しくありません: {nights}")
+    plan = n_set.get('plan', DEFAULT_PLAN)
+    if not isinstance(plan, str) or not plan.strip():
+        raise ValueError(f"セット「{n_set['name']}」のプランが正しくありません: {plan}")
+    if not is_range:
+        parse_set_date(n_set, 'start_date', '開始日')
+        return
+
+    range_start = parse_set_date(n_set, 'range_start', '期間の開始日')
+    range_end = parse_set_date(n_set, 'range_end', '期間の終了日')
+    if (range_end - range_start).days + 1 < nights:
+        raise ValueError(f"セット「{n_set['name']}」の期間が泊数より短くなっています")
+    weekdays = n_set.get('weekdays', [])
+    if not isinstance(weekdays, list) or any(day not in WEEKDAYS for day in weekdays):
+        raise ValueError(f"セット「{n_set['name']}」の曜日が正しくありません: {weekdays}")
+    min_remaining = n_set.get('min_remaining', 1)
+    if not isinstance(min_remaining, int) or min_remaining < 1:
+        raise ValueError(f"セット「{n_set['name']}」の残数の条件が正しくありません: {min_remaining}")
+    if n_set.get('auto_reserve'):
+        raise ValueError(f"期間のセット「{n_set['name']}」は自動予約できません")
+
+
+def validate_config(config):
+    """
+    設定の中身を確認する（おかしな所があれば ValueError）
+    """
+    if not isinstance(config, dict):
+        raise ValueError("設定の形式が正しくありません")
+    sets = config.get('notification_sets', [])
+    if not isinstance(sets, list):
+        raise ValueError("notification_sets はリストで指定してください")
+    for n_set in sets:
+        validate_set(n_set)
+    accounts = config.get('accounts', [])
+    if not isinstance(accounts, list):
+        raise ValueError("accounts はリストで指定してください")
+    for account in accounts:
+        if not isinstance(account, dict):
+            raise ValueError("accounts の形式が正しくありません")
+        if 'name' not in account:
+            raise ValueError("accounts に name のないアカウントがあります")
+        account_sets = account.get('notification_sets', [])
+        if not isinstance(account_sets, list):
+            raise ValueError(f"アカウント「{account['name']}」の notification_sets はリストで指定してください")
+        for n_set in account_sets:
+            validate_set(n_set)
+    interval = config.get('check_interval', 600)
+    if not isinstance(interval, (int, float)) or interval <= 0:
+        raise ValueError(f"check_interval が正しくありません: {interval}")
+    audience = config.get('line_broadcast_audience')
+    if audience is not None and (not isinstance(audience, int) or audience < 1):
+        raise ValueError(f"line_broadcast_audience が正しくありません（友だちの人数、1以上の整数）: {audience}")
+    for key in ('browser_max_checks', 'browser_max_memory_mb'):
+        value = config.get(key, 0)
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"{key} が正しくありません（0以上の整数、0で無効）: {value}")
+    return config
+
+
+def write_config(config, path=CONFIG_FILE):
+    """
+    一時ファイルに書いてから置き換える（監視プログラムが書きかけのファイルを読まないように）
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def changed_sets(old_sets, new_sets):
+    """
+    新しく追加されたセットと、内容が変わったセットを返す
+    """
+    old_by_id = {n_set['id']: n_set for n_set in old_sets}
+    return [n_set for n_set in new_sets if old_by_id.get(n_set['id']) != n_set]
+
+
+class Inotify:
+    """
+    ctypes で呼び出す inotify（Linux 以外や使えない環境では生成時に OSError）
+    """
+
+    def __init__(self, directory, mask):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name or not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+            raise OSError("inotify を使えません")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 に失敗しました")
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch に失敗しました")
+
+    def read_names(self, timeout):
+        """
+        timeout 秒まで待って、変化のあったファイル名の一覧を返す
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.append(data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace'))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """
+    config.json を監視して、変わったときだけ読み直す
+    ・inotify が使えればファイルの書き込み・置き換えをすぐに検知し、使えなければ更新時刻を定期的に確認する
+    ・読み込んだ設定は確認済みのものをメモリに持ち、壊れた設定を読んだときは前回の設定を使い続ける
+    ・変化を検知したら wait() で待っている監視ループを起こす
+    """
+
+    def __init__(self, path=CONFIG_FILE, poll_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.key = None
+        self.config = dict(DEFAULT_CONFIG)
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mode = None
+
+    def _stat_key(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def get(self):
+        """
+        最新の設定を返す（ファイルが変わっていなければ読み直さない）
+        """
+        key = self._stat_key()
+        with self.lock:
+            if key == self.key:
+                return self.config
+            self.key = key
+            if key is None:
+                print(f"設定ファイルが見つかりません: {self.path}")
+                self.config = dict(DEFAULT_CONFIG)
+                return self.config
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.config = validate_config(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"設定ファイルの読み込みに失敗しました（前回の設定を使います）: {e}")
+            return self.config
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        try:
+            watcher = Inotify(os.path.dirname(self.path),
+                              IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY)
+            self.mode = 'inotify'
+            target = lambda: self._watch_inotify(watcher)
+        except OSError:
+            self.mode = 'poll'
+            target = self._watch_poll
+        self.thread = threading.Thread(target=target, name='config-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _notify_if_changed(self):
+        if self._stat_key() != self.key:
+            self.wakeup.set()
+
+    def _watch_inotify(self, watcher):
+        name = os.path.basename(self.path)
+        try:
+            while not self.stop_event.is_set():
+                if name in watcher.read_names(0.5):
+                    self._notify_if_changed()
+        finally:
+            watcher.close()
+
+    def _watch_poll(self):
+        while not self.stop_event.wait(self.poll_interval):
+            self._notify_if_changed()
+
+    def wait(self, timeout):
+        """
+        設定が変わるか timeout 秒経つまで待つ。設定が変わって起こされたら True
+        """
+        woke = self.wakeup.wait(timeout)
+        self.wakeup.clear()
+        return woke
@@ -1,12 +1,10 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
 import os
 from dotenv import load_dotenv
-import time
+from page_waits import wait_for
+from browser_session import RESERVE_URL, launch_chrome, quit_driver
+from site_login import login
 
 # プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,15 +32,15 @@ def login_and_check():
 
     print(f"ユーザーデータディレクトリ: {user_data_dir}")
     print("ブラウザを起動します...")
-    driver = webdriver.Chrome(options=options)
+    driver = launch_chrome(options, user_data_dir)
 
     try:
         # 1. 予約サイト（カレンダーページ）に直接アクセス
         print("予約サイトにアクセスしています...")
-        driver.get('https://reserve.fumotoppara.net/reserved/reserved-date-selection')
+        driver.get(RESERVE_URL)
         
-        # 画面遷移を待つ（少し長めに）
-        time.sleep(5)
+        # 画面遷移を待つ（カレンダーかログインフォームが表示されるまで）
+        wait_for(driver, 'page_ready', raise_on_timeout=False)
 
         # 現在のURLを確認
         print(f"現在のURL: {driver.current_url}")
@@ -50,63 +48,10 @@ def login_and_check():
         # ログイン済みかどうかを確認（URLで判断）
         if "reserved-date-selection" in driver.current_url:
             print("既にログインしています。")
-        else:
-            # カレンダーページにいなかったら、ログインが必要と判断
-            print("ログインが必要です。ログイン処理を開始します...")
-            
-            # トップページにいるかもしれないし、ログインページにリダイレクトされているかもしれない
-            # とりあえずトップページへ移動してからログインフローを開始する
-            if "login" not in driver.current_url and driver.current_url != 'https://reserve.fumotoppara.net/':
-                 driver.get('https://reserve.fumotoppara.net/')
-                 time.sleep(3)
-            # ログイン処理
-            # メールアドレス入力欄を探す
-            wait = WebDriverWait(driver, 10)
-            
-            print("ログイン情報を入力しています...")
-            
-            inputs = driver.find_elements(By.TAG_NAME, 'input')
-            
-            email_input = None
-            password_input = None
-            
-            for inp in inputs:
-                input_type = inp.get_attribute('type')
-                placeholder = inp.get_attribute('placeholder')
-                
-                if input_type == 'text' or input_type == 'email':
-                    if placeholder and ('メール' in placeholder or 'mail' in placeholder.lower()):
-                        email_input = inp
-                    elif email_input is None and input_type != 'password':
-                        email_input = inp
-                
-                if input_type == 'password':
-                    password_input = inp
-            
-            if email_input and password_input:
-                email_input.clear()
-                email_input.send_keys(EMAIL_ADDRESS)
-                
-                password_input.clear()
-                password_input.send_keys(PASSWORD)
-                
-                buttons = driver.find_elements(By.TAG_NAME, 'button')
-                login_btn = None
-                for btn in buttons:
-                    if 'ログイン' in btn.text:
-                        login_btn = btn
-                        break
-                
-                if login_btn:
-                    print("ログインボタンをクリックします...")
-                    login_btn.click()
-                    time.sleep(5)
-                else:
-                    print("ログインボタンが見つかりませんでした。")
-                    return
-            else:
-                print("入力欄が見つかりませんでした。")
-                return
+        elif not login(driver, EMAIL_ADDRESS, PASSWORD):
+            # カレンダーページにいなかったのでログインしたが、カレンダーが表示されなかった
+            print("ログインできませんでした。")
+            return
 
         # 3. カレンダーの情報を取得
         # 例として「3月」ボタンをクリックしてみる
@@ -120,7 +65,7 @@ def login_and_check():
         
         if target_month_btn:
             target_month_btn.click()
-            time.sleep(3) # 読み込み待ち
+            wait_for(driver, 'calendar_month', 3) # 読み込み待ち
             
             # カレンダーが表示された状態でスクリーンショット
             print("3月のカレンダーを保存します...")
@@ -153,7 +98,7 @@ def login_and_check():
     
     finally:
         print("ブラウザを終了します。")
-        driver.quit()
+        quit_driver(driver)
 
 if __name__ == "__main__":
     login_and_check()
@@ -1,17 +1,28 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import os
 import time
 import datetime
-import requests
-import json
-import csv
-import re
 from dotenv import load_dotenv
+from calendar_extractor import (DEFAULT_PLAN, extract_calendar, build_plan_statuses, merge_plan_statuses,
+                                click_month_button, watch_calendar_redraw)
+from calendar_parser import parse_status
+from reservation_lane import ReservationLane, ReservationTimer
+from browser_session import RESERVE_BASE_URL, RESERVE_URL
+from site_login import ensure_login, refresh_session
+from page_waits import wait_for
+from poll_scheduler import PollScheduler, month_targets
+from month_pool import MonthFetchPool
+from availability_events import EventLog, diff_snapshots, format_event
+from history_store import HistoryStore
+from availability_client import get_client, export_cookies, AvailabilityApiError
+from line_dispatcher import LineDispatcher
+from notification_router import NotificationRouter
+from set_evaluator import nights_of, is_range_set, range_days, set_plan, WEEKDAYS
+from tenants import tenant_specs, sync_tenants, all_notification_sets
+from config_watcher import ConfigWatcher, changed_sets
+from metrics import metrics, span, observe
+from browser_watchdog import BrowserWatchdog, profile_dirs, reap_orphans
+from monitor_checkpoint import (NOTIFIED_MAX_AGE, build_checkpoint, load_checkpoint, restore_tenant,
+                                save_checkpoint, unpack_statuses)
 
 # プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,567 +34,672 @@ PASSWORD = os.getenv('PASSWORD')
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
 LINE_USER_ID = os.getenv('LINE_USER_ID')
 
-# 曜日マップ
-WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+RESERVE_LIST_URL = f"{RESERVE_BASE_URL}/reserved/reserved-calendar-list"
+RESERVE_FOOTER = f"\n\n予約はこちら:\n{RESERVE_LIST_URL}"
 
-# 通知済みセットを記憶しておく
-previous_ok_sets = set()
+# 期間のセットの通知に書き出す候補の上限（多すぎる分は件数だけ書く）
+MAX_LISTED_WINDOWS = 20
+
+# 次のチェックまでこの秒数以上あるときだけ、合間にログイン状態を更新する
+IDLE_REFRESH_MIN_SECONDS = 30
+
+# 予約アカウント {名前: Tenant}（通知済みセット・予約用タブ・ブラウザはアカウントごとに持つ）
+# config.json に accounts がなければ .env のアカウント1つだけ（accounts は config.json 直下のセットとは別のアカウント）
+tenants = {}
+
+# 月を並列に取得するブラウザのプール（parallel_workers が2以上のときだけ使う）
+month_pool = None
+
+# これまでに取得した最新の空き状況 {プラン: {日付: ステータス}}（今回チェックしなかった月の判定にも使う）
+latest_statuses = {}
+
+# config.json の変更を監視し、確認済みの設定をメモリに持つ
+config_watcher = ConfigWatcher()
+
+# 空き状況の変化ログ（追記のみのファイル）と、検索用の履歴データベース
+# 履歴データベースは最初に使うときに開く（import しただけでは logs/history.db を作らない）
+event_log = EventLog()
+history_store = None
+
+# 常駐ブラウザのメモリを見張り、チェック回数やメモリが上限を超えたら作り直す
+browser_watchdog = BrowserWatchdog()
+
+# LINE通知は裏のスレッドで送る（チェックや自動予約は送信を待たない）
+line_dispatcher = LineDispatcher(LINE_CHANNEL_ACCESS_TOKEN)
+# セットごとの送信先に振り分け、月間の通数の上限に近づいたらまとめ通知にする
+notification_router = NotificationRouter(line_dispatcher)
+
+def get_history_store():
+    global history_store
+    if history_store is None:
+        history_store = HistoryStore()
+    return history_store
 
 def load_config():
-    try:
-        config_path = os.path.join(BASE_DIR, 'config', 'config.json')
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"設定ファイルの読み込みに失敗しました: {e}")
-        return {"notification_sets": [], "check_interval": 600}
-
-def send_line_message(message):
-    url = 'https://api.line.me/v2/bot/message/broadcast'
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {LINE_CHANNEL_ACCESS_TOKEN}'
-    }
-    data = {
-        'messages': [
-            {
-                'type': 'text',
-                'text': message
-            }
-        ]
-    }
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        print(f"LINE通知(ブロードキャスト)を送信しました")
-    except Exception as e:
-        print(f"LINE通知の送信に失敗しました: {e}")
+    # ファイルが変わっていなければ前回読み込んだ設定をそのまま返す
+    return config_watcher.get()
+
+def send_line_message(message, recipients=None, urgent=True):
+    """
+    送信キューに入れる（送信と再送は line_dispatcher が行う）
+    recipients を省略すると友だち全員に送る
+    """
+    notification_router.send([(recipients, message)], urgent=urgent)
 
 def get_weekday(date_str):
     date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
     return WEEKDAYS[date_obj.weekday()]
 
-def parse_status(status_text):
-    status_text = status_text.replace('\n', ' ').strip()
-    if '〇' in status_text:
-        return '〇', 999
-    elif '△' in status_text:
-        match = re.search(r'残(\d+)', status_text)
-        if match:
-            return '△', int(match.group(1))
-        else:
-            return '△', 1
-    else:
-        return '×', 0
-
-def save_log_csv(all_statuses):
-    log_dir = os.path.join(BASE_DIR, "logs")
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    today_str = datetime.datetime.now().strftime('%Y-%m-%d')
-    csv_path = os.path.join(log_dir, f"{today_str}.csv")
-    timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-    sorted_dates = sorted(all_statuses.keys())
-    file_exists = os.path.exists(csv_path)
-    
-    try:
-        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                header = ["Timestamp"] + sorted_dates
-                writer.writerow(header)
-            row = [timestamp]
-            for date in sorted_dates:
-                row.append(all_statuses[date])
-            writer.writerow(row)
-    except Exception as e:
-        print(f"ログ保存エラー: {e}")
+def is_month_covered(all_statuses, year, month):
+    """
+    all_statuses（{プラン: {日付: ステータス}}）のどれかのプランに、その月の初日と末日が含まれているか
+    """
+    first_day = datetime.date(year, month, 1)
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - datetime.timedelta(days=1)).isoformat()
+    return any(first_day.isoformat() in statuses and last_day in statuses for statuses in all_statuses.values())
+
+def watched_plans():
+    """
+    いずれかのアカウントのセットが見ているプラン
+    """
+    return {set_plan(n_set) for tenant in tenants.values() for n_set in tenant.notification_sets}
 
-def perform_auto_reservation(driver, n_set):
+def describe_plan(n_set):
     """
-    自動予約処理を実行する
+    通知に書くプラン名（キャンプ宿泊のセットは今までどおり書かない）
     """
+    plan = set_plan(n_set)
+    return "" if plan == DEFAULT_PLAN else f"（{plan}）"
+
+def get_reservation_lane(tenant, n_set):
+    session = tenant.get_session()
+    lane = tenant.reservation_lanes.get(n_set['id'])
+    # セットの内容が編集されていたら作り直す
+    if lane is None or lane.session is not session or lane.n_set != n_set:
+        if lane:
+            lane.close()
+        lane = ReservationLane(session, n_set)
+        tenant.reservation_lanes[n_set['id']] = lane
+    return lane
+
+def prepare_reservation_lanes(tenant):
+    """
+    自動予約セットごとの予約用タブを準備しておく（削除されたセットのタブは閉じる）
+    予約はそのアカウントでログインしたブラウザで行う
+    """
+    auto_sets = tenant.auto_sets()
+    active_ids = {n_set['id'] for n_set in auto_sets}
+    for set_id in list(tenant.reservation_lanes.keys()):
+        if set_id not in active_ids:
+            tenant.reservation_lanes.pop(set_id).close()
+    if not auto_sets:
+        return
+
+    open_calendar(tenant.get_session(), tenant)
+    for n_set in auto_sets:
+        lane = get_reservation_lane(tenant, n_set)
+        if not lane.is_ready():
+            lane.prepare()
+
+def perform_auto_reservation(tenant, n_set):
+    """
+    自動予約処理を実行する（予約用タブで待機していた状態から確定まで進める）
+    """
+    timer = ReservationTimer()
     try:
-        print(f"自動予約処理を開始します: {n_set['name']}")
-        
-        # 1. カレンダーページにいるはずなので、対象の日付セルをクリック
-        # ※直前のチェック処理でカレンダー画面にいる前提
-        
-        # 3/27のような日付を探してクリックするロジック
-        # 既に check_calendar_once で画面は見ているが、クリックするために再度要素を探す
-        
-        target_date_str = n_set['start_date']
-        target_date = datetime.datetime.strptime(target_date_str, "%Y-%m-%d")
-        target_month = target_date.month
-        
-        # 月ボタンをクリックして対象月へ移動（念のため）
-        buttons = driver.find_elements(By.TAG_NAME, 'button')
-        target_month_btn = None
-        for btn in buttons:
-            if f'{target_month}月' in btn.text:
-                target_month_btn = btn
-                break
-        if target_month_btn:
-            target_month_btn.click()
-            time.sleep(3)
+        print(tenant.label(f"自動予約処理を開始します: {n_set['name']}"))
+        completed = get_reservation_lane(tenant, n_set).fire(timer)
+        print(f"自動予約の所要時間: {timer.summary()}")
+        observe('reserve.total', timer.total())
+        metrics.inc('auto_reservations')
+
+        # 完了通知
+        recipients = tenant.recipients_for(n_set)
+        if completed:
+            send_line_message(f"【自動予約完了】\nセット「{n_set['name']}」の予約を完了しました！\n確認メールまたはサイトで予約状況を確認してください。\n所要時間: {timer.summary()}", recipients)
         else:
-            raise Exception(f"{target_month}月のボタンが見つかりません")
+            send_line_message(f"【自動予約完了（要確認）】\nセット「{n_set['name']}」の予約確定ボタンを押しましたが、完了画面を確認できませんでした。\n確認メールまたはサイトで予約状況を必ず確認してください。", recipients)
+        return True
 
-        # 日付セルを探してクリック
-        rows = driver.find_elements(By.TAG_NAME, 'tr')
-        header_row = rows[0]
-        header_cells = header_row.find_elements(By.TAG_NAME, 'th')
-        if not header_cells: header_cells = header_row.find_elements(By.TAG_NAME, 'td')
-        
-        target_col_index = -1
-        # 日付マッチング（"3/27" 形式）
-        search_date_text = f"{target_date.month}/{target_date.day}"
-        
-        for i, cell in enumerate(header_cells):
-            text = cell.text.replace('\n', ' ')
-            if search_date_text in text:
-                target_col_index = i
-                break
-        
-        if target_col_index == -1:
-            raise Exception(f"日付 {search_date_text} がカレンダーに見つかりません")
-
-        # データ行（キャンプ宿泊）
-        target_row = None
-        for row in rows:
-            if 'キャンプ宿泊' in row.text:
-                target_row = row
-                break
-        
-        if not target_row:
-             raise Exception("「キャンプ宿泊」の行が見つかりません")
+    except Exception as e:
+        timer.lap("エラー")
+        print(f"自動予約の所要時間: {timer.summary()}")
+        metrics.inc('auto_reservation_errors')
+        error_msg = f"【自動予約失敗】\nセット「{n_set['name']}」の自動予約中にエラーが発生しました。\n詳細: {str(e)}"
+        print(error_msg)
+        send_line_message(tenant.label(error_msg), tenant.recipients_for(n_set))
+        return False
 
-        cells = target_row.find_elements(By.TAG_NAME, 'td')
-        # インデックス補正 -1
-        click_index = target_col_index - 1
-        
-        if not (0 <= click_index < len(cells)):
-             raise Exception("クリック対象のセルインデックスが不正です")
+def open_calendar(session, tenant=None):
+    """
+    ログイン済みでカレンダーページを表示したドライバーを返す（tenant を渡すとそのアカウントでログインする）
+    """
+    email, password = tenant_credentials(tenant)
+    return ensure_login(session, email, password)
 
-        target_cell = cells[click_index]
-        print(f"予約日 {search_date_text} のセルをクリックします...")
-        
-        # クリック（div要素をクリックするのが確実かも）
+def tenant_credentials(tenant=None):
+    if tenant and tenant.email:
+        return tenant.email, tenant.password
+    return EMAIL_ADDRESS, PASSWORD
+
+def browser_sessions():
+    """
+    起動済みのブラウザ {名前: BrowserSession}（アカウントごとのブラウザと並列取得用のブラウザ）
+    """
+    sessions = {tenant.name: tenant.session for tenant in tenants.values() if tenant.session}
+    if month_pool:
+        for i, worker in enumerate(month_pool.all_sessions):
+            sessions[f"worker{i + 1}"] = worker
+    return sessions
+
+def supervise_browsers():
+    """
+    チェックの合間に、ブラウザごとのメモリを /metrics に記録し、上限を超えたブラウザを作り直す
+    """
+    usage = browser_watchdog.supervise(browser_sessions())
+    metrics.set_gauge_series('browser_rss_bytes', [({'browser': name}, item['rss']) for name, item in usage.items()])
+    metrics.set_gauge_series('browser_processes', [({'browser': name}, item['processes']) for name, item in usage.items()])
+    metrics.set_gauge('browser_recycles', browser_watchdog.recycle_count)
+
+def refresh_sessions():
+    """
+    チェックの合間に、起動済みのブラウザのログイン状態を確かめて更新しておく（チェックの時にログインを待たないように）
+    """
+    sessions = [(tenant.session, tenant) for tenant in tenants.values() if tenant.session]
+    if month_pool and tenants:
+        scraper = next(iter(tenants.values()))
+        sessions.extend((worker, scraper) for worker in month_pool.all_sessions)
+    for session, tenant in sessions:
+        email, password = tenant_credentials(tenant)
         try:
-            target_cell.find_element(By.TAG_NAME, 'div').click()
-        except:
-            target_cell.click()
-            
-        time.sleep(3)
-
-        # 2. 泊数選択（ポップアップが出た場合）
-        # ポップアップが出るかどうかはサイトの仕様によるが、出た場合は処理
-        # 「1泊」「2泊」などのタブがあるはず
-        nights = n_set.get('nights', 1)
-        
-        # ポップアップが表示されているか確認（厳密にはモーダルダイアログなどを探す）
-        # ここでは「予約へ進む」的なボタンを探すことで代用
-        
-        # 泊数選択が必要な場合、ここで選択処理
-        # "1泊", "2泊" といったテキストを持つ要素を探してクリック
-        if nights > 1:
-            try:
-                # 泊数選択タブを探す（クラス名などは推測）
-                # 単純にテキストで探す
-                night_labels = driver.find_elements(By.XPATH, f"//div[contains(text(), '{nights}泊')]")
-                if night_labels:
-                    for label in night_labels:
-                        if label.is_displayed():
-                            label.click()
-                            print(f"{nights}泊を選択しました")
-                            time.sleep(1)
-                            break
-            except Exception as e:
-                print(f"泊数選択でエラー（スキップします）: {e}")
-
-        # 「予約へ進む」ボタンをクリック
-        buttons = driver.find_elements(By.TAG_NAME, 'button')
-        next_btn = None
-        for btn in buttons:
-            if btn.is_displayed() and ("予約" in btn.text and "進む" in btn.text or "予約する" in btn.text):
-                next_btn = btn
-                break
-        
-        if next_btn:
-            next_btn.click()
-            time.sleep(5)
-        else:
-             raise Exception("「予約へ進む」ボタンが見つかりません")
+            refresh_session(session, email, password)
+        except Exception as e:
+            print(tenant.label(f"ログイン状態の更新に失敗しました: {e}"))
+            session.reset_page()
 
-        # 3. 予約詳細ページでの入力
-        print("予約詳細ページ: 入力を開始します...")
+def show_month(driver, month):
+    """
+    月ボタンを押し、その月のカレンダーが最新の空き状況で描画し直されるまで待つ（表示できなければ False）
+    使い回しているページで表示中の月を押したときは月の表示だけでは描画し直されたか分からないので、ページの書き換わりを待つ
+    書き換わらなければページごと読み込み直す
+    """
+    watch_calendar_redraw(driver)
+    if not click_month_button(driver, month):
+        return False
+    if wait_for(driver, 'calendar_redrawn', month, raise_on_timeout=False):
+        return True
+    print(f"{month}月のカレンダーが描画し直されなかったため、ページを読み込み直します")
+    driver.get(RESERVE_URL)
+    if not wait_for(driver, 'calendar_page', raise_on_timeout=False) or not click_month_button(driver, month):
+        return False
+    return wait_for(driver, 'calendar_month', month, raise_on_timeout=False)
 
-        # 到着時刻の選択 (11:00 ～ 13:59)
-        # el-select をクリックしてドロップダウンを開く
-        # ID: matterBasicInfo.arrivalTime に対応するラベルの近くのコンボボックス
-        # 簡便のため、画面内の "11:00 ～ 13:59" を含む要素を探してクリックする手もあるが、
-        # まずコンボボックスを開く必要がある
-        
-        # 'el-select' クラスを持つ要素を探す
-        selects = driver.find_elements(By.CLASS_NAME, 'el-select')
-        # おそらく最初のselectが到着時刻（画面構成による）
-        # ラベル「到着時刻」の親要素から辿るのが確実
-        arrival_label = driver.find_elements(By.XPATH, "//label[contains(text(), '到着時刻')]")
-        if arrival_label:
-            # ラベルの兄弟要素にある el-select を探す
-            pass 
-        
-        # とりあえず全ての el-select を順にクリックして、ドロップダウンが出たら "11:00" を選ぶ作戦
-        arrival_time_text = "11:00 ～ 13:59"
-        time_selected = False
-        
-        for select in selects:
-            if not select.is_displayed(): continue
-            try:
-                select.click()
-                time.sleep(1)
-                # ドロップダウン内の候補を探す
-                options = driver.find_elements(By.CLASS_NAME, 'el-select-dropdown__item')
-                for opt in options:
-                    if arrival_time_text in opt.text:
-                        opt.click()
-                        time_selected = True
-                        print(f"到着時刻 {arrival_time_text} を選択しました")
-                        break
-                if time_selected: break
-            except:
-                continue
+def scrape_months(driver, sorted_target_months, on_month=None):
+    """
+    対象月のカレンダーを順に表示して {プラン: {日付: ステータス}} を作る（1か月分を1回の execute_script で読み取る）
+    表のすべての行（日帰り・宿泊・コテージなど）を同じ表示から読み取るので、プランが増えても読み込みは増えない
+    on_month を渡すと、1か月読み取るごとにそれまでの結果を渡して呼び出す
+    -> (空き状況, 読み取れた月のリスト)（表示できなかった月は含めない）
+    """
+    all_date_statuses = {}
+    read_months = []
+    for year, month in sorted_target_months:
+        # 前の月の表示範囲に含まれていれば、クリックし直さない
+        if is_month_covered(all_date_statuses, year, month):
+            print(f"{year}年{month}月は取得済みの範囲に含まれています")
+            read_months.append((year, month))
+            continue
+
+        print(f"{year}年{month}月のカレンダーを取得中...")
+        with span('month_navigation'):
+            shown = show_month(driver, month)
+        if not shown:
+            print(f"{year}年{month}月のカレンダーが表示されませんでした")
+            continue
         
-        if not time_selected:
-             print("警告: 到着時刻の選択に失敗しました（デフォルトまたは未選択のまま進みます）")
+        with span('extract'):
+            grid = extract_calendar(driver)
+            merge_plan_statuses(all_date_statuses, build_plan_statuses(grid, year, month))
+        read_months.append((year, month))
+        if on_month:
+            on_month(all_date_statuses)
+    return all_date_statuses, read_months
+
+def fetch_months_with_session(session, months, tenant=None, on_month=None):
+    """
+    ブラウザでカレンダーを表示して月を取得する -> (空き状況, 読み取れた月のリスト)
+    軽量モードで1か月も読み取れなかったときは、通常のブラウザに切り替えてもう一度取得する
+    """
+    driver = open_calendar(session, tenant)
+    # 合間のログイン状態の更新ではなく、カレンダーを取得したときだけ数える（並列取得の作業ブラウザもここを通る）
+    # ブラウザを起動し直すと 0 に戻るので、起動の後に数える
+    session.checks += 1
+    statuses, read_months = scrape_months(driver, months, on_month=on_month)
+    if months and not statuses and session.fall_back_to_full("カレンダーを読み取れませんでした"):
+        statuses, read_months = scrape_months(open_calendar(session, tenant), months, on_month=on_month)
+    return statuses, read_months
+
+def get_month_pool(config, base_profile_dir=None):
+    """
+    config.json の parallel_workers（ブラウザの数）と max_concurrent_fetches（同時アクセス数の上限）に合わせたプールを返す
+    parallel_workers が1以下なら None（メインのブラウザで順番に取得する）
+    """
+    global month_pool
+    size = config.get('parallel_workers', 1)
+    max_concurrency = config.get('max_concurrent_fetches')
+    lean = bool(config.get('lean_browser', False))
+    if month_pool and (size <= 1 or not month_pool.matches(size, max_concurrency, lean)
+                       or (base_profile_dir and month_pool.base_profile_dir != base_profile_dir)):
+        month_pool.close()
+        month_pool = None
+    if size > 1 and month_pool is None:
+        print(f"{size}個のブラウザで並列に取得します")
+        if base_profile_dir:
+            month_pool = MonthFetchPool(size, max_concurrency, base_profile_dir=base_profile_dir, lean=lean)
+        else:
+            month_pool = MonthFetchPool(size, max_concurrency, lean=lean)
+    return month_pool
 
-        # 人数入力
-        # 大人の入力欄: input[type=text] で readonly でないもの、かつ数値入力っぽいもの
-        # 以前の解析でIDが判明している: reservedUserList[0].planQty (大人)
-        
-        adults = n_set.get('adults', 1)
-        children = n_set.get('children', 0)
-        preschoolers = n_set.get('preschoolers', 0)
-        
-        # ID指定で探すのが確実だが、動的IDの可能性もあるため、
-        # ラベル「大人」「小学生」「未就学児」の近くの input を探すアプローチ
+def evaluate_set(n_set, all_date_statuses):
+    """
+    セットの全泊に空きがあるかを判定する -> (空きあり, 日付ごとの詳細)
+    まだ取得していない日付は「不明」として空きなし扱い
+    all_date_statuses は {プラン: {日付: ステータス}}（セットのプランの行で判定する）
+    """
+    plan_statuses = all_date_statuses.get(set_plan(n_set), {})
+    is_set_available = True
+    available_details = []
+    for check_date_str, weekday in nights_of(n_set):
+        status = plan_statuses.get(check_date_str, "不明")
+        mark, count = parse_status(status)
         
-        def set_input_by_label(label_text, value):
-            try:
-                # ラベルを探す
-                labels = driver.find_elements(By.TAG_NAME, 'label')
-                target_label = None
-                for l in labels:
-                    if label_text in l.text:
-                        target_label = l
-                        break
-                
-                if target_label:
-                    # 親の親...と辿って、同じ行にある input を探す
-                    # el-form-item 構造を想定
-                    parent = target_label.find_element(By.XPATH, "./..") # el-form-item
-                    inputs = parent.find_elements(By.TAG_NAME, 'input')
-                    
-                    target_input = None
-                    for inp in inputs:
-                         if inp.is_displayed() and not inp.get_attribute('readonly'):
-                             target_input = inp
-                             break
-                    
-                    if target_input:
-                        target_input.clear()
-                        target_input.send_keys(str(value))
-                        print(f"{label_text}: {value}人 を入力しました")
-                        return True
-            except Exception as e:
-                print(f"{label_text} の入力中にエラー: {e}")
-            return False
-
-        # 大人
-        set_input_by_label("大人", adults)
-        # 小学生
-        set_input_by_label("小学生", children)
-        # 未就学児
-        set_input_by_label("未就学児", preschoolers)
-
-        # 4. 「次へ」ボタン
-        print("次へ進みます...")
-        buttons = driver.find_elements(By.TAG_NAME, 'button')
-        next_page_btn = None
-        for btn in buttons:
-            if "次へ" in btn.text and btn.is_displayed():
-                next_page_btn = btn
-                break
+        available_details.append(f"{check_date_str}({weekday}): {status}")
         
-        if next_page_btn:
-            next_page_btn.click()
-            time.sleep(5)
-            
-            # 5. 確定ボタン（確認画面）
-            print("確認画面: 予約を確定します...")
-            buttons = driver.find_elements(By.TAG_NAME, 'button')
-            confirm_btn = None
-            for btn in buttons:
-                # "確定" または "予約する"
-                if ("確定" in btn.text or "予約する" in btn.text) and btn.is_displayed():
-                    confirm_btn = btn
-                    break
-            
-            if confirm_btn:
-                # ★★★ ここでクリックすると本当に予約される ★★★
-                # テスト時は注意が必要だが、要件通り実装する
-                confirm_btn.click()
-                print("予約確定ボタンをクリックしました！")
-                time.sleep(10) # 完了画面待ち
-                
-                # 完了通知
-                send_line_message(f"【自動予約完了】\nセット「{n_set['name']}」の予約を完了しました！\n確認メールまたはサイトで予約状況を確認してください。")
-                return True
+        # 空き判定: 〇か△ならOK
+        if mark == '×':
+            is_set_available = False
+    return is_set_available, available_details
+
+def describe_range_set(n_set):
+    weekdays = n_set.get('weekdays')
+    text = f"{n_set['range_start']}〜{n_set['range_end']}・{n_set.get('nights', 1)}泊"
+    if weekdays:
+        text += f"・{'/'.join(weekdays)}曜開始"
+    if n_set.get('min_remaining', 1) > 1:
+        text += f"・残{n_set['min_remaining']}以上"
+    return text
+
+def format_windows(n_set, windows, new_windows, all_date_statuses):
+    """
+    期間のセットの候補を「開始日(曜日)から N 泊: 各泊の状況」の行にする（今回新しく出た候補には【新】を付ける）
+    """
+    nights = n_set.get('nights', 1)
+    plan_statuses = all_date_statuses.get(set_plan(n_set), {})
+    lines = []
+    for start in windows[:MAX_LISTED_WINDOWS]:
+        stay = range_days(start, (datetime.date.fromisoformat(start) + datetime.timedelta(days=nights - 1)).isoformat())
+        mark = "【新】" if start in new_windows else ""
+        statuses = " / ".join(plan_statuses.get(date_str, "不明") for date_str, _ in stay)
+        lines.append(f"{mark}{start}({stay[0][1]})から{nights}泊: {statuses}")
+    if len(windows) > MAX_LISTED_WINDOWS:
+        lines.append(f"ほか{len(windows) - MAX_LISTED_WINDOWS}件")
+    return lines
+
+def merge_statuses(fresh_statuses, months):
+    """
+    今回取得した空き状況を latest_statuses に反映し、月ごとに変化があったかを返す {(年, 月): bool}
+    変化した日付だけをプランごとにイベントログと履歴データベースに書き出し、セットの判定にも反映する
+    """
+    events = []
+    for plan, statuses in fresh_statuses.items():
+        events.extend(diff_snapshots(latest_statuses.get(plan, {}), statuses, plan))
+    # 空き状況は全アカウント共通なので、同じ変化を各アカウントの判定に配る
+    for tenant in tenants.values():
+        tenant.evaluator.apply(events)
+    observed_at = datetime.datetime.now()
+    with span('history_write'):
+        event_log.append(events, observed_at)
+        get_history_store().write_events(events, observed_at)
+    metrics.inc('status_changes', len(events))
+    for event in events:
+        print(f"  変化: {format_event(event)}")
+
+    # チェック間隔の調整には、セットが見ているプランの変化だけを使う
+    plans = watched_plans()
+    changed = {month: False for month in months}
+    for event in events:
+        month = (int(event['date'][:4]), int(event['date'][5:7]))
+        if month in changed and event['plan'] in plans:
+            changed[month] = True
+    merge_plan_statuses(latest_statuses, fresh_statuses)
+    expire_past_dates()
+    return changed
+
+def expire_past_dates():
+    """
+    過ぎた日付を latest_statuses と各アカウントの判定の索引から外す
+    """
+    today_str = datetime.date.today().isoformat()
+    expired = []
+    for plan, statuses in latest_statuses.items():
+        for date_str in [d for d in statuses if d < today_str]:
+            expired.append({'date': date_str, 'plan': plan, 'from': statuses.pop(date_str)})
+    if expired:
+        for tenant in tenants.values():
+            tenant.evaluator.expire(expired)
+
+def notify_tenant(tenant, auto_reserve_target, all_date_statuses):
+    """
+    アカウントのセットのうち、新しく空きが出たセットの通知を送る
+    """
+    # 7日以内チェック（自動予約セットのみ）
+    today = datetime.datetime.now()
+    for n_set in tenant.auto_sets():
+        start_date = datetime.datetime.strptime(n_set['start_date'], "%Y-%m-%d")
+        days_diff = (start_date - today).days
+        if 0 <= days_diff <= 7:
+             print(tenant.label(f"警告: セット「{n_set['name']}」は7日以内の予約です。キャンセル料が発生する可能性があります。"))
+
+    # 通知判定（全泊に空きがあるセットだけを索引から取り出す）
+    current_ok_sets = set()
+    messages = []  # [(送信先, テキスト)]
+    urgent_messages = []
+
+    current_windows = {}
+
+    for n_set in tenant.evaluator.available_sets():
+        set_id = n_set['id']
+        name = n_set['name']
+        current_ok_sets.add(set_id)
+
+        if is_range_set(n_set):
+            # 期間のセットは、新しい候補が出たときに全候補を1通にまとめて送る
+            windows = tenant.evaluator.windows[set_id]
+            current_windows[set_id] = set(windows)
+            new_windows = current_windows[set_id] - tenant.previous_windows.get(set_id, set())
+            if new_windows:
+                lines = format_windows(n_set, windows, new_windows, all_date_statuses)
+                msg = (f"【空きが出ました！】\nセット: {name}{describe_plan(n_set)}（{describe_range_set(n_set)}）\n"
+                       f"条件に合う日程: {len(windows)}件\n" + "\n".join(lines))
+                messages.append((tenant.recipients_for(n_set), tenant.label(msg)))
+            continue
+
+        # 自動予約を実行したセット（結果は予約処理から別途通知済み）
+        if auto_reserve_target and auto_reserve_target['id'] == set_id:
+            _, available_details = evaluate_set(n_set, all_date_statuses)
+            msg = f"【空き発見！自動予約を実行しました】\nセット: {name}{describe_plan(n_set)}\n" + "\n".join(available_details)
+            urgent_messages.append((tenant.recipients_for(n_set), tenant.label(msg)))
+
+        # 前回NGだった場合のみ通知（自動予約対象でない場合）
+        elif set_id not in tenant.previous_ok_sets:
+            _, available_details = evaluate_set(n_set, all_date_statuses)
+            msg = f"【空きが出ました！】\nセット: {name}{describe_plan(n_set)}\n" + "\n".join(available_details)
+            messages.append((tenant.recipients_for(n_set), tenant.label(msg)))
+
+    # 通知送信
+    # 送信先ごとに1通にまとめて送る（自動予約の結果は上限が近くてもすぐ送る）
+    if urgent_messages:
+        notification_router.send(urgent_messages, footer=RESERVE_FOOTER, urgent=True)
+    if messages:
+        print(tenant.label("条件を満たす空きが見つかりました！通知を送ります。"))
+        notification_router.send(messages, footer=RESERVE_FOOTER)
+
+    # 状態更新
+    tenant.previous_ok_sets = current_ok_sets
+    tenant.previous_windows = current_windows
+    return bool(messages or urgent_messages)
+
+def check_calendar_once(months=None, scheduler=None):
+    """
+    空き状況を1回チェックする（ブラウザはアカウントごとにサイクルをまたいで使い回す）
+    空き状況は全アカウント共通なので、月ごとの取得は1サイクルにつき1回だけ行い、結果を各アカウントに配る
+    months を渡すとその月だけをチェックし、他の月は前回までの結果で判定する
+    scheduler を渡すと、月ごとの変化の有無を記録する
+    """
+    global tenants
 
-            else:
-                 raise Exception("確定ボタンが見つかりません")
-        else:
-             raise Exception("「次へ」ボタンが見つかりません")
+    config = load_config()
+    notification_router.configure_from(config)
+    tenants = sync_tenants(tenants, tenant_specs(config, EMAIL_ADDRESS, PASSWORD))
 
-    except Exception as e:
-        error_msg = f"【自動予約失敗】\nセット「{n_set['name']}」の自動予約中にエラーが発生しました。\n詳細: {str(e)}"
-        print(error_msg)
-        send_line_message(error_msg)
-        # スクリーンショット保存
-        try:
-            log_dir = os.path.join(BASE_DIR, "logs")
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
-            driver.save_screenshot(os.path.join(log_dir, 'reserve_error.png'))
-        except:
-            pass
-        return False
+    if not any(tenant.notification_sets for tenant in tenants.values()):
+        print("通知セットが設定されていません。")
+        return
 
-def check_calendar_once():
-    global previous_ok_sets
-    
-    options = Options()
-    options.add_argument('--headless') 
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--lang=ja-JP')
-    
-    user_data_dir = os.path.join(BASE_DIR, 'chrome_data')
-    options.add_argument(f'--user-data-dir={user_data_dir}')
-    options.add_argument('--profile-directory=Default')
+    # 月の取得には最初のアカウントのブラウザ（ログイン状態）を使う
+    scraper = next(iter(tenants.values()))
+    session = scraper.get_session()
 
-    driver = None
+    # 段階ごとの所要時間を記録する（cycles.jsonl に1行、/metrics に集計）
+    metrics.begin_cycle()
+    record = {'months': 0, 'changed_months': 0, 'notified': False, 'reserved': [], 'error': None}
     try:
-        driver = webdriver.Chrome(options=options)
-        
-        config = load_config()
-        notification_sets = config.get("notification_sets", [])
-        
-        if not notification_sets:
-            print("通知セットが設定されていません。")
-            return
-
-        # チェック対象の月をリストアップ
+        # セットが変わっていれば索引を作り直し、全アカウントのチェック対象の月をまとめる
         target_months = set()
-        for n_set in notification_sets:
-            start_date = datetime.datetime.strptime(n_set['start_date'], "%Y-%m-%d")
-            nights = n_set.get('nights', 1)
-            for i in range(nights):
-                check_date = start_date + datetime.timedelta(days=i)
-                target_months.add((check_date.year, check_date.month))
+        for tenant in tenants.values():
+            tenant.evaluator.load(tenant.notification_sets, latest_statuses)
+            target_months.update(tenant.evaluator.target_months)
         
+        if months is not None:
+            target_months &= set(months)
         sorted_target_months = sorted(list(target_months))
+        record['months'] = len(sorted_target_months)
 
         print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] チェック開始...")
         
-        driver.get('https://reserve.fumotoppara.net/reserved/reserved-date-selection')
-        time.sleep(5)
-
-        # ログイン確認
-        if "reserved-date-selection" not in driver.current_url:
-            print("ログインが必要です。ログイン処理を開始します...")
-            if "login" not in driver.current_url and driver.current_url != 'https://reserve.fumotoppara.net/':
-                 driver.get('https://reserve.fumotoppara.net/')
-                 time.sleep(3)
-            
-            # ... (ログイン処理省略: 既存コードと同じ) ...
-            inputs = driver.find_elements(By.TAG_NAME, 'input')
-            email_input = None
-            password_input = None
-            for inp in inputs:
-                input_type = inp.get_attribute('type')
-                placeholder = inp.get_attribute('placeholder')
-                if input_type == 'text' or input_type == 'email':
-                    if placeholder and ('メール' in placeholder or 'mail' in placeholder.lower()):
-                        email_input = inp
-                    elif email_input is None and input_type != 'password':
-                        email_input = inp
-                if input_type == 'password':
-                    password_input = inp
-            
-            if email_input and password_input:
-                email_input.clear()
-                email_input.send_keys(EMAIL_ADDRESS)
-                password_input.clear()
-                password_input.send_keys(PASSWORD)
-                buttons = driver.find_elements(By.TAG_NAME, 'button')
-                login_btn = None
-                for btn in buttons:
-                    if 'ログイン' in btn.text:
-                        login_btn = btn
+        # 自動予約セットは各アカウントの専用タブで対象月を表示して待機させておく
+        for tenant in tenants.values():
+            prepare_reservation_lanes(tenant)
+
+        # 空きを見つけたら、ログ保存や通知より先にすぐ自動予約を実行する（1サイクルにつき1アカウント1つだけ）
+        auto_reserve_targets = {} # {アカウント名: 自動予約したセット}
+
+        def reserve_if_available(statuses):
+            for tenant in tenants.values():
+                if tenant.name in auto_reserve_targets:
+                    continue
+                for n_set in tenant.auto_sets():
+                    if evaluate_set(n_set, statuses)[0]:
+                        auto_reserve_targets[tenant.name] = n_set
+                        record['reserved'].append(tenant.label(n_set['name']))
+                        print(tenant.label(f"自動予約を実行します: {n_set['name']}"))
+                        perform_auto_reservation(tenant, n_set)
                         break
-                if login_btn:
-                    login_btn.click()
-                    time.sleep(5)
-
-        # 全日付のステータス取得
-        all_date_statuses = {}
-        for year, month in sorted_target_months:
-            print(f"{year}年{month}月のカレンダーを取得中...")
-            buttons = driver.find_elements(By.TAG_NAME, 'button')
-            target_month_btn = None
-            for btn in buttons:
-                if f'{month}月' in btn.text:
-                    target_month_btn = btn
-                    break
-            
-            if not target_month_btn:
-                continue
-
-            target_month_btn.click()
-            time.sleep(3)
-            
-            rows = driver.find_elements(By.TAG_NAME, 'tr')
-            header_row = rows[0]
-            header_cells = header_row.find_elements(By.TAG_NAME, 'th')
-            if not header_cells: header_cells = header_row.find_elements(By.TAG_NAME, 'td')
-            
-            date_col_indices = {} 
-            for i, cell in enumerate(header_cells):
-                text = cell.text.replace('\n', ' ').strip()
-                parts = text.split(' ')
-                if parts and '/' in parts[0]:
-                     date_str = parts[0]
-                     date_col_indices[date_str] = i
-            
-            target_row = None
-            for row in rows:
-                if 'キャンプ宿泊' in row.text:
-                    target_row = row
-                    break
-            
-            if target_row:
-                cells = target_row.find_elements(By.TAG_NAME, 'td')
-                index_offset = -1
-
-                for date_md, header_index in date_col_indices.items():
-                    data_index = header_index + index_offset
-                    if 0 <= data_index < len(cells):
-                        status = cells[data_index].text.strip()
-                        m, d = map(int, date_md.split('/'))
-                        full_date_str = f"{year}-{m:02d}-{d:02d}"
-                        all_date_statuses[full_date_str] = status
-
-        save_log_csv(all_date_statuses)
-        print(f"ステータス取得完了: {len(all_date_statuses)}日分")
-
-        # 通知 & 自動予約判定
-        current_ok_sets = set()
-        messages = []
-        auto_reserve_target = None # 自動予約するセットが見つかったらこれに入れる
-
-        for n_set in notification_sets:
-            set_id = n_set['id']
-            name = n_set['name']
-            start_date_str = n_set['start_date']
-            nights = n_set.get('nights', 1)
-            # required_count は使用しない
-            auto_reserve = n_set.get('auto_reserve', False)
-            
-            is_set_available = True
-            available_details = []
-            
-            start_date = datetime.datetime.strptime(start_date_str, "%Y-%m-%d")
-            
-            # 7日以内チェック
-            today = datetime.datetime.now()
-            days_diff = (start_date - today).days
-            if auto_reserve and 0 <= days_diff <= 7:
-                 print(f"警告: セット「{name}」は7日以内の予約です。キャンセル料が発生する可能性があります。")
-
-            for i in range(nights):
-                check_date = start_date + datetime.timedelta(days=i)
-                check_date_str = check_date.strftime('%Y-%m-%d')
-                weekday = WEEKDAYS[check_date.weekday()]
-                
-                status = all_date_statuses.get(check_date_str, "不明")
-                mark, count = parse_status(status)
-                
-                available_details.append(f"{check_date_str}({weekday}): {status}")
-                
-                # 空き判定: 〇か△ならOK
-                if mark == '×':
-                    is_set_available = False
-            
-            if is_set_available:
-                current_ok_sets.add(set_id)
-                
-                # 自動予約モードONなら、対象としてマーク（最初に見つかった1つだけ実行する方針）
-                if auto_reserve and not auto_reserve_target:
-                    auto_reserve_target = n_set
-                    # 通知メッセージにもその旨を追加
-                    msg = f"【空き発見！自動予約を開始します】\nセット: {name}\n" + "\n".join(available_details)
-                    messages.append(msg)
-                
-                # 前回NGだった場合のみ通知（自動予約対象でない場合）
-                elif set_id not in previous_ok_sets:
-                    msg = f"【空きが出ました！】\nセット: {name}\n" + "\n".join(available_details)
-                    messages.append(msg)
-
-        # 通知送信
-        if messages:
-            reserve_url = "https://reserve.fumotoppara.net/reserved/reserved-calendar-list"
-            full_message = "\n\n".join(messages) + f"\n\n予約はこちら:\n{reserve_url}"
-            print("条件を満たす空きが見つかりました！通知を送ります。")
-            send_line_message(full_message)
+
+        # まずはブラウザを使わずHTTPで取得し、だめならブラウザで取得する
+        # HTTPでは設定した1プランしか取れないので、他のプランのセットがあればブラウザで全プランをまとめて取得する
+        all_date_statuses = None
+        api_config = config.get('availability_api')
+        if api_config:
+            client = get_client(api_config)
+            if watched_plans() <= {client.plan}:
+                try:
+                    with span('api_fetch'):
+                        all_date_statuses = {client.plan: client.fetch_months(sorted_target_months)}
+                    print("HTTPで空き状況を取得しました")
+                    reserve_if_available(all_date_statuses)
+                except AvailabilityApiError as e:
+                    print(f"HTTPでの取得に失敗したため、ブラウザで取得します: {e}")
+            else:
+                print(f"HTTPでは{client.plan}しか取得できないため、ブラウザで取得します")
+
+        # 取得できた月（取得できなかった月は変化なしとして記録しない。due_months が進めた予定で取り直す）
+        fetched_months = sorted_target_months
+        if all_date_statuses is None:
+            pool = get_month_pool(config, scraper.profile_dir)
+            if pool and len(sorted_target_months) > 1:
+                # 複数のブラウザに月を振り分けて並列に取得する
+                all_date_statuses, failed_months = pool.fetch(
+                    sorted_target_months, lambda worker, chunk: fetch_months_with_session(worker, chunk, scraper),
+                    on_result=reserve_if_available)
+                if failed_months:
+                    # 作業ブラウザで取得できなかった月は、メインのブラウザで取り直す
+                    print(f"取得できなかった{len(failed_months)}か月分をメインのブラウザで取得し直します")
+                    try:
+                        statuses, read_months = fetch_months_with_session(session, failed_months, scraper,
+                                                                          on_month=reserve_if_available)
+                        merge_plan_statuses(all_date_statuses, statuses)
+                    except Exception as e:
+                        print(f"取り直しにも失敗しました（次の予定で取得します）: {e}")
+                        session.reset_page()
+                        read_months = []
+                    fetched_months = [month for month in sorted_target_months
+                                      if month not in failed_months or month in read_months]
+            else:
+                all_date_statuses, fetched_months = fetch_months_with_session(session, sorted_target_months, scraper,
+                                                                              on_month=reserve_if_available)
+                # 次回以降HTTPクライアントが使えるよう、ログイン済みのCookieを書き出しておく
+                if api_config:
+                    export_cookies(session.driver)
+
+        print(f"ステータス取得完了: {len(all_date_statuses)}プラン・{max(map(len, all_date_statuses.values()), default=0)}日分")
+
+        changed_months = merge_statuses(all_date_statuses, fetched_months)
+        record['changed_months'] = sum(changed_months.values())
+        if scheduler:
+            for month, changed in changed_months.items():
+                scheduler.record(month, changed)
+
+        # 判定は今回チェックしなかった月も含めた最新の状況で行う
+        notified = False
+        with span('notify'):
+            for tenant in tenants.values():
+                if notify_tenant(tenant, auto_reserve_targets.get(tenant.name), latest_statuses):
+                    notified = True
+        record['notified'] = notified
         
-        # 自動予約実行
-        if auto_reserve_target:
-            print(f"自動予約を実行します: {auto_reserve_target['name']}")
-            # ここで予約処理関数を呼び出す
-            perform_auto_reservation(driver, auto_reserve_target)
-        else:
+        if not notified:
             print("新たな条件を満たす空きはありませんでした（または自動予約対象外）。")
-        
-        # 状態更新
-        previous_ok_sets = current_ok_sets
 
     except Exception as e:
         print(f"エラーが発生しました: {e}")
+        record['error'] = str(e)[:200]
         import traceback
         traceback.print_exc()
-    
+        # 画面が中途半端な状態かもしれないので、次回はページを読み込み直す
+        for tenant in tenants.values():
+            if tenant.session:
+                tenant.session.reset_page()
     finally:
-        if driver:
-            driver.quit()
+        metrics.end_cycle(**record)
+        metrics.save()
+
+def restore_checkpoint(scheduler):
+    """
+    前回保存した状態（通知済みのセット・最新の空き状況・月ごとの予定・ログイン状態）から再開する
+    再起動のたびに空いているセットを通知し直したり、全部の月をすぐにチェックし直したりしないため
+    保存した状態がなければ、履歴から最新の空き状況だけを戻す
+    """
+    global tenants
+    today_str = datetime.date.today().isoformat()
+    checkpoint = load_checkpoint()
+    if checkpoint is None:
+        latest_statuses.update(get_history_store().plan_states_at(target_from=today_str)
+                               or event_log.plan_states_at(target_from=today_str))
+        return False
+
+    # 保存した空き状況に、保存の後（保存の前に止まったサイクル）のイベントだけを重ねる（ログを先頭から読み直さない）
+    saved_at = datetime.datetime.fromtimestamp(checkpoint.get('saved_at', 0))
+    latest_statuses.update(event_log.plan_states_at(base=unpack_statuses(checkpoint.get('statuses', {})),
+                                                    since=saved_at, target_from=today_str))
+    scheduler.restore_state(checkpoint.get('scheduler', {}))
+    # ためていた通知は、時間がたっていても次のまとめ通知で送る
+    notification_router.restore_state(checkpoint.get('notifications', {}))
+    age = time.time() - checkpoint.get('saved_at', 0)
+    notified = age <= NOTIFIED_MAX_AGE
+    tenants = sync_tenants(tenants, tenant_specs(load_config(), EMAIL_ADDRESS, PASSWORD))
+    for name, tenant in tenants.items():
+        restore_tenant(tenant, checkpoint.get('tenants', {}).get(name, {}), notified)
+    saved_at = saved_at.strftime('%Y-%m-%d %H:%M:%S')
+    if notified:
+        print(f"{saved_at} に保存した監視の状態から再開します")
+    else:
+        print(f"{saved_at} に保存した監視の状態から再開します（時間がたっているため、通知済みのセットは引き継ぎません）")
+    return True
+
+def save_state(scheduler):
+    save_checkpoint(build_checkpoint(tenants, latest_statuses, scheduler, notification_router))
+
+def close_tenants():
+    for tenant in tenants.values():
+        tenant.close()
 
 def monitor_loop():
     config = load_config()
     print("ふもとっぱら予約監視システムを開始します。")
-    print(f"チェック間隔: {config.get('check_interval', 600)}秒")
+    print(f"基本のチェック間隔: {config.get('check_interval', 600)}秒（日付の近さ・自動予約・変化の有無で月ごとに調整します）")
     print("停止するには Ctrl+C を押してください。")
     
-    check_calendar_once()
-    
-    while True:
-        try:
-            config = load_config()
-            interval = config.get('check_interval', 600)
-            time.sleep(interval)
-            check_calendar_once()
-        except KeyboardInterrupt:
-            print("\n監視を終了します。")
-            break
+    # 前回の監視プログラムが強制終了されていた場合などに取り残されたブラウザを片付ける
+    for profile_dir in profile_dirs():
+        reap_orphans(profile_dir)
+
+    # 前回の状態を復元しておく（再起動直後に全日付を「変化」として記録したり、通知済みのセットを通知し直したりしないため）
+    scheduler = PollScheduler()
+    restore_checkpoint(scheduler)
+
+    # 前回送れなかった通知があれば送る
+    line_dispatcher.start()
+    # broadcast の通数を数えるための友だちの人数（チェックの途中では LINE に問い合わせない）
+    notification_router.configure_from(config)
+    notification_router.refresh_audience()
+
+    # 設定画面でセットが追加・変更されたら、待ち時間の途中でもすぐに起こしてもらう
+    config_watcher.start()
+    print(f"設定ファイルの変更を監視しています（{config_watcher.mode}）")
+
+    previous_config = None
+    try:
+        while True:
+            try:
+                config = load_config()
+                scheduler.configure_from(config)
+                browser_watchdog.configure_from(config)
+                # 全アカウントのセットをまとめてスケジュールする（同じ月は1回だけ取得する）
+                notification_sets = all_notification_sets(config)
+                scheduler.set_targets(notification_sets)
+                if previous_config is not None and config is not previous_config:
+                    # 追加・変更されたセットの月だけを今すぐチェックする
+                    edited = changed_sets(all_notification_sets(previous_config), notification_sets)
+                    if edited:
+                        print(f"設定が変更されました: {', '.join(n_set['name'] for n_set in edited)}")
+                        scheduler.expedite(month_targets(edited))
+                previous_config = config
+
+                # 上限が近くてためておいた通知があれば、まとめて送る
+                notification_router.flush_digest(footer=RESERVE_FOOTER)
+
+                due_months = scheduler.due_months()
+                if due_months:
+                    check_calendar_once(due_months, scheduler)
+                    scheduler.save()
+                    save_state(scheduler)
+                    for item in scheduler.upcoming():
+                        print(f"  次回 {item['month']}: {item['next_check']}（間隔 {item['interval']}秒）")
+
+                # 次のチェックまで余裕があれば、その間にブラウザの作り直しとログインの確認・更新、友だちの人数の取得を済ませておく
+                if scheduler.seconds_until_next() > IDLE_REFRESH_MIN_SECONDS:
+                    supervise_browsers()
+                    refresh_sessions()
+                    notification_router.refresh_audience()
+
+                # 次のチェックまで待つ（設定が変わればすぐに起こされる）
+                # まとめ通知を送れるよう、長くても1分ごとに確認し直す
+                config_watcher.wait(min(scheduler.seconds_until_next(), 60))
+            except KeyboardInterrupt:
+                print("\n監視を終了します。")
+                break
+    finally:
+        # ブラウザ（アカウントごと）を終了する
+        config_watcher.stop()
+        save_state(scheduler)
+        close_tenants()
+        if month_pool:
+            month_pool.close()
+        # 残っている通知を送り切る（送れなかった分は次回起動時に送る）
+        line_dispatcher.stop()
+        metrics.save()
 
 if __name__ == "__main__":
     monitor_loop()
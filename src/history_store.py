@@ -0,0 +1,214 @@
+import csv
+import datetime
+import glob
+import os
+import sqlite3
+import sys
+import threading
+import urllib.request
+
+from calendar_extractor import DEFAULT_PLAN
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(BASE_DIR, 'logs')
+HISTORY_DB = os.path.join(LOG_DIR, 'history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    observed_at TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    status TEXT NOT NULL,
+    prev_status TEXT,
+    PRIMARY KEY (observed_at, target_date, plan)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_observations_target ON observations (target_date, plan, observed_at);
+"""
+
+
+def _ts(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    return value
+
+
+class HistoryStore:
+    """
+    空き状況の変化を記録する SQLite（WALモード）の履歴データベース
+    (観測時刻, 対象日, プラン) をキーに、変化した時点のステータスだけを保存する
+    対象日・観測時刻のどちらの範囲検索もインデックスで引ける
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+
+    def write_events(self, events, observed_at=None):
+        """
+        1サイクル分の変化をまとめて1トランザクションで書き込む
+        """
+        if not events:
+            return
+        ts = _ts(observed_at or datetime.datetime.now())
+        rows = [(event.get('ts', ts), event['date'], event.get('plan', DEFAULT_PLAN), event['to'], event['from'])
+                for event in events]
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO observations (observed_at, target_date, plan, status, prev_status) '
+                    'VALUES (?, ?, ?, ?, ?)', rows)
+        except Exception as e:
+            print(f"履歴の保存に失敗しました: {e}")
+
+    @staticmethod
+    def _build_query(target_from=None, target_to=None, observed_from=None, observed_to=None,
+                     plan=None, after=None, limit=None):
+        where, params = [], []
+        if target_from:
+            where.append('target_date >= ?')
+            params.append(target_from)
+        if target_to:
+            where.append('target_date <= ?')
+            params.append(target_to)
+        if observed_from:
+            where.append('observed_at >= ?')
+            params.append(_ts(observed_from))
+        if observed_to:
+            where.append('observed_at <= ?')
+            params.append(_ts(observed_to))
+        if plan:
+            where.append('plan = ?')
+            params.append(plan)
+        if after:
+            # カーソル（前のページの最後の行のキー）より後ろから
+            where.append('(observed_at, target_date, plan) > (?, ?, ?)')
+            params.extend(after)
+
+        sql = 'SELECT observed_at, target_date, plan, status, prev_status FROM observations'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY observed_at, target_date, plan'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return sql, params
+
+    def query(self, target_from=None, target_to=None, observed_from=None, observed_to=None,
+              plan=None, after=None, limit=None):
+        """
+        条件に合う変化を観測時刻の古い順に返す
+        after に (observed_at, target_date, plan) を渡すと、その行より後ろから返す（ページ送り用）
+        """
+        sql, params = self._build_query(target_from, target_to, observed_from, observed_to, plan, after, limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def iter_query(self, batch_size=500, **filters):
+        """
+        query と同じ条件の結果を少しずつ読み出して返す（広い範囲でも全件をメモリに載せない）
+        読み取り専用の別接続を使うので、書き込み中でもブロックしない
+        """
+        sql, params = self._build_query(**filters)
+        if self.path == ':memory:':
+            conn = self.conn
+        else:
+            conn = sqlite3.connect(f'file:{urllib.request.pathname2url(self.path)}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            if conn is not self.conn:
+                conn.close()
+
+    def state_at(self, when=None, plan=DEFAULT_PLAN):
+        """
+        指定時刻（省略時は最新）の {対象日: ステータス}
+        """
+        until = _ts(when) if when else '9999'
+        sql = """
+            SELECT target_date, status FROM observations AS o
+            WHERE plan = ? AND observed_at = (
+                SELECT MAX(observed_at) FROM observations
+                WHERE target_date = o.target_date AND plan = o.plan AND observed_at <= ?
+            )
+        """
+        with self.lock:
+            return {row['target_date']: row['status'] for row in self.conn.execute(sql, (plan, until))}
+
+    def plan_states_at(self, when=None, target_from=None):
+        """
+        指定時刻（省略時は最新）の全プランの {プラン: {対象日: ステータス}}
+        target_from を渡すと、その日より前の対象日（過ぎた日付）は含めない
+        """
+        until = _ts(when) if when else '9999'
+        sql = """
+            SELECT plan, target_date, status FROM observations AS o
+            WHERE target_date >= ? AND observed_at = (
+                SELECT MAX(observed_at) FROM observations
+                WHERE target_date = o.target_date AND plan = o.plan AND observed_at <= ?
+            )
+        """
+        states = {}
+        with self.lock:
+            for row in self.conn.execute(sql, (target_from or '', until)):
+                states.setdefault(row['plan'], {})[row['target_date']] = row['status']
+        return states
+
+    def import_csv(self, paths):
+        """
+        以前の logs/YYYY-MM-DD.csv（1チェック1行の全日付スナップショット）を変化の履歴として取り込む
+        ヘッダーと列数が合わない行（途中でセットが変わった行）は日付を特定できないため読み飛ばす
+        """
+        state = {}
+        imported = skipped = 0
+        for path in sorted(paths):
+            day = os.path.basename(path)[:10]
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header or header[0] != 'Timestamp':
+                    continue
+                dates = header[1:]
+                for row in reader:
+                    if len(row) != len(header):
+                        skipped += 1
+                        continue
+                    events = []
+                    for date_str, status in zip(dates, row[1:]):
+                        if state.get(date_str) != status:
+                            events.append({'date': date_str, 'from': state.get(date_str), 'to': status})
+                            state[date_str] = status
+                    self.write_events(events, observed_at=f"{day}T{row[0]}")
+                    imported += 1
+        return imported, skipped
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    # 使い方: python3 src/history_store.py import
+    if len(sys.argv) > 1 and sys.argv[1] == 'import':
+        csv_paths = glob.glob(os.path.join(LOG_DIR, '*.csv'))
+        store = HistoryStore()
+        imported, skipped = store.import_csv(csv_paths)
+        print(f"{len(csv_paths)}ファイルから{imported}行を取り込みました（列数が合わず読み飛ばした行: {skipped}）")
+        store.close()
+    else:
+        print("使い方: python3 src/history_store.py import")
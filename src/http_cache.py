@@ -0,0 +1,152 @@
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    # brotli が入っていなければ gzip だけを使う
+    brotli = None
+
+# この大きさ未満のファイルは圧縮しない（ヘッダーの方が大きくなる）
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+def http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(headers, etag, mtime):
+    """
+    If-None-Match / If-Modified-Since から、クライアントの持っている内容が最新かどうかを判定する
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since and mtime is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+class CachedFile:
+    """
+    ファイルの内容を ETag・更新時刻と一緒にメモリに持つ
+    リクエストごとには stat だけを行い、ファイルが書き換えられたときだけ読み直す
+    """
+
+    def __init__(self, path, default=b''):
+        self.path = path
+        self.default = default
+        self.lock = threading.Lock()
+        self.key = None
+        self.body = default
+        self.etag = make_etag(default)
+        self.mtime = None
+
+    def get(self):
+        """
+        (内容, ETag, 更新時刻) を返す。ファイルがなければ既定の内容（更新時刻は None）
+        """
+        try:
+            stat = os.stat(self.path)
+            key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat = None
+            key = None
+
+        with self.lock:
+            if key != self.key:
+                if stat is None:
+                    self.body, self.mtime = self.default, None
+                else:
+                    try:
+                        with open(self.path, 'rb') as f:
+                            self.body = f.read()
+                        self.mtime = stat.st_mtime
+                    except OSError:
+                        self.body, self.mtime = self.default, None
+                        key = None
+                self.etag = make_etag(self.body)
+                self.key = key
+            return self.body, self.etag, self.mtime
+
+
+class StaticAsset:
+    def __init__(self, path, stat):
+        self.key = (stat.st_mtime_ns, stat.st_size)
+        self.mtime = stat.st_mtime
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        self.etag = make_etag(self.body)
+
+        # 圧縮版は読み込んだときに一度だけ作っておく
+        self.variants = {}
+        if len(self.body) >= MIN_COMPRESS_SIZE and self.content_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(self.body)
+            self.variants['gzip'] = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+    def select(self, accept_encoding):
+        """
+        Accept-Encoding に合わせて (内容, Content-Encoding, ETag) を返す
+        """
+        accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and encoding in accepted:
+                return self.variants[encoding], encoding, self.etag[:-1] + '-' + encoding + '"'
+        return self.body, None, self.etag
+
+
+class StaticAssets:
+    """
+    web/ の静的ファイルを圧縮済みの状態でメモリに持つ
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.assets = {}
+
+    def get(self, path):
+        """
+        path のファイルを返す（なければ None）。ファイルが書き換えられていれば読み直す
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        with self.lock:
+            asset = self.assets.get(path)
+            if asset is None or asset.key != (stat.st_mtime_ns, stat.st_size):
+                asset = StaticAsset(path, stat)
+                self.assets[path] = asset
+            return asset
+
+    def preload(self, root):
+        """
+        起動時に root 以下のファイルをまとめて読み込み・圧縮しておく
+        """
+        count = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if self.get(os.path.join(dirpath, filename)):
+                    count += 1
+        return count
@@ -0,0 +1,290 @@
+import datetime
+import glob
+import json
+import os
+import queue
+import random
+import threading
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics, span
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTBOX_DIR = os.path.join(BASE_DIR, 'logs', 'line_outbox')
+
+# テスト用の偽サーバーなどに向けるときは .env の LINE_API_BASE で変更する
+DEFAULT_API_BASE = 'https://api.line.me'
+
+# (接続, 応答) のタイムアウト秒数
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Messaging API の1リクエストあたりの上限
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_MULTICAST_RECIPIENTS = 500
+MAX_TEXT_LENGTH = 5000
+
+
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def split_text(text, limit=MAX_TEXT_LENGTH):
+    """
+    1通の上限を超える長さのテキストを、なるべく改行の位置で分ける
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text:
+        parts.append(text)
+    return parts
+
+
+def text_messages(texts):
+    if isinstance(texts, str):
+        texts = [texts]
+    return [{'type': 'text', 'text': part} for text in texts for part in split_text(text)]
+
+
+class LineDispatcher:
+    """
+    LINE通知を裏のスレッドで送る
+    ・送る前にメッセージを outbox（1通1ファイル）に書き出すので、送れないまま終了しても次回起動時に送り直す
+    ・429 / 5xx / 通信エラーは指数バックオフで再送する（Retry-After があれば従う）
+    ・同じメッセージの再送には同じ X-Line-Retry-Key を付け、二重に届かないようにする
+    呼び出し側（チェックや自動予約）は送信の完了を待たない
+    """
+
+    def __init__(self, token, api_base=None, outbox_dir=OUTBOX_DIR, maxsize=100,
+                 timeout=DEFAULT_TIMEOUT, max_attempts=8, base_delay=1.0, max_delay=300.0):
+        self.token = token
+        self.api_base = (api_base or os.getenv('LINE_API_BASE') or DEFAULT_API_BASE).rstrip('/')
+        self.outbox_dir = outbox_dir
+        self.failed_dir = os.path.join(outbox_dir, 'failed')
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.queue = queue.Queue(maxsize)
+        self.queued = set()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        # LINE から月間上限に達したと返された月（"YYYY-MM"）
+        self.quota_exhausted_month = None
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        # 前回送れなかったメッセージから送る
+        self._load_outbox()
+        self.thread = threading.Thread(target=self._run, name='line-dispatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        """
+        キューに残っている分を timeout 秒まで送ってから止める（送れなかった分は outbox に残る）
+        """
+        if self.thread is None:
+            return
+        self.flush(timeout)
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+        self.thread = None
+
+    def flush(self, timeout=None):
+        """
+        キューが空になるまで待つ。空になれば True
+        """
+        deadline = None if timeout is None else datetime.datetime.now() + datetime.timedelta(seconds=timeout)
+        while self.queue.unfinished_tasks:
+            if deadline and datetime.datetime.now() >= deadline:
+                return False
+            if self.stop_event.wait(0.05):
+                return False
+        return True
+
+    def broadcast(self, texts):
+        """
+        友だち全員に送る（5通ずつのリクエストに分ける）
+        """
+        return [self.enqueue('broadcast', {'messages': batch})
+                for batch in chunked(text_messages(texts), MAX_MESSAGES_PER_REQUEST)]
+
+    def push(self, to, texts):
+        return [self.enqueue('push', {'to': to, 'messages': batch})
+                for batch in chunked(text_messages(texts), MAX_MESSAGES_PER_REQUEST)]
+
+    def multicast(self, to, texts):
+        """
+        複数のユーザーに同じ内容を送る（500人・5通ずつのリクエストに分ける）
+        """
+        paths = []
+        for recipients in chunked(sorted(set(to)), MAX_MULTICAST_RECIPIENTS):
+            for batch in chunked(text_messages(texts), MAX_MESSAGES_PER_REQUEST):
+                paths.append(self.enqueue('multicast', {'to': recipients, 'messages': batch}))
+        return paths
+
+    def follower_count(self, date=None):
+        """
+        broadcast が届く友だちの人数（date の集計、省略時は前日）。LINE がまだ集計していない・取得できなければ None
+        """
+        date = date or datetime.date.today() - datetime.timedelta(days=1)
+        try:
+            response = self.session.get(f"{self.api_base}/v2/bot/insight/followers",
+                                        params={'date': date.strftime('%Y%m%d')},
+                                        headers={'Authorization': f'Bearer {self.token}'}, timeout=self.timeout)
+            data = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError) as e:
+            print(f"LINEの友だちの人数を取得できませんでした: {e}")
+            return None
+        if data.get('status') != 'ready':
+            return None
+        return data.get('targetedReaches') or data.get('followers')
+
+    def enqueue(self, endpoint, body):
+        """
+        /v2/bot/message/<endpoint> に送るメッセージを outbox に書き出してキューに入れる（送信は待たない）
+        """
+        with self.lock:
+            self.seq += 1
+            name = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}-{self.seq:04d}.json"
+        item = {
+            'endpoint': endpoint,
+            'body': body,
+            'retry_key': str(uuid.uuid4()),
+            'created_at': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        path = os.path.join(self.outbox_dir, name)
+        try:
+            os.makedirs(self.outbox_dir, exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(item, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"LINE通知の outbox への保存に失敗しました（メモリ上でのみ送信します）: {e}")
+        self._put(path, item)
+        self.start()
+        return path
+
+    def _put(self, path, item):
+        with self.lock:
+            if path in self.queued:
+                return
+            try:
+                self.queue.put_nowait((path, item))
+                self.queued.add(path)
+            except queue.Full:
+                # outbox には残っているので、キューが空いたら読み込み直して送る
+                print("LINE通知のキューがいっぱいです。空きができ次第送信します。")
+
+    def _load_outbox(self):
+        for path in sorted(glob.glob(os.path.join(self.outbox_dir, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    item = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._put(path, item)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                path, item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._deliver(path, item)
+            finally:
+                with self.lock:
+                    self.queued.discard(path)
+                self.queue.task_done()
+            if self.queue.empty():
+                # キューがいっぱいで入れられなかった分を拾う
+                self._load_outbox()
+
+    def _deliver(self, path, item):
+        url = f"{self.api_base}/v2/bot/message/{item['endpoint']}"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}',
+            'X-Line-Retry-Key': item['retry_key'],
+        }
+        for attempt in range(self.max_attempts):
+            retry_after = None
+            try:
+                # 送信は裏のスレッドなので、サイクルの所要時間には含めない
+                with span('line_request', in_cycle=False):
+                    response = self.session.post(url, headers=headers, json=item['body'], timeout=self.timeout)
+                # 409 は同じ Retry-Key のメッセージを受付済み（前回の送信が実は届いていた）
+                if response.status_code in (200, 409):
+                    print(f"LINE通知({item['endpoint']})を送信しました")
+                    metrics.inc('line_sent')
+                    self._remove(path)
+                    return True
+                if response.status_code == 429 and 'monthly limit' in response.text:
+                    # 月の上限に達した場合は来月まで何度送っても届かない
+                    print("LINE通知の月間上限に達したため送信できませんでした")
+                    self.quota_exhausted_month = datetime.datetime.now().strftime('%Y-%m')
+                    self._move_to_failed(path)
+                    return False
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"LINE通知の送信に失敗しました（再送しません）: {response.status_code} {response.text[:200]}")
+                    self._move_to_failed(path)
+                    return False
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get('Retry-After')
+            except requests.RequestException as e:
+                error = str(e)
+
+            metrics.inc('line_retries')
+            delay = self._backoff(attempt, retry_after)
+            print(f"LINE通知の送信に失敗しました（{error}）。{delay:.1f}秒後に再送します（{attempt + 1}/{self.max_attempts}）")
+            if self.stop_event.wait(delay):
+                # 終了するときは outbox に残したまま次回起動時に送る
+                return False
+
+        print("LINE通知の再送回数が上限に達しました")
+        self._move_to_failed(path)
+        return False
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        # 複数のメッセージが同時に再送しないよう、ゆらぎを加える
+        delay *= random.uniform(0.8, 1.2)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _move_to_failed(self, path):
+        metrics.inc('line_failed')
+        try:
+            os.makedirs(self.failed_dir, exist_ok=True)
+            os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+        except OSError:
+            pass
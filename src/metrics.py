@@ -0,0 +1,251 @@
+import collections
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS_FILE = os.path.join(BASE_DIR, 'logs', 'metrics.json')
+CYCLES_FILE = os.path.join(BASE_DIR, 'logs', 'cycles.jsonl')
+
+# ヒストグラムの区切り（秒）。ブラウザの操作は数十ミリ秒〜数十秒なので広めに取る
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 直近の何件からパーセンタイルを出すか
+RECENT_SIZE = 200
+QUANTILES = (0.5, 0.9, 0.99)
+
+PREFIX = 'fumotoppara'
+
+
+def quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class Histogram:
+    """
+    区切りごとの件数・合計・件数（起動してからの累計）と、直近 RECENT_SIZE 件の値を持つ
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = collections.deque(maxlen=RECENT_SIZE)
+
+    def observe(self, seconds):
+        index = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        return {
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'quantiles': {str(q): quantile(recent, q) for q in QUANTILES},
+        }
+
+
+class Metrics:
+    """
+    監視の各段階（ブラウザ起動・ログイン・月の切り替え・読み取り・履歴の書き込み・通知・予約の各手順）の所要時間を集計する
+    ・span() で囲んだ処理の時間を段階ごとのヒストグラムに加える
+    ・begin_cycle() 〜 end_cycle() の間の段階別の時間は、1サイクル1行のJSONとして cycles.jsonl に追記する
+    ・save() で集計を metrics.json に書き出し、設定画面サーバーが /metrics（Prometheus形式）として返す
+    """
+
+    def __init__(self, metrics_file=METRICS_FILE, cycles_file=CYCLES_FILE):
+        self.metrics_file = metrics_file
+        self.cycles_file = cycles_file
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.histograms = {}
+        self.counters = collections.Counter()
+        self.gauges = {}
+        # ラベル付きの値 {名前: [({ラベル: 値}, 値), ...]}（ブラウザごとのメモリなど）
+        self.series = {}
+        self.cycle = None
+
+    @contextlib.contextmanager
+    def span(self, phase, in_cycle=True):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started, in_cycle)
+
+    def observe(self, phase, seconds, in_cycle=True):
+        """
+        in_cycle=False はサイクルと関係なく裏で動く処理（LINEの送信など）
+        """
+        with self.lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = Histogram()
+            histogram.observe(seconds)
+            if in_cycle and self.cycle is not None:
+                phases = self.cycle['phases']
+                phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def set_gauge_series(self, name, series):
+        """
+        ラベル付きの値をまとめて置き換える（なくなったブラウザの値が残らないように、毎回全部渡す）
+        """
+        with self.lock:
+            self.series[name] = [(dict(labels), value) for labels, value in series]
+
+    def begin_cycle(self):
+        with self.lock:
+            self.cycle = {'started': time.perf_counter(), 'phases': {}}
+
+    def end_cycle(self, **fields):
+        """
+        サイクルの合計時間を記録し、cycles.jsonl に1行追記する（fields は記録に加える項目）
+        """
+        with self.lock:
+            cycle, self.cycle = self.cycle, None
+        if cycle is None:
+            return None
+        seconds = time.perf_counter() - cycle['started']
+        self.observe('cycle', seconds, in_cycle=False)
+        self.inc('cycles')
+        if fields.get('error'):
+            self.inc('cycle_errors')
+        self.set_gauge('last_cycle_timestamp_seconds', time.time())
+
+        record = {
+            'at': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': round(seconds, 3),
+            'phases': {phase: round(value, 3) for phase, value in cycle['phases'].items()},
+        }
+        record.update(fields)
+        try:
+            os.makedirs(os.path.dirname(self.cycles_file), exist_ok=True)
+            with open(self.cycles_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        except OSError as e:
+            print(f"サイクルの記録に失敗しました: {e}")
+        return record
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started_at': self.started_at,
+                'updated_at': time.time(),
+                'buckets': list(BUCKETS),
+                'histograms': {phase: histogram.snapshot() for phase, histogram in self.histograms.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'series': {name: [{'labels': labels, 'value': value} for labels, value in series]
+                           for name, series in self.series.items()},
+            }
+
+    def save(self):
+        """
+        集計を metrics.json に書き出す（書きかけを読まれないよう置き換えで保存する）
+        """
+        try:
+            os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
+            tmp_path = self.metrics_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            print(f"計測結果の保存に失敗しました: {e}")
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_prometheus(snapshot):
+    """
+    metrics.json の内容を Prometheus のテキスト形式にする
+    """
+    lines = []
+    histograms = snapshot.get('histograms', {})
+    buckets = snapshot.get('buckets', list(BUCKETS))
+    if histograms:
+        name = f'{PREFIX}_phase_seconds'
+        lines.append(f'# HELP {name} 監視の段階ごとの所要時間（監視プログラムの起動からの累計）')
+        lines.append(f'# TYPE {name} histogram')
+        for phase in sorted(histograms):
+            histogram = histograms[phase]
+            label = f'phase="{escape_label(phase)}"'
+            cumulative = 0
+            for bound, count in zip(buckets, histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{format_value(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{{label}}} {format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{{{label}}} {histogram["count"]}')
+
+        name = f'{PREFIX}_phase_recent_seconds'
+        lines.append(f'# HELP {name} 監視の段階ごとの所要時間（直近{RECENT_SIZE}件のパーセンタイル）')
+        lines.append(f'# TYPE {name} gauge')
+        for phase in sorted(histograms):
+            for q, value in sorted(histograms[phase]['quantiles'].items()):
+                if value is not None:
+                    lines.append(f'{name}{{phase="{escape_label(phase)}",quantile="{q}"}} {format_value(value)}')
+
+    for counter, value in sorted(snapshot.get('counters', {}).items()):
+        name = f'{PREFIX}_{counter}_total'
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {format_value(value)}')
+
+    gauges = dict(snapshot.get('gauges', {}))
+    if 'started_at' in snapshot:
+        gauges['start_time_seconds'] = snapshot['started_at']
+    if 'updated_at' in snapshot:
+        # 監視プログラムが止まっていないかは、この値が古くなっていないかで分かる
+        gauges['metrics_updated_timestamp_seconds'] = snapshot['updated_at']
+    for gauge, value in sorted(gauges.items()):
+        name = f'{PREFIX}_{gauge}'
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {format_value(value)}')
+
+    for gauge, series in sorted(snapshot.get('series', {}).items()):
+        name = f'{PREFIX}_{gauge}'
+        lines.append(f'# TYPE {name} gauge')
+        for item in series:
+            labels = ','.join(f'{key}="{escape_label(value)}"' for key, value in sorted(item['labels'].items()))
+            lines.append(f'{name}{{{labels}}} {format_value(item["value"])}')
+    return '\n'.join(lines) + '\n'
+
+
+# 監視プログラム全体で共有する集計
+metrics = Metrics()
+span = metrics.span
+observe = metrics.observe
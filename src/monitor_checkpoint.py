@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINT_FILE = os.path.join(BASE_DIR, 'logs', 'checkpoint.json')
+
+# 形式を変えたら上げる（違う形式のファイルは読まない）
+CHECKPOINT_VERSION = 1
+
+# 通知済みのセットを引き継ぐのは、保存からこの秒数以内に起動し直した場合だけ
+# （長く止まっていた間に空いて埋まって空き直したセットの通知を取りこぼさないように）
+NOTIFIED_MAX_AGE = 3 * 3600
+
+# ブラウザのログイン状態のうち引き継ぐ項目
+SESSION_FIELDS = ('logged_in_at', 'session_expires_at', 'restart_count')
+
+
+def pack_statuses(statuses):
+    """
+    {プラン: {日付: ステータス}} を {プラン: [最初の日付, [1日ごとのステータス（ない日は None）]]} に詰める
+    日付は連続しているので、日付の文字列を1日ずつ持たない分だけ小さくなる
+    """
+    packed = {}
+    for plan, plan_statuses in statuses.items():
+        if not plan_statuses:
+            continue
+        dates = sorted(plan_statuses)
+        first = datetime.date.fromisoformat(dates[0])
+        days = (datetime.date.fromisoformat(dates[-1]) - first).days + 1
+        values = [None] * days
+        for date_str in dates:
+            values[(datetime.date.fromisoformat(date_str) - first).days] = plan_statuses[date_str]
+        packed[plan] = [dates[0], values]
+    return packed
+
+
+def unpack_statuses(packed):
+    statuses = {}
+    for plan, (first_str, values) in packed.items():
+        first = datetime.date.fromisoformat(first_str)
+        statuses[plan] = {(first + datetime.timedelta(days=i)).isoformat(): value
+                          for i, value in enumerate(values) if value is not None}
+    return statuses
+
+
+def set_fingerprint(n_set):
+    """
+    セットの内容の指紋（停止中に編集されたセットは、通知済みの状態を引き継がない）
+    """
+    key = json.dumps(n_set, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def tenant_state(tenant):
+    """
+    アカウントの通知済みのセット・期間のセットの通知済みの候補・ブラウザのログイン状態
+    """
+    sets = {n_set['id']: n_set for n_set in tenant.notification_sets}
+    state = {
+        'ok_sets': {str(set_id): set_fingerprint(sets[set_id]) for set_id in tenant.previous_ok_sets if set_id in sets},
+        'windows': {str(set_id): [set_fingerprint(sets[set_id]), sorted(starts)]
+                    for set_id, starts in tenant.previous_windows.items() if set_id in sets},
+    }
+    if tenant.session:
+        state['session'] = {field: getattr(tenant.session, field) for field in SESSION_FIELDS}
+    return state
+
+
+def restore_tenant(tenant, state, notified=True):
+    """
+    tenant_state で保存した状態を、今の設定のセットに合わせて戻す（内容が変わったセットは戻さない）
+    notified=False ならブラウザのログイン状態だけ戻す
+    """
+    if notified:
+        for n_set in tenant.notification_sets:
+            set_id, fingerprint = str(n_set['id']), set_fingerprint(n_set)
+            if state.get('ok_sets', {}).get(set_id) == fingerprint:
+                tenant.previous_ok_sets.add(n_set['id'])
+            saved = state.get('windows', {}).get(set_id)
+            if saved and saved[0] == fingerprint:
+                tenant.previous_windows[n_set['id']] = set(saved[1])
+    if state.get('session'):
+        # ブラウザはまだ起動しない（BrowserSession を作るだけ）
+        session = tenant.get_session()
+        for field in SESSION_FIELDS:
+            if state['session'].get(field) is not None:
+                setattr(session, field, state['session'][field])
+
+
+def build_checkpoint(tenants, statuses, scheduler, router=None, now=None):
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'saved_at': round(now or time.time(), 3),
+        'statuses': pack_statuses(statuses),
+        'scheduler': scheduler.export_state(),
+        'tenants': {name: tenant_state(tenant) for name, tenant in tenants.items()},
+    }
+    if router is not None:
+        # まとめ通知のためにためている通知
+        checkpoint['notifications'] = router.export_state()
+    return checkpoint
+
+
+def save_checkpoint(checkpoint, path=CHECKPOINT_FILE):
+    """
+    一時ファイルに書いてから置き換える（書いている途中で止まっても、前回の状態が残る）
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"監視の状態の保存に失敗しました: {e}")
+        return False
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    """
+    保存した状態を読み込む。ない・壊れている・形式が違う場合は None
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"監視の状態を読み込めませんでした（最初から始めます）: {e}")
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get('version') != CHECKPOINT_VERSION:
+        print("監視の状態の形式が違うため、最初から始めます")
+        return None
+    return checkpoint
@@ -0,0 +1,116 @@
+import concurrent.futures
+import os
+import queue
+import shutil
+import threading
+
+from browser_session import BrowserSession
+from calendar_extractor import merge_plan_statuses
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_PROFILE_DIR = os.path.join(BASE_DIR, 'chrome_data')
+WORKER_PROFILES_DIR = os.path.join(BASE_DIR, 'chrome_data_workers')
+
+# プロファイルの複製時にコピーしないもの（ロックファイルとキャッシュ）
+PROFILE_IGNORE = shutil.ignore_patterns(
+    'Singleton*', 'lockfile', 'LOCK', '*.lock',
+    'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'GrShaderCache', 'CacheStorage', 'Crashpad',
+)
+
+
+def clone_profile(src_dir, dest_dir):
+    """
+    ログイン済みの chrome_data を作業用にコピーする（Chromeは同じユーザーデータを複数で共有できないため）
+    """
+    if os.path.exists(dest_dir):
+        shutil.rmtree(dest_dir, ignore_errors=True)
+    if os.path.exists(src_dir):
+        shutil.copytree(src_dir, dest_dir, ignore=PROFILE_IGNORE)
+    else:
+        os.makedirs(dest_dir)
+
+
+def split_months(months, n):
+    """
+    月のリストを連続したまとまりにn分割する（1回の表示に続く月も含まれるので、まとまりの方が無駄が少ない）
+    """
+    months = sorted(months)
+    n = max(1, min(n, len(months)))
+    size, extra = divmod(len(months), n)
+    chunks = []
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(months[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+class MonthFetchPool:
+    """
+    複数のブラウザで月ごとのカレンダー取得を並列に行うプール
+    各ブラウザは chrome_data を複製したプロファイルで動き、同時アクセス数は max_concurrency で制限する
+    """
+
+    def __init__(self, size, max_concurrency=None, base_profile_dir=BASE_PROFILE_DIR,
+                 profiles_dir=WORKER_PROFILES_DIR, lean=False):
+        self.size = size
+        self.lean = lean
+        self.max_concurrency = max_concurrency or size
+        self.base_profile_dir = base_profile_dir
+        self.profiles_dir = profiles_dir
+
+        self.sessions = queue.Queue()
+        self.all_sessions = []
+        for i in range(size):
+            profile_dir = os.path.join(profiles_dir, f'worker{i + 1}')
+            clone_profile(base_profile_dir, profile_dir)
+            session = BrowserSession(user_data_dir=profile_dir, lean=lean)
+            self.all_sessions.append(session)
+            self.sessions.put(session)
+
+        self.semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix='month-worker')
+
+    def _run(self, fetch, months):
+        session = self.sessions.get()
+        try:
+            with self.semaphore:
+                return fetch(session, months)
+        except Exception:
+            # 次回はページを読み込み直す
+            session.reset_page()
+            raise
+        finally:
+            self.sessions.put(session)
+
+    def fetch(self, months, fetch, on_result=None):
+        """
+        months を作業ブラウザに振り分けて fetch(session, months) -> (空き状況, 読み取れた月) を並列に実行する
+        -> (結果 {プラン: {日付: ステータス}} のまとめ, 取得に失敗した・読み取れなかった月のリスト)
+        on_result を渡すと、いずれかの結果が届くたびにそれまでのまとめを渡して呼び出す
+        """
+        all_statuses = {}
+        failed_months = []
+        futures = {self.executor.submit(self._run, fetch, chunk): chunk for chunk in split_months(months, self.size)}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                statuses, read_months = future.result()
+            except Exception as e:
+                print(f"並列取得の一部に失敗しました（{len(futures[future])}か月分）: {e}")
+                failed_months.extend(futures[future])
+                continue
+            merge_plan_statuses(all_statuses, statuses)
+            failed_months.extend(month for month in futures[future] if month not in read_months)
+            if on_result:
+                on_result(all_statuses)
+        return all_statuses, sorted(failed_months)
+
+    def matches(self, size, max_concurrency, lean=False):
+        return self.size == size and self.max_concurrency == (max_concurrency or size) and self.lean == lean
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for session in self.all_sessions:
+            session.quit()
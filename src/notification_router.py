@@ -0,0 +1,239 @@
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+
+from line_dispatcher import MAX_TEXT_LENGTH, split_text
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUOTA_FILE = os.path.join(BASE_DIR, 'logs', 'line_quota.json')
+
+# 通知先を指定していないセットは友だち全員に送る
+BROADCAST = None
+
+# line_broadcast_audience がないときに、LINE から友だちの人数を取り直す間隔（秒）
+FOLLOWERS_REFRESH = 24 * 3600
+
+
+class QuotaTracker:
+    """
+    その月に送ったメッセージ数（LINEの課金単位: 通数 × 送信先の人数）と、直近1時間の送信数を記録する
+    月が変わったら数え直す
+    """
+
+    def __init__(self, path=QUOTA_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.month = None
+        self.used = 0
+        self.recent = collections.deque()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.month = data.get('month')
+            self.used = data.get('used', 0)
+            self.recent = collections.deque(data.get('recent', []))
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'month': self.month, 'used': self.used, 'recent': list(self.recent)}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"LINE通知数の保存に失敗しました: {e}")
+
+    def _roll(self, now):
+        month = datetime.datetime.fromtimestamp(now).strftime('%Y-%m')
+        if month != self.month:
+            self.month = month
+            self.used = 0
+        while self.recent and now - self.recent[0][0] >= 3600:
+            self.recent.popleft()
+
+    def record(self, count, now=None):
+        now = now or time.time()
+        with self.lock:
+            self._roll(now)
+            self.used += count
+            self.recent.append((now, count))
+            self._save()
+
+    def used_this_month(self, now=None):
+        with self.lock:
+            self._roll(now or time.time())
+            return self.used
+
+    def sent_last_hour(self, now=None):
+        with self.lock:
+            self._roll(now or time.time())
+            return sum(count for _, count in self.recent)
+
+
+class NotificationRouter:
+    """
+    1サイクル分の通知を送信先ごとにまとめて送る
+    ・同じ内容を受け取る人はまとめて multicast（セットに recipients がなければ broadcast）
+    ・月間の上限や1時間あたりの上限に近づいたら、急ぎでない通知はためておき、まとめ通知（ダイジェスト）にする
+    """
+
+    def __init__(self, dispatcher, quota=None):
+        self.dispatcher = dispatcher
+        self.quota = quota or QuotaTracker()
+        self.pending = collections.OrderedDict()
+        self.last_digest = 0.0
+        # LINE から取得した友だちの人数と、取得を試みた時刻
+        self.followers = None
+        self.followers_checked = 0.0
+        self.configure()
+
+    def configure(self, monthly_quota=200, broadcast_audience=None, digest_threshold=0.2,
+                  hourly_limit=None, digest_interval=1800):
+        self.monthly_quota = monthly_quota
+        self.broadcast_audience = broadcast_audience
+        self.digest_threshold = digest_threshold
+        self.hourly_limit = hourly_limit
+        self.digest_interval = digest_interval
+
+    def configure_from(self, config):
+        """
+        config.json の line_monthly_quota / line_broadcast_audience / line_digest_threshold /
+        line_hourly_limit / line_digest_interval を反映する
+        """
+        self.configure(
+            monthly_quota=config.get('line_monthly_quota', 200),
+            broadcast_audience=config.get('line_broadcast_audience'),
+            digest_threshold=config.get('line_digest_threshold', 0.2),
+            hourly_limit=config.get('line_hourly_limit'),
+            digest_interval=config.get('line_digest_interval', 1800),
+        )
+
+    def remaining(self, now=None):
+        if not self.monthly_quota:
+            return None
+        return max(0, self.monthly_quota - self.quota.used_this_month(now))
+
+    def near_limit(self, now=None):
+        """
+        月間の残りがしきい値を下回った、または1時間あたりの上限に達したら True
+        """
+        now = now or time.time()
+        if self.dispatcher.quota_exhausted_month == datetime.datetime.fromtimestamp(now).strftime('%Y-%m'):
+            return True
+        remaining = self.remaining(now)
+        if remaining is not None and remaining <= self.monthly_quota * self.digest_threshold:
+            return True
+        if self.hourly_limit and self.quota.sent_last_hour(now) >= self.hourly_limit:
+            return True
+        return False
+
+    def refresh_audience(self, now=None):
+        """
+        line_broadcast_audience がなければ、LINE から友だちの人数を取り直す（1日に1回）
+        LINE への問い合わせを待つので、チェックや自動予約の途中ではなく、起動時とチェックの合間に呼び出す
+        """
+        if self.broadcast_audience:
+            return
+        now = now or time.time()
+        if now - self.followers_checked < FOLLOWERS_REFRESH:
+            return
+        self.followers_checked = now
+        self.followers = self.dispatcher.follower_count() or self.followers
+        if self.followers is None:
+            print("LINEの友だちの人数が分からないため、broadcast を1人分として数えます"
+                  "（config.json に line_broadcast_audience を設定してください）")
+
+    def audience(self):
+        """
+        broadcast が届く人数（LINEは届いた人数分を数える）
+        line_broadcast_audience があればその値、なければ refresh_audience で取得しておいた友だちの人数
+        """
+        return self.broadcast_audience or self.followers or 1
+
+    def _cost(self, recipient_key, message_count):
+        audience = self.audience() if recipient_key is BROADCAST else len(recipient_key)
+        return audience * message_count
+
+    def _send_grouped(self, texts_by_recipient, footer='', now=None):
+        """
+        {送信先: [テキスト]} を、同じ内容を受け取る送信先ごとにまとめて送る
+        """
+        groups = collections.OrderedDict()
+        for recipient, texts in texts_by_recipient.items():
+            text = "\n\n".join(texts) + footer
+            groups.setdefault(text, []).append(recipient)
+
+        for text, recipients in groups.items():
+            message_count = len(split_text(text))
+            users = [r for r in recipients if r is not BROADCAST]
+            if BROADCAST in recipients:
+                self.dispatcher.broadcast(text)
+                self.quota.record(self._cost(BROADCAST, message_count), now)
+            if users:
+                self.dispatcher.multicast(users, text)
+                self.quota.record(self._cost(users, message_count), now)
+
+    def send(self, items, footer='', urgent=False, now=None):
+        """
+        items: [(送信先のリスト or None, テキスト)]
+        急ぎでない通知は、上限が近いときはためておいて flush_digest() でまとめて送る
+        """
+        texts_by_recipient = collections.OrderedDict()
+        for recipients, text in items:
+            for recipient in (recipients or [BROADCAST]):
+                texts_by_recipient.setdefault(recipient, []).append(text)
+        if not texts_by_recipient:
+            return
+
+        if not urgent and self.near_limit(now):
+            for recipient, texts in texts_by_recipient.items():
+                self.pending.setdefault(recipient, []).extend(texts)
+            print(f"LINE通知の上限が近いため、まとめ通知にします（今月の残り: {self.remaining(now)}通）")
+            return
+        self._send_grouped(texts_by_recipient, footer, now)
+
+    def flush_digest(self, footer='', now=None, force=False):
+        """
+        ためておいた通知を、前回のまとめ通知から digest_interval 秒以上経っていれば1通にまとめて送る
+        """
+        now = now or time.time()
+        if not self.pending:
+            return False
+        if not force and now - self.last_digest < self.digest_interval:
+            return False
+        if not force and self.monthly_quota and self.remaining(now) == 0:
+            return False
+
+        digests = collections.OrderedDict()
+        for recipient, texts in self.pending.items():
+            header = f"【まとめ通知】{len(texts)}件の空き情報があります"
+            digests[recipient] = [header + "\n\n" + "\n\n".join(texts)]
+        self.pending.clear()
+        self.last_digest = now
+        # まとめ通知は1人につき1通に収まるよう、長すぎる分は切り詰める
+        for recipient, texts in digests.items():
+            if len(texts[0]) + len(footer) > MAX_TEXT_LENGTH:
+                texts[0] = texts[0][:MAX_TEXT_LENGTH - len(footer) - 20] + "\n…（以下省略）"
+        self._send_grouped(digests, footer, now)
+        return True
+
+    def export_state(self):
+        """
+        ためている通知と前回のまとめ通知の時刻（再起動しても、ためていた通知を失わないように）
+        """
+        return {'pending': [[recipient, texts] for recipient, texts in self.pending.items()],
+                'last_digest': self.last_digest}
+
+    def restore_state(self, state):
+        for recipient, texts in state.get('pending', []):
+            self.pending.setdefault(recipient, []).extend(texts)
+        self.last_digest = state.get('last_digest', self.last_digest)
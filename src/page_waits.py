@@ -0,0 +1,129 @@
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+# 固定の time.sleep の代わりに「画面がその状態になるまで」短い間隔で確認しながら待つ
+# 条件はすべて1回の execute_script で判定できるJSにしてある
+
+_VISIBLE_JS = """
+var visible = function (el) { return !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length)); };
+var visibleButton = function (test) {
+    var buttons = document.querySelectorAll('button');
+    for (var i = 0; i < buttons.length; i++) {
+        var t = (buttons[i].innerText || '').trim();
+        if (visible(buttons[i]) && test(t)) { return true; }
+    }
+    return false;
+};
+"""
+
+CONDITIONS = {
+    # ページの読み込みが終わり、カレンダーかログインフォームのどちらかが表示された
+    'page_ready': """
+        if (document.readyState !== 'complete') { return false; }
+        return !!(document.querySelector('table tr') || document.querySelector('input[type=password]'));
+    """,
+    # ログインフォームが表示された
+    'login_form': """
+        return visible(document.querySelector('input[type=password]'));
+    """,
+    # ログインが終わりカレンダーページに移った
+    'calendar_page': """
+        return location.href.indexOf('reserved-date-selection') !== -1
+            && document.querySelectorAll('table tr').length > 1;
+    """,
+    # 選択した月のカレンダーが描画された (arguments[0] = 月)
+    'calendar_month': """
+        var mask = document.querySelector('.el-loading-mask');
+        if (mask && visible(mask)) { return false; }
+        var th = document.querySelectorAll('table tr:first-child th, table tr:first-child td');
+        for (var i = 0; i < th.length; i++) {
+            var t = (th[i].innerText || th[i].textContent || '').trim();
+            if (t.indexOf('/') !== -1) { return t.indexOf(arguments[0] + '/') === 0; }
+        }
+        return false;
+    """,
+    # watch_calendar_redraw の後にページが書き換わり、選択した月のカレンダーが描画された (arguments[0] = 月)
+    'calendar_redrawn': """
+        if (!window.__calendarRedrawn) { return false; }
+        var mask = document.querySelector('.el-loading-mask');
+        if (mask && visible(mask)) { return false; }
+        var th = document.querySelectorAll('table tr:first-child th, table tr:first-child td');
+        for (var i = 0; i < th.length; i++) {
+            var t = (th[i].innerText || th[i].textContent || '').trim();
+            if (t.indexOf('/') !== -1) { return t.indexOf(arguments[0] + '/') === 0; }
+        }
+        return false;
+    """,
+    # 日付セルをクリックした後のポップアップ（予約へ進むボタン）が表示された
+    'popup_visible': """
+        return visibleButton(function (t) {
+            return (t.indexOf('予約') !== -1 && t.indexOf('進む') !== -1) || t.indexOf('予約する') !== -1;
+        });
+    """,
+    # el-select のドロップダウンが開いた
+    'select_dropdown': """
+        var items = document.querySelectorAll('.el-select-dropdown__item');
+        for (var i = 0; i < items.length; i++) { if (visible(items[i])) { return true; } }
+        return false;
+    """,
+    # 予約詳細ページの入力フォームが表示された
+    'detail_form': """
+        var labels = document.querySelectorAll('label');
+        for (var i = 0; i < labels.length; i++) {
+            if (visible(labels[i]) && (labels[i].innerText || '').indexOf('大人') !== -1) { return true; }
+        }
+        return false;
+    """,
+    # 確認画面（確定ボタン）が表示された
+    'confirm_page': """
+        return visibleButton(function (t) { return t.indexOf('確定') !== -1 || t.indexOf('予約する') !== -1; });
+    """,
+    # 予約完了画面に移った
+    'completion_page': """
+        var text = document.body ? (document.body.innerText || '') : '';
+        return location.href.indexOf('complete') !== -1 || text.indexOf('完了しました') !== -1
+            || text.indexOf('受け付けました') !== -1;
+    """,
+}
+
+# 条件ごとのタイムアウト（秒）
+DEFAULT_TIMEOUTS = {
+    'page_ready': 20,
+    'login_form': 10,
+    'calendar_page': 15,
+    'calendar_month': 10,
+    'calendar_redrawn': 5,
+    'popup_visible': 10,
+    'select_dropdown': 3,
+    'detail_form': 15,
+    'confirm_page': 15,
+    'completion_page': 30,
+}
+
+DEFAULT_POLL_INTERVAL = 0.1
+
+
+def check(driver, condition, *args):
+    """
+    条件を1回だけ判定する
+    """
+    try:
+        return bool(driver.execute_script(_VISIBLE_JS + CONDITIONS[condition], *args))
+    except WebDriverException:
+        return False
+
+
+def wait_for(driver, condition, *args, timeout=None, poll=DEFAULT_POLL_INTERVAL, raise_on_timeout=True):
+    """
+    名前付きの条件を満たすまで待つ
+    満たせば True。タイムアウトした場合は raise_on_timeout なら TimeoutException、そうでなければ False
+    """
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUTS.get(condition, 10)
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll).until(lambda d: check(d, condition, *args))
+        return True
+    except TimeoutException:
+        if raise_on_timeout:
+            raise TimeoutException(f"画面の待機がタイムアウトしました: {condition} ({timeout}秒)")
+        return False
@@ -0,0 +1,246 @@
+import collections
+import datetime
+import json
+import os
+import random
+import time
+
+from set_evaluator import set_dates
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEDULE_FILE = os.path.join(BASE_DIR, 'logs', 'schedule.json')
+
+# キャンセル料が発生し始める日数（宿泊日の何日前から）
+CANCEL_FEE_DAYS = 7
+
+
+def month_targets(notification_sets, today=None):
+    """
+    セットの日付から、月ごとの {(年, 月): {'nearest_days': 最も近い日付までの日数, 'auto_reserve': bool}} を作る
+    """
+    today = today or datetime.date.today()
+    targets = {}
+    for n_set in notification_sets:
+        for date_str, _ in set_dates(n_set):
+            check_date = datetime.date.fromisoformat(date_str)
+            if check_date < today:
+                continue
+            key = (check_date.year, check_date.month)
+            target = targets.setdefault(key, {'nearest_days': None, 'auto_reserve': False})
+            days = (check_date - today).days
+            if target['nearest_days'] is None or days < target['nearest_days']:
+                target['nearest_days'] = days
+            if n_set.get('auto_reserve', False):
+                target['auto_reserve'] = True
+    return targets
+
+
+class MonthState:
+    def __init__(self):
+        self.next_due = 0.0
+        self.interval = None
+        self.last_checked = None
+        self.last_changed = None
+        # 変化がなかったチェックの連続回数
+        self.unchanged_streak = 0
+
+
+class PollScheduler:
+    """
+    月ごとにチェック間隔を決めるスケジューラ
+    ・キャンセル料の発生が近い日付や自動予約セットを含む月は短い間隔でチェックする
+    ・しばらく変化のない月は間隔を延ばす
+    ・間隔にはゆらぎ（jitter）を加え、サイトに一定間隔でアクセスしないようにする
+    ・1時間あたりのチェック回数の上限（予算）を守る
+    """
+
+    def __init__(self, base_interval=600, min_interval=120, max_interval=3600,
+                 jitter=0.15, max_checks_per_hour=None):
+        self.months = {}
+        self.targets = {}
+        self.check_times = collections.deque()
+        self.configure(base_interval=base_interval, min_interval=min_interval, max_interval=max_interval,
+                       jitter=jitter, max_checks_per_hour=max_checks_per_hour)
+
+    def configure(self, base_interval=600, min_interval=120, max_interval=3600,
+                  jitter=0.15, max_checks_per_hour=None):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.jitter = jitter
+        self.max_checks_per_hour = max_checks_per_hour
+
+    def configure_from(self, config):
+        """
+        config.json の check_interval / min_check_interval / max_check_interval /
+        poll_jitter / max_checks_per_hour を反映する
+        """
+        self.configure(
+            base_interval=config.get('check_interval', 600),
+            min_interval=config.get('min_check_interval', 120),
+            max_interval=config.get('max_check_interval', 3600),
+            jitter=config.get('poll_jitter', 0.15),
+            max_checks_per_hour=config.get('max_checks_per_hour'),
+        )
+
+    def set_targets(self, notification_sets, today=None):
+        self.targets = month_targets(notification_sets, today)
+        for month in self.targets:
+            if month not in self.months:
+                # 新しく対象になった月はすぐにチェックする
+                self.months[month] = MonthState()
+        for month in list(self.months):
+            if month not in self.targets:
+                del self.months[month]
+
+    def expedite(self, months, now=None):
+        """
+        指定した月を今すぐチェックする対象にする（設定で追加・変更されたセットの月）
+        """
+        now = now or time.time()
+        for month in months:
+            state = self.months.get(month)
+            if state is not None:
+                state.next_due = min(state.next_due, now)
+
+    def interval_for(self, month):
+        target = self.targets.get(month, {})
+        interval = float(self.base_interval)
+
+        nearest_days = target.get('nearest_days')
+        if nearest_days is not None:
+            if nearest_days <= CANCEL_FEE_DAYS * 2:
+                interval *= 0.5
+            elif nearest_days <= 30:
+                interval *= 0.75
+        if target.get('auto_reserve'):
+            interval *= 0.25
+
+        # 変化のないチェックが6回続くごとに間隔を2倍にする（最大4倍）
+        state = self.months.get(month)
+        if state:
+            interval *= min(4, 2 ** (state.unchanged_streak // 6))
+
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _budget_left(self, now):
+        if not self.max_checks_per_hour:
+            return None
+        while self.check_times and now - self.check_times[0] >= 3600:
+            self.check_times.popleft()
+        return max(0, self.max_checks_per_hour - len(self.check_times))
+
+    def due_months(self, now=None):
+        """
+        今チェックすべき月を返す（予算を超える分は後回し）
+        返した月は、結果が record() されるまでの間も次回予定を先に進めておく（失敗時の連続アクセス防止）
+        """
+        now = now or time.time()
+        due = sorted((state.next_due, month) for month, state in self.months.items() if state.next_due <= now)
+        months = [month for _, month in due]
+
+        budget = self._budget_left(now)
+        if budget is not None:
+            months = months[:budget]
+
+        for month in months:
+            state = self.months[month]
+            state.interval = self.interval_for(month)
+            state.next_due = now + self._jittered(state.interval)
+            self.check_times.append(now)
+        return sorted(months)
+
+    def record(self, month, changed, now=None):
+        """
+        チェック結果を記録して次回予定を決める
+        """
+        state = self.months.get(month)
+        if state is None:
+            return
+        now = now or time.time()
+        state.last_checked = now
+        if changed:
+            state.last_changed = now
+            state.unchanged_streak = 0
+        else:
+            state.unchanged_streak += 1
+        state.interval = self.interval_for(month)
+        state.next_due = now + self._jittered(state.interval)
+
+    def seconds_until_next(self, now=None):
+        now = now or time.time()
+        if not self.months:
+            return float(self.base_interval)
+        wait = min(state.next_due for state in self.months.values()) - now
+
+        # 予算を使い切っている場合は、一番古いチェックが1時間の枠から外れるまで待つ
+        budget = self._budget_left(now)
+        if budget == 0 and self.check_times:
+            wait = max(wait, self.check_times[0] + 3600 - now)
+        return max(0.0, wait)
+
+    def upcoming(self, now=None):
+        """
+        今後のチェック予定を [{'month': 'YYYY-MM', 'next_check': ..., 'interval': 秒, ...}] で返す
+        """
+        now = now or time.time()
+        schedule = []
+        for month, state in sorted(self.months.items(), key=lambda item: item[1].next_due):
+            target = self.targets.get(month, {})
+            schedule.append({
+                'month': f"{month[0]}-{month[1]:02d}",
+                'next_check': datetime.datetime.fromtimestamp(max(now, state.next_due)).strftime('%Y-%m-%d %H:%M:%S'),
+                'interval': round(state.interval or self.interval_for(month)),
+                'nearest_days': target.get('nearest_days'),
+                'auto_reserve': target.get('auto_reserve', False),
+                'unchanged_streak': state.unchanged_streak,
+            })
+        return schedule
+
+    def export_state(self):
+        """
+        月ごとの次回予定・間隔・変化のない回数と、直近1時間のチェック時刻（再起動しても続きから予定を立てられるように）
+        """
+        months = {}
+        for (year, month), state in self.months.items():
+            months[f"{year}-{month:02d}"] = {
+                'next_due': round(state.next_due, 3),
+                'interval': state.interval,
+                'last_checked': state.last_checked,
+                'last_changed': state.last_changed,
+                'unchanged_streak': state.unchanged_streak,
+            }
+        return {'months': months, 'check_times': [round(t, 3) for t in self.check_times]}
+
+    def restore_state(self, state):
+        """
+        export_state の内容を戻す（対象でなくなった月は次の set_targets で消える）
+        """
+        for key, values in state.get('months', {}).items():
+            month_state = MonthState()
+            month_state.next_due = values.get('next_due', 0.0)
+            month_state.interval = values.get('interval')
+            month_state.last_checked = values.get('last_checked')
+            month_state.last_changed = values.get('last_changed')
+            month_state.unchanged_streak = values.get('unchanged_streak', 0)
+            year, month = map(int, key.split('-'))
+            self.months[(year, month)] = month_state
+        self.check_times = collections.deque(sorted(state.get('check_times', [])))
+
+    def save(self, path=SCHEDULE_FILE):
+        """
+        設定画面から見られるよう、今後の予定をファイルに書き出す
+        """
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                           'schedule': self.upcoming()}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"スケジュールの保存に失敗しました: {e}")
@@ -0,0 +1,323 @@
+from selenium.webdriver.common.by import By
+import os
+import datetime
+import time
+
+from browser_session import RESERVE_URL
+from calendar_extractor import extract_calendar, locate_cell, click_cell, click_month_button, watch_calendar_redraw
+from page_waits import wait_for
+from set_evaluator import set_plan
+from metrics import observe
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARRIVAL_TIME_TEXT = "11:00 ～ 13:59"
+
+# ラベル「大人」「小学生」「未就学児」と同じ el-form-item にある入力欄を1回でまとめて探す
+FIND_PARTY_INPUTS_JS = """
+var wanted = arguments[0];
+var labels = document.querySelectorAll('label');
+var result = {};
+for (var w = 0; w < wanted.length; w++) {
+    for (var i = 0; i < labels.length; i++) {
+        if ((labels[i].innerText || '').indexOf(wanted[w]) === -1) { continue; }
+        var inputs = labels[i].parentNode.querySelectorAll('input');
+        for (var j = 0; j < inputs.length; j++) {
+            var inp = inputs[j];
+            if ((inp.offsetWidth || inp.offsetHeight) && !inp.readOnly) { result[wanted[w]] = inp; break; }
+        }
+        break;
+    }
+}
+return result;
+"""
+
+
+class ReservationTimer:
+    """
+    予約処理の各段階の所要時間を記録する
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        observe(f"reserve.{name}", now - self.last)
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+    def summary(self):
+        parts = [f"{name} {seconds:.2f}秒" for name, seconds in self.phases]
+        return " / ".join(parts) + f" (合計 {self.total():.2f}秒)"
+
+
+def party_sizes(n_set):
+    return [
+        ("大人", n_set.get('adults', 1)),
+        ("小学生", n_set.get('children', 0)),
+        ("未就学児", n_set.get('preschoolers', 0)),
+    ]
+
+
+def select_nights(driver, nights):
+    # 泊数選択が必要な場合、ここで選択処理
+    # "1泊", "2泊" といったテキストを持つ要素を探してクリック
+    if nights <= 1:
+        return
+    try:
+        night_labels = driver.find_elements(By.XPATH, f"//div[contains(text(), '{nights}泊')]")
+        for label in night_labels:
+            if label.is_displayed():
+                label.click()
+                print(f"{nights}泊を選択しました")
+                break
+    except Exception as e:
+        print(f"泊数選択でエラー（スキップします）: {e}")
+
+
+def proceed_to_detail(driver):
+    # 「予約へ進む」ボタンをクリック
+    buttons = driver.find_elements(By.TAG_NAME, 'button')
+    for btn in buttons:
+        if btn.is_displayed() and ("予約" in btn.text and "進む" in btn.text or "予約する" in btn.text):
+            btn.click()
+            wait_for(driver, 'detail_form')
+            return
+    raise Exception("「予約へ進む」ボタンが見つかりません")
+
+
+def select_arrival_time(driver):
+    # 全ての el-select を順にクリックして、ドロップダウンが出たら "11:00" を選ぶ作戦
+    selects = driver.find_elements(By.CLASS_NAME, 'el-select')
+    for select in selects:
+        if not select.is_displayed():
+            continue
+        try:
+            select.click()
+            if not wait_for(driver, 'select_dropdown', raise_on_timeout=False):
+                continue
+            options = driver.find_elements(By.CLASS_NAME, 'el-select-dropdown__item')
+            for opt in options:
+                if ARRIVAL_TIME_TEXT in opt.text:
+                    opt.click()
+                    print(f"到着時刻 {ARRIVAL_TIME_TEXT} を選択しました")
+                    return True
+        except Exception:
+            continue
+    print("警告: 到着時刻の選択に失敗しました（デフォルトまたは未選択のまま進みます）")
+    return False
+
+
+def fill_party(driver, party):
+    inputs = driver.execute_script(FIND_PARTY_INPUTS_JS, [label for label, _ in party])
+    for label_text, value in party:
+        target_input = inputs.get(label_text)
+        if not target_input:
+            print(f"{label_text} の入力欄が見つかりません")
+            continue
+        try:
+            target_input.clear()
+            target_input.send_keys(str(value))
+            print(f"{label_text}: {value}人 を入力しました")
+        except Exception as e:
+            print(f"{label_text} の入力中にエラー: {e}")
+
+
+def proceed_to_confirm(driver):
+    # 「次へ」ボタン
+    print("次へ進みます...")
+    buttons = driver.find_elements(By.TAG_NAME, 'button')
+    for btn in buttons:
+        if "次へ" in btn.text and btn.is_displayed():
+            btn.click()
+            wait_for(driver, 'confirm_page')
+            return
+    raise Exception("「次へ」ボタンが見つかりません")
+
+
+def confirm_reservation(driver):
+    """
+    確定ボタンを押す。完了画面まで確認できたら True
+    """
+    print("確認画面: 予約を確定します...")
+    buttons = driver.find_elements(By.TAG_NAME, 'button')
+    for btn in buttons:
+        # "確定" または "予約する"
+        if ("確定" in btn.text or "予約する" in btn.text) and btn.is_displayed():
+            # ★★★ ここでクリックすると本当に予約される ★★★
+            btn.click()
+            print("予約確定ボタンをクリックしました！")
+            return wait_for(driver, 'completion_page', raise_on_timeout=False)
+    raise Exception("確定ボタンが見つかりません")
+
+
+def complete_reservation(driver, nights, party, timer):
+    """
+    日付セルをクリックした後（ポップアップ表示中）から確定までを行う
+    """
+    wait_for(driver, 'popup_visible')
+    timer.lap("ポップアップ表示")
+
+    select_nights(driver, nights)
+    proceed_to_detail(driver)
+    timer.lap("詳細ページ表示")
+
+    print("予約詳細ページ: 入力を開始します...")
+    select_arrival_time(driver)
+    fill_party(driver, party)
+    timer.lap("入力")
+
+    proceed_to_confirm(driver)
+    timer.lap("確認画面表示")
+
+    completed = confirm_reservation(driver)
+    timer.lap("確定〜完了画面")
+    return completed
+
+
+class ReservationLane:
+    """
+    自動予約セット専用のタブ
+    対象月のカレンダーを表示したまま待機し、クリックするセルの位置と人数を先に求めておくことで、
+    空きを見つけたらすぐに確定まで進めるようにする
+    """
+
+    def __init__(self, session, n_set):
+        self.session = session
+        self.n_set = n_set
+        self.target_date = datetime.datetime.strptime(n_set['start_date'], "%Y-%m-%d")
+        self.nights = n_set.get('nights', 1)
+        self.party = party_sizes(n_set)
+
+        self.handle = None
+        self.browser_started_at = None
+        self.cell = None
+        self.prepared_at = None
+
+    def _tab_exists(self, driver):
+        return (self.handle is not None
+                and self.browser_started_at == self.session.started_at
+                and self.handle in driver.window_handles)
+
+    def is_ready(self):
+        if self.cell is None or self.session.driver is None:
+            return False
+        if time.time() - self.prepared_at > self.session.max_page_age:
+            return False
+        try:
+            return self._tab_exists(self.session.driver)
+        except Exception:
+            return False
+
+    def invalidate(self):
+        self.cell = None
+
+    def _load_calendar(self, driver):
+        """
+        表示中のタブでカレンダーページを読み込み、対象月を表示してクリックするセルの位置を求める
+        """
+        driver.get(RESERVE_URL)
+        wait_for(driver, 'calendar_page')
+        if not click_month_button(driver, self.target_date.month):
+            raise Exception(f"{self.target_date.month}月のボタンが見つかりません")
+        wait_for(driver, 'calendar_month', self.target_date.month)
+
+        grid = extract_calendar(driver)
+        if not grid:
+            raise Exception("カレンダーが見つかりません")
+        self.cell = locate_cell(grid, self.target_date, set_plan(self.n_set))
+        self.prepared_at = time.time()
+
+    def _redraw_calendar(self, driver):
+        """
+        待機中のタブのカレンダーを最新の空き状況で描画し直す
+        同じ月を表示したままなので、月ボタンを押した後にページが書き換わるまで待つ
+        書き換わらなければ（月ボタンが効かなかったなど）ページごと読み込み直す
+        """
+        watch_calendar_redraw(driver)
+        if (click_month_button(driver, self.target_date.month)
+                and wait_for(driver, 'calendar_redrawn', self.target_date.month, raise_on_timeout=False)):
+            return
+        print("カレンダーが描画し直されなかったため、ページを読み込み直します")
+        self._load_calendar(driver)
+
+    def prepare(self):
+        """
+        専用タブで対象月を表示し、クリックするセルの位置を求めておく
+        """
+        driver = self.session.get_driver()
+        main_handle = driver.current_window_handle
+        started = time.perf_counter()
+        try:
+            if self._tab_exists(driver):
+                driver.switch_to.window(self.handle)
+            else:
+                driver.switch_to.new_window('tab')
+                self.handle = driver.current_window_handle
+                self.session.configure_tab(driver)
+                self.browser_started_at = self.session.started_at
+
+            self._load_calendar(driver)
+            print(f"予約用タブを準備しました: {self.n_set['name']}")
+        except Exception as e:
+            self.cell = None
+            print(f"予約用タブの準備に失敗しました（{self.n_set['name']}）: {e}")
+        finally:
+            driver.switch_to.window(main_handle)
+            observe('lane_prepare', time.perf_counter() - started)
+
+    def fire(self, timer):
+        """
+        待機中のタブで予約を確定まで進める。完了画面まで確認できたら True
+        """
+        if not self.is_ready():
+            self.prepare()
+            timer.lap("タブ準備")
+        if self.cell is None:
+            raise Exception("予約用タブを準備できませんでした")
+
+        driver = self.session.driver
+        main_handle = driver.current_window_handle
+        try:
+            driver.switch_to.window(self.handle)
+            # 最新の空き状況で描画し直してから、求めておいた位置のセルをクリックする
+            self._redraw_calendar(driver)
+            timer.lap("カレンダー更新")
+
+            search_date_text = f"{self.target_date.month}/{self.target_date.day}"
+            print(f"予約日 {search_date_text} のセルをクリックします...")
+            click_cell(driver, *self.cell)
+            timer.lap("セルクリック")
+
+            return complete_reservation(driver, self.nights, self.party, timer)
+        except Exception:
+            # スクリーンショット保存
+            try:
+                log_dir = os.path.join(BASE_DIR, "logs")
+                os.makedirs(log_dir, exist_ok=True)
+                driver.save_screenshot(os.path.join(log_dir, 'reserve_error.png'))
+            except Exception:
+                pass
+            raise
+        finally:
+            # 予約の後はページが変わっているので、次に使うときは準備し直す
+            self.invalidate()
+            driver.switch_to.window(main_handle)
+
+    def close(self):
+        driver = self.session.driver
+        if driver is None or not self._tab_exists(driver):
+            return
+        main_handle = driver.current_window_handle
+        if main_handle == self.handle:
+            return
+        driver.switch_to.window(self.handle)
+        driver.close()
+        driver.switch_to.window(main_handle)
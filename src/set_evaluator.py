@@ -0,0 +1,222 @@
+import datetime
+import functools
+import json
+
+from calendar_extractor import DEFAULT_PLAN
+from calendar_parser import parse_status
+
+WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+
+
+@functools.lru_cache(maxsize=4096)
+def set_nights(start_date, nights):
+    """
+    開始日と泊数から (("YYYY-MM-DD", 曜日), ...) を返す（同じセットを毎回 strptime しないようにキャッシュする）
+    """
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+    result = []
+    for i in range(nights):
+        day = start + datetime.timedelta(days=i)
+        result.append((day.isoformat(), WEEKDAYS[day.weekday()]))
+    return tuple(result)
+
+
+@functools.lru_cache(maxsize=1024)
+def range_days(range_start, range_end):
+    """
+    期間の全日付を (("YYYY-MM-DD", 曜日), ...) で返す（両端を含む）
+    """
+    start = datetime.datetime.strptime(range_start, "%Y-%m-%d").date()
+    end = datetime.datetime.strptime(range_end, "%Y-%m-%d").date()
+    return set_nights(range_start, (end - start).days + 1) if end >= start else ()
+
+
+def nights_of(n_set):
+    return set_nights(n_set['start_date'], n_set.get('nights', 1))
+
+
+def is_range_set(n_set):
+    """
+    「期間内のどこかで N 連泊」を探すセット（type: "range"）か
+    """
+    return n_set.get('type') == 'range'
+
+
+def set_plan(n_set):
+    """
+    セットが見るカレンダーの行（プラン名）。指定がなければキャンプ宿泊
+    """
+    return n_set.get('plan') or DEFAULT_PLAN
+
+
+def set_dates(n_set):
+    """
+    セットの判定に関係する日付（日付指定のセットは泊まる日、期間のセットは期間の全日付）
+    """
+    if is_range_set(n_set):
+        return range_days(n_set['range_start'], n_set['range_end'])
+    return nights_of(n_set)
+
+
+def is_open(status):
+    """
+    〇か△なら空きあり（まだ取得していない日付は空きなし扱い）
+    """
+    return status is not None and ('〇' in status or '△' in status)
+
+
+def has_remaining(status, min_remaining=1):
+    """
+    空きがあり、残数が min_remaining 以上か（〇は残数の上限なし）
+    """
+    return is_open(status) and parse_status(status)[1] >= min_remaining
+
+
+def find_windows(n_set, statuses):
+    """
+    期間のセットの条件を満たす泊まり方の開始日を、期間を1回なめるだけで探す
+    条件を満たす日が何日続いているかを数えながら進み、nights 日続いたらその並びの開始日を候補にする
+    weekdays（開始日の曜日）があれば、その曜日に始まるものだけ
+    """
+    days = range_days(n_set['range_start'], n_set['range_end'])
+    nights = n_set.get('nights', 1)
+    weekdays = n_set.get('weekdays') or WEEKDAYS
+    min_remaining = n_set.get('min_remaining', 1)
+    windows = []
+    run = 0
+    for i, (date_str, _) in enumerate(days):
+        run = run + 1 if has_remaining(statuses.get(date_str), min_remaining) else 0
+        if run >= nights:
+            start_str, start_weekday = days[i - nights + 1]
+            if start_weekday in weekdays:
+                windows.append(start_str)
+    return windows
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class SetEvaluator:
+    """
+    通知セットの空き判定を、変化した日付に関係するセットだけで行う
+    ・(プラン, 日付) ごとに、その日を含むセットの番号をビットセット（Pythonの整数）で持つ
+    ・セットごとに「空きのない泊の数」を数えておき、0 なら全泊空きあり
+    空き状況が変わったときは、変化した日付のビットセットに含まれるセットだけを数え直す
+    期間のセット（type: "range"）は数える代わりに、変化した日付を含むセットだけ期間を1回なめて候補を探し直す
+    """
+
+    def __init__(self):
+        self.key = None
+        self.sets = []
+        self.date_bits = {}
+        self.blocked = []
+        self.available_bits = 0
+        self.target_months = []
+        # 期間のセットのビット、期間のセットの日付の最新の状況 {プラン: {日付: ステータス}}、期間のセットの候補の開始日 {セットID: [...]}
+        self.range_bits = 0
+        self.statuses = {}
+        self.windows = {}
+
+    def load(self, notification_sets, statuses):
+        """
+        セットの一覧が変わっていれば索引を作り直す（作り直したら True）
+        statuses はプランごとの空き状況 {プラン: {日付: ステータス}}
+        """
+        key = json.dumps(notification_sets, sort_keys=True, ensure_ascii=False)
+        if key == self.key:
+            return False
+        self.key = key
+        self.sets = list(notification_sets)
+        self.date_bits = {}
+        self.blocked = []
+        self.available_bits = 0
+        self.range_bits = 0
+        self.statuses = {}
+        self.windows = {}
+        months = set()
+        for index, n_set in enumerate(self.sets):
+            bit = 1 << index
+            plan = set_plan(n_set)
+            plan_statuses = statuses.get(plan, {})
+            if is_range_set(n_set):
+                range_statuses = self.statuses.setdefault(plan, {})
+                for date_str, _ in set_dates(n_set):
+                    key = (plan, date_str)
+                    self.date_bits[key] = self.date_bits.get(key, 0) | bit
+                    months.add((int(date_str[:4]), int(date_str[5:7])))
+                    range_statuses[date_str] = plan_statuses.get(date_str)
+                self.range_bits |= bit
+                self.blocked.append(0)
+                self.windows[n_set['id']] = find_windows(n_set, range_statuses)
+                if self.windows[n_set['id']]:
+                    self.available_bits |= bit
+                continue
+            blocked = 0
+            for date_str, _ in nights_of(n_set):
+                key = (plan, date_str)
+                self.date_bits[key] = self.date_bits.get(key, 0) | bit
+                months.add((int(date_str[:4]), int(date_str[5:7])))
+                if not is_open(plan_statuses.get(date_str)):
+                    blocked += 1
+            self.blocked.append(blocked)
+            if blocked == 0:
+                self.available_bits |= bit
+        self.target_months = sorted(months)
+        return True
+
+    def apply(self, events):
+        """
+        空き状況の変化 [{'date', 'plan', 'from', 'to'}] を反映し、判定が変わったセットのビットセットを返す
+        """
+        flipped = 0
+        dirty = 0
+        for event in events:
+            plan = event.get('plan', DEFAULT_PLAN)
+            bits = self.date_bits.get((plan, event['date']))
+            if not bits:
+                continue
+            if bits & self.range_bits:
+                # 残数の変化も条件に関わるので、空きの有無が変わらなくても探し直す
+                self.statuses[plan][event['date']] = event['to']
+                dirty |= bits & self.range_bits
+                bits &= ~self.range_bits
+                if not bits:
+                    continue
+            was_open, now_open = is_open(event['from']), is_open(event['to'])
+            if was_open == now_open:
+                continue
+            delta = -1 if now_open else 1
+            for index in iter_bits(bits):
+                before = self.blocked[index]
+                self.blocked[index] = before + delta
+                if (before == 0) != (self.blocked[index] == 0):
+                    flipped ^= 1 << index
+        for index in iter_bits(dirty):
+            n_set = self.sets[index]
+            windows = self.windows[n_set['id']] = find_windows(n_set, self.statuses[set_plan(n_set)])
+            if bool(windows) != bool(self.available_bits & (1 << index)):
+                flipped ^= 1 << index
+        self.available_bits ^= flipped
+        return flipped
+
+    def expire(self, events):
+        """
+        過ぎた日付 [{'date', 'plan', 'from'}] を索引から外す（その日を含むセットはもう予約できないので空きなしにする）
+        判定が変わったセットのビットセットを返す
+        """
+        flipped = self.apply([dict(event, to=None) for event in events])
+        for event in events:
+            plan = event.get('plan', DEFAULT_PLAN)
+            self.date_bits.pop((plan, event['date']), None)
+            self.statuses.get(plan, {}).pop(event['date'], None)
+        return flipped
+
+    def sets_in(self, bits):
+        return [self.sets[index] for index in iter_bits(bits)]
+
+    def available_sets(self):
+        return self.sets_in(self.available_bits)
@@ -1,32 +1,248 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import base64
+import functools
 import json
 import os
 
+from availability_events import EventLog
+from config_watcher import validate_config, write_config
+from history_store import HistoryStore
+from http_cache import CachedFile, StaticAssets, http_date, is_not_modified
+from metrics import render_prometheus
+
 PORT = 8000
 # プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE = os.path.join(BASE_DIR, 'config', 'config.json')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
+WEB_DIR = os.path.join(BASE_DIR, 'web')
+
+# /api/logs の1ページあたりの件数
+LOGS_PAGE_SIZE = 100
+LOGS_MAX_PAGE_SIZE = 1000
+
+# vendor/ のファイルはファイル名にバージョンを含めているので、長期間キャッシュさせてよい
+IMMUTABLE_PREFIX = '/vendor/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# それ以外（index.html や API）は毎回 ETag で確認させる
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+DEFAULT_CONFIG = {"notification_sets": [], "check_interval": 600}
+
+config_file = CachedFile(CONFIG_FILE, default=json.dumps(DEFAULT_CONFIG).encode())
+schedule_file = CachedFile(os.path.join(LOG_DIR, 'schedule.json'), default=json.dumps({"schedule": []}).encode())
+# 監視プログラムがサイクルごとに書き出す計測結果
+metrics_file = CachedFile(os.path.join(LOG_DIR, 'metrics.json'), default=b'{}')
+static_assets = StaticAssets()
+
+history_store = None
+event_log = EventLog()
+
+
+def get_history_store():
+    global history_store
+    if history_store is None:
+        history_store = HistoryStore()
+    return history_store
+
+
+def encode_cursor(row):
+    key = [row['observed_at'], row['target_date'], row['plan']]
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(cursor):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if not isinstance(key, list) or len(key) != 3:
+        raise ValueError("cursor が不正です")
+    return tuple(key)
+
+
+def log_filters(params):
+    """
+    クエリ文字列から履歴検索の条件を作る
+    from / to は観測時刻、target_from / target_to は対象日（target_date で1日だけ指定も可）
+    """
+    def get(name):
+        return params.get(name, [None])[0] or None
+
+    target_date = get('target_date')
+    return {
+        'observed_from': get('from'),
+        'observed_to': get('to'),
+        'target_from': get('target_from') or target_date,
+        'target_to': get('target_to') or target_date,
+        'plan': get('plan'),
+        'after': decode_cursor(get('cursor')) if get('cursor') else None,
+    }
+
 
 class ConfigHandler(SimpleHTTPRequestHandler):
+    # 何度もポーリングする画面のために接続を使い回す（HTTP/1.1 keep-alive）
+    protocol_version = 'HTTP/1.1'
+    # 使われなくなった接続は閉じる
+    timeout = 30
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cached(self, body, etag, mtime, content_type, cache_control=REVALIDATE_CACHE_CONTROL,
+                    encoding=None, head_only=False):
+        """
+        ETag / Last-Modified を付けて返す。クライアントが最新のものを持っていれば 304 だけを返す
+        """
+        not_modified = is_not_modified(self.headers, etag, mtime)
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        if mtime is not None:
+            self.send_header('Last-Modified', http_date(mtime))
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-type', content_type)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def send_static(self, path, head_only=False):
+        """
+        web/ のファイルをメモリ上の圧縮済みデータから返す
+        """
+        if path.endswith('/'):
+            path += 'index.html'
+        asset = static_assets.get(self.translate_path(path))
+        if asset is None:
+            self.send_error(404, "File not found")
+            return
+        body, encoding, etag = asset.select(self.headers.get('Accept-Encoding'))
+        cache_control = IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_PREFIX) else REVALIDATE_CACHE_CONTROL
+        self.send_cached(body, etag, asset.mtime, asset.content_type, cache_control=cache_control,
+                         encoding=encoding, head_only=head_only)
+
+    def send_logs_page(self, params):
+        """
+        GET /api/logs: 条件に合う変化を古い順に1ページずつ返す
+        次のページは返された next_cursor を cursor に付けて取得する
+        """
+        try:
+            filters = log_filters(params)
+            limit = min(int(params.get('limit', [LOGS_PAGE_SIZE])[0]), LOGS_MAX_PAGE_SIZE)
+            # 0 や負の数は SQLite では件数の制限なしになるので受け付けない
+            if limit < 1:
+                raise ValueError(f"limit は1以上で指定してください: {limit}")
+        except ValueError as e:
+            self.send_json({"error": str(e)}, status=400)
+            return
+        # 1件多く取って、次のページがあるかを判定する
+        rows = get_history_store().query(limit=limit + 1, **filters)
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        self.send_json({"items": rows[:limit], "next_cursor": next_cursor})
+
+    def send_logs_stream(self, params):
+        """
+        GET /api/logs/stream: 条件に合う変化をすべて1行1件のJSON（chunked）で少しずつ送る
+        """
+        try:
+            filters = log_filters(params)
+        except ValueError as e:
+            self.send_json({"error": str(e)}, status=400)
+            return
+        # chunked 転送は HTTP/1.1 のみ。送り終えたら接続を閉じる
+        self.protocol_version = 'HTTP/1.1'
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        lines = []
+        for row in get_history_store().iter_query(**filters):
+            lines.append(json.dumps(row, ensure_ascii=False) + '\n')
+            if len(lines) >= 200:
+                self.write_chunk(''.join(lines).encode())
+                lines = []
+        if lines:
+            self.write_chunk(''.join(lines).encode())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_metrics(self):
+        """
+        GET /metrics: 監視プログラムの計測結果を Prometheus のテキスト形式で返す
+        """
+        body, _, _ = metrics_file.get()
+        try:
+            snapshot = json.loads(body.decode() or '{}')
+        except ValueError:
+            snapshot = {}
+        text = render_prometheus(snapshot).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
     def do_GET(self):
-        if self.path == '/':
-            self.path = '/index.html'
-            return SimpleHTTPRequestHandler.do_GET(self)
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+
+        if parsed.path == '/api/logs':
+            self.send_logs_page(params)
+            return
+
+        if parsed.path == '/api/logs/stream':
+            try:
+                self.send_logs_stream(params)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+
+        if parsed.path == '/api/logs/latest':
+            # 今日のイベントファイルを末尾から読んで、新しい順に返す
+            try:
+                n = min(int(params.get('n', [50])[0]), LOGS_MAX_PAGE_SIZE)
+            except ValueError:
+                n = 50
+            # 0 は tail の [-0:] で末尾のブロックの全行になってしまうので受け付けない
+            if n < 1:
+                self.send_json({"error": f"n は1以上で指定してください: {n}"}, status=400)
+                return
+            self.send_json({"events": event_log.tail(n)})
+            return
+
+        if parsed.path == '/api/config':
+            # ファイルが書き換えられたときだけ読み直す
+            self.send_cached(*config_file.get(), 'application/json')
+            return
         
-        if self.path == '/api/config':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    self.wfile.write(f.read().encode())
-            else:
-                self.wfile.write(json.dumps({"notification_sets": [], "check_interval": 600}).encode())
+        if parsed.path == '/metrics':
+            self.send_metrics()
+            return
+
+        if parsed.path == '/api/schedule':
+            # 監視プログラムが書き出した今後のチェック予定
+            self.send_cached(*schedule_file.get(), 'application/json')
             return
         
-        return SimpleHTTPRequestHandler.do_GET(self)
+        self.send_static(parsed.path)
+
+    def do_HEAD(self):
+        self.send_static(urlparse(self.path).path, head_only=True)
 
     def do_POST(self):
         if self.path == '/api/config':
@@ -34,34 +250,33 @@ class ConfigHandler(SimpleHTTPRequestHandler):
             post_data = self.rfile.read(content_length)
             
             try:
-                config_data = json.loads(post_data.decode())
-                # バリデーションや整形が必要ならここで行う
-                
-                with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(config_data, f, indent=4, ensure_ascii=False)
-                
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"status": "success"}).encode())
+                config_data = validate_config(json.loads(post_data.decode()))
+            except ValueError as e:
+                # JSON として読めない・セットの中身がおかしい設定は保存しない
+                self.send_json({"status": "error", "message": str(e)}, status=400)
+                return
+
+            try:
+                # 監視プログラムが書きかけのファイルを読まないよう、置き換えで保存する
+                write_config(config_data, CONFIG_FILE)
+                self.send_json({"status": "success"})
             except Exception as e:
-                self.send_response(500)
-                self.end_headers()
-                self.wfile.write(str(e).encode())
+                self.send_json({"status": "error", "message": str(e)}, status=500)
             return
+        self.send_error(404, "Not found")
 
 if __name__ == '__main__':
-    # webディレクトリをドキュメントルートにするために移動
-    web_dir = os.path.join(BASE_DIR, 'web')
-    if os.path.exists(web_dir):
-        os.chdir(web_dir)
-        print(f"ドキュメントルートを {web_dir} に設定しました。")
+    # webディレクトリをドキュメントルートにする
+    if os.path.exists(WEB_DIR):
+        count = static_assets.preload(WEB_DIR)
+        print(f"ドキュメントルートを {WEB_DIR} に設定しました（{count}ファイルを読み込み済み）。")
     else:
-        print(f"警告: webディレクトリ ({web_dir}) が見つかりません。")
+        print(f"警告: webディレクトリ ({WEB_DIR}) が見つかりません。")
 
     print(f"設定画面サーバーを起動しました。ブラウザで http://localhost:{PORT} にアクセスしてください。")
     print("停止するには Ctrl+C を押してください。")
-    httpd = HTTPServer(('localhost', PORT), ConfigHandler)
+    # 1つの接続が遅くても他の画面を待たせないよう、リクエストごとにスレッドで処理する
+    httpd = ThreadingHTTPServer(('localhost', PORT), functools.partial(ConfigHandler, directory=WEB_DIR))
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+
+import requests
+from selenium.common.exceptions import WebDriverException
+
+from browser_session import RESERVE_BASE_URL, RESERVE_URL
+from page_waits import wait_for
+from metrics import span
+
+LOGIN_URL = f'{RESERVE_BASE_URL}/'
+
+# ログインが続いているかを確かめるURL（ログインしていないとリダイレクトか401/403が返るページ）
+SESSION_PROBE_URL = os.getenv('SESSION_PROBE_URL', RESERVE_URL)
+PROBE_TIMEOUT = 5
+
+# この秒数以内に確認済みなら、もう一度は確認しない
+PROBE_INTERVAL = 120
+
+# Cookieの期限・ページの再読み込みの時期のこの秒数前から、チェックの合間に更新しておく
+REFRESH_MARGIN = 600
+
+# 期限の判定に使わないCookie（アクセス解析用。期限が短く、ログインとは関係ない）
+IGNORED_COOKIE_PREFIXES = ('_ga', '_gid', '_gat', '_gcl', '_fbp')
+
+# ログインフォームの入力欄とボタンを1回の execute_script で探す
+# メールアドレス欄はプレースホルダーに「メール」「mail」を含むものを優先し、なければ最初のテキスト欄
+_FIND_LOGIN_FORM_JS = """
+var inputs = document.querySelectorAll('input');
+var email = null, fallback = null, password = null;
+for (var i = 0; i < inputs.length; i++) {
+    var type = inputs[i].getAttribute('type');
+    var placeholder = (inputs[i].getAttribute('placeholder') || '').toLowerCase();
+    if (type === 'text' || type === 'email') {
+        if (placeholder.indexOf('メール') !== -1 || placeholder.indexOf('mail') !== -1) { email = email || inputs[i]; }
+        else { fallback = fallback || inputs[i]; }
+    }
+    if (type === 'password') { password = inputs[i]; }
+}
+var button = null;
+var buttons = document.querySelectorAll('button');
+for (var j = 0; j < buttons.length; j++) {
+    if ((buttons[j].innerText || buttons[j].textContent || '').indexOf('ログイン') !== -1) { button = buttons[j]; break; }
+}
+return [email || fallback, password, button];
+"""
+
+_http = requests.Session()
+_http_lock = threading.Lock()
+
+
+def login(driver, email, password):
+    """
+    ログインフォームに入力してログインする（カレンダーページ以外にいればトップページへ移動してから）
+    ログインしてカレンダーページが表示されたら True
+    """
+    print("ログインが必要です。ログイン処理を開始します...")
+    if "login" not in driver.current_url and driver.current_url != LOGIN_URL:
+        driver.get(LOGIN_URL)
+    wait_for(driver, 'login_form', raise_on_timeout=False)
+
+    email_input, password_input, login_btn = driver.execute_script(_FIND_LOGIN_FORM_JS)
+    if not (email_input and password_input):
+        print("入力欄が見つかりません")
+        return False
+    if not login_btn:
+        print("ログインボタンが見つかりません")
+        return False
+
+    email_input.clear()
+    email_input.send_keys(email)
+    password_input.clear()
+    password_input.send_keys(password)
+    login_btn.click()
+    return wait_for(driver, 'calendar_page', raise_on_timeout=False)
+
+
+def probe_session(cookies, url=None, timeout=PROBE_TIMEOUT):
+    """
+    ブラウザのCookieでページのヘッダーだけを取得し、ログインが続いているかを確かめる（ページは描画しない）
+    True: ログイン中 / False: ログインが切れている / None: 分からない（通信エラーなど）
+    """
+    url = url or SESSION_PROBE_URL
+    jar = {cookie['name']: cookie['value'] for cookie in cookies}
+    try:
+        with _http_lock:
+            with _http.get(url, cookies=jar, allow_redirects=False, stream=True, timeout=timeout) as response:
+                status = response.status_code
+                location = response.headers.get('Location', '')
+            # 応答で設定されたCookieは次の確認に持ち越さない（毎回ブラウザのCookieで確かめる）
+            _http.cookies.clear()
+    except requests.RequestException as e:
+        print(f"ログイン状態を確認できませんでした: {e}")
+        return None
+
+    if status in (401, 403):
+        return False
+    if 300 <= status < 400:
+        return 'reserved-date-selection' in location
+    if status == 200:
+        return True
+    return None
+
+
+def cookie_expiry(cookies):
+    """
+    ログインに関わるCookieのうち、いちばん早い期限（UNIX時刻）。期限付きのCookieがなければ None
+    """
+    expiries = [cookie['expiry'] for cookie in cookies
+                if 'expiry' in cookie and not cookie['name'].startswith(IGNORED_COOKIE_PREFIXES)]
+    return min(expiries) if expiries else None
+
+
+def check_session(session, max_age=PROBE_INTERVAL):
+    """
+    session（BrowserSession）のログインが続いているかを、Cookieを使ったHTTPの確認で調べる
+    max_age 秒以内に確認済みなら確認せずに True。戻り値は probe_session と同じ
+    """
+    now = time.time()
+    if session.verified_at is not None and now - session.verified_at < max_age:
+        return True
+    try:
+        cookies = session.driver.get_cookies()
+    except (WebDriverException, AttributeError):
+        return None
+    with span('session_probe'):
+        valid = probe_session(cookies)
+    session.session_expires_at = cookie_expiry(cookies)
+    if valid:
+        session.verified_at = now
+    return valid
+
+
+def ensure_login(session, email, password):
+    """
+    ログイン済みでカレンダーページを表示したドライバーを返す
+    ・読み込み済みのページを使い回すときは、Cookieでの軽い確認だけ行う（PROBE_INTERVAL 秒に1回）
+    ・ログインし直すのは、サーバーがログイン切れと答えた場合か、ログインページに移された場合だけ
+    """
+    driver = session.ensure_calendar_page()
+    if "reserved-date-selection" in driver.current_url:
+        if not session.page_reused:
+            # 読み込んだページがカレンダーなら、それ自体がログイン中の確認になる
+            session.verified_at = time.time()
+            return driver
+        if check_session(session) is not False:
+            return driver
+        print("ログインが切れています")
+        driver.get(LOGIN_URL)
+
+    with span('login'):
+        logged_in = login(driver, email, password)
+    if logged_in:
+        session.logged_in_at = session.verified_at = session.page_loaded_at = time.time()
+    else:
+        # ログイン後の画面が想定外なら次回は読み込み直す
+        session.reset_page()
+    return driver
+
+
+def refresh_session(session, email, password, margin=REFRESH_MARGIN):
+    """
+    チェックの合間に呼び出して、次のチェックでログインやページの読み込みを待たずに済むようにしておく
+    ・ログインが切れていればログインし直す
+    ・Cookieの期限かページの再読み込みの時期が近ければ、今のうちに読み込み直す（期限が延びるサイトでは延長にもなる）
+    何かした場合は True
+    """
+    if session.driver is None or not session.is_alive():
+        return False
+    now = time.time()
+    with span('session_refresh', in_cycle=False):
+        if check_session(session) is not False:
+            near_expiry = session.session_expires_at is not None and session.session_expires_at - now < margin
+            page_old = session.page_loaded_at is None or now - session.page_loaded_at > session.max_page_age - margin
+            if not (near_expiry or page_old):
+                return False
+        session.reset_page()
+        ensure_login(session, email, password)
+    return True
@@ -0,0 +1,155 @@
+import os
+
+from dotenv import dotenv_values
+
+from browser_session import BrowserSession
+from set_evaluator import SetEvaluator, is_range_set
+
+# プロジェクトのルートディレクトリを取得 (srcの親ディレクトリ)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PROFILE_DIR = os.path.join(BASE_DIR, 'chrome_data')
+
+# .env・chrome_data・config.json 直下の notification_sets を使うアカウントの名前
+DEFAULT_TENANT = 'default'
+
+
+class Tenant:
+    """
+    1つの予約アカウント（家族）
+    ログイン情報・ブラウザのプロファイル・通知セット・予約用タブ・通知済みセットをアカウントごとに持つ
+    空き状況の取得はアカウントをまたいで1回だけ行い、結果を各アカウントの SetEvaluator に配る
+    """
+
+    def __init__(self, name, email, password, profile_dir, recipients=None, lean=False):
+        self.name = name
+        self.email = email
+        self.password = password
+        self.profile_dir = profile_dir
+        # セットに recipients がないときの通知先（これもなければ友だち全員）
+        self.recipients = recipients or None
+        # 画像などを読み込まない軽量モードのブラウザを使うか（config.json の lean_browser）
+        self.lean = lean
+
+        self.notification_sets = []
+        self.evaluator = SetEvaluator()
+        self.previous_ok_sets = set()
+        # 期間のセットの通知済みの候補 {セットID: {開始日, ...}}
+        self.previous_windows = {}
+        self.reservation_lanes = {}
+        self.session = None
+
+    def identity(self):
+        return (self.email, self.password, self.profile_dir)
+
+    def get_session(self):
+        """
+        このアカウントのブラウザ（必要になったときに初めて作る）
+        """
+        if self.session is None:
+            self.session = BrowserSession(user_data_dir=self.profile_dir, lean=self.lean)
+        return self.session
+
+    def set_lean(self, lean):
+        self.lean = lean
+        if self.session:
+            self.session.set_lean(lean)
+
+    def auto_sets(self):
+        # 期間のセットは泊まる日が決まっていないので自動予約しない
+        return [n_set for n_set in self.notification_sets
+                if n_set.get('auto_reserve', False) and not is_range_set(n_set)]
+
+    def recipients_for(self, n_set):
+        return n_set.get('recipients') or self.recipients
+
+    def label(self, text):
+        """
+        複数アカウントのときは、通知やログにアカウント名を付ける
+        """
+        return text if self.name == DEFAULT_TENANT else f"[{self.name}] {text}"
+
+    def close(self):
+        for lane in self.reservation_lanes.values():
+            try:
+                lane.close()
+            except Exception:
+                pass
+        self.reservation_lanes.clear()
+        if self.session:
+            self.session.quit()
+            self.session = None
+
+
+def all_notification_sets(config):
+    """
+    全アカウントの通知セットをまとめて返す（スケジュールを立てる用）
+    """
+    sets = list(config.get('notification_sets', []))
+    for account in config.get('accounts', []):
+        sets.extend(account.get('notification_sets', []))
+    return sets
+
+
+def tenant_specs(config, default_email=None, default_password=None):
+    """
+    config.json から各アカウントの設定を読み出す
+    ・直下の notification_sets（設定画面で編集するセット）は .env のアカウント
+    ・"accounts": [{"name": "tanaka", "env_file": ".env.tanaka", "profile_dir": "chrome_data_tanaka",
+                    "recipients": ["U..."], "notification_sets": [...]}] は追加のアカウント
+    パスワードは設定画面から見えないよう、config.json ではなく env_file（EMAIL_ADDRESS / PASSWORD）に書く
+    """
+    accounts = config.get('accounts', [])
+    lean = bool(config.get('lean_browser', False))
+    specs = []
+    if config.get('notification_sets') or not accounts:
+        specs.append({
+            'name': DEFAULT_TENANT,
+            'email': default_email,
+            'password': default_password,
+            'profile_dir': DEFAULT_PROFILE_DIR,
+            'recipients': None,
+            'lean': lean,
+            'notification_sets': config.get('notification_sets', []),
+        })
+
+    for account in accounts:
+        name = account['name']
+        env_file = os.path.join(BASE_DIR, account.get('env_file', f'.env.{name}'))
+        env = dotenv_values(env_file) if os.path.exists(env_file) else {}
+        if not env:
+            print(f"警告: アカウント「{name}」のログイン情報（{env_file}）が見つかりません")
+        specs.append({
+            'name': name,
+            'email': env.get('EMAIL_ADDRESS'),
+            'password': env.get('PASSWORD'),
+            'profile_dir': os.path.join(BASE_DIR, account.get('profile_dir', f'chrome_data_{name}')),
+            'recipients': account.get('recipients'),
+            'lean': lean,
+            'notification_sets': account.get('notification_sets', []),
+        })
+    return specs
+
+
+def sync_tenants(tenants, specs):
+    """
+    設定に合わせてアカウントを作る・更新する・削除する
+    ログイン情報やプロファイルが変わっていなければ、ブラウザや予約用タブはそのまま使い続ける
+    """
+    synced = {}
+    for spec in specs:
+        tenant = tenants.get(spec['name'])
+        identity = (spec['email'], spec['password'], spec['profile_dir'])
+        if tenant is not None and tenant.identity() != identity:
+            tenant.close()
+            tenant = None
+        if tenant is None:
+            tenant = Tenant(spec['name'], spec['email'], spec['password'], spec['profile_dir'])
+        tenant.recipients = spec['recipients'] or None
+        tenant.set_lean(spec.get('lean', False))
+        tenant.notification_sets = spec['notification_sets']
+        synced[spec['name']] = tenant
+
+    for name, tenant in tenants.items():
+        if name not in synced:
+            tenant.close()
+    return synced
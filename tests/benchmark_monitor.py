@@ -0,0 +1,316 @@
+"""
+模擬予約サイト（mock_reserve_site.py）に対して、実際の check_calendar_once() と自動予約を動かして速度を測る
+・1サイクル（check_calendar_once 1回）の所要時間のパーセンタイル
+・空きが出てから確定ボタンが押されるまでの時間（自動予約）と、LINE通知が届くまでの時間
+・Python と Chrome（子プロセスを含む）のメモリ使用量
+を表示し、--output のJSONに保存する。性能に関わる変更の前後で実行して比べる
+
+    python tests/benchmark_monitor.py --cycles 30 --sets 20 --latency 0.2
+
+Chrome と chromedriver が必要（予約サイト・LINE・ログやプロファイルはすべてローカルの一時ディレクトリを使う）
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+sys.path.insert(0, TESTS_DIR)
+
+from mock_reserve_site import DEFAULT_PLAN, MockReserveSite, is_open  # noqa: E402
+
+MOCK_EMAIL = 'bench@example.com'
+MOCK_PASSWORD = 'bench-password'
+
+
+def percentile(values, p):
+    """
+    線形補間のパーセンタイル（p は 0〜100）
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
+
+
+def read_rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def child_pids(pid):
+    """
+    pid の子孫プロセス（chromedriver と Chrome）を /proc から探す
+    """
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # "pid (comm) state ppid ..." comm に空白や括弧が入ることがあるので最後の ) から数える
+                fields = f.read().rsplit(')', 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    found = []
+    stack = [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def memory_snapshot():
+    """
+    {'python_mb', 'browser_mb'}（/proc がない環境では 0）
+    """
+    if not os.path.isdir('/proc'):
+        return {'python_mb': 0.0, 'browser_mb': 0.0}
+    pid = os.getpid()
+    return {
+        'python_mb': read_rss_kb(pid) / 1024,
+        'browser_mb': sum(read_rss_kb(child) for child in child_pids(pid)) / 1024,
+    }
+
+
+def make_sets(count, rng, today):
+    """
+    今日から3か月先までに散らばった通知セットと、最後に自動予約セットを1つ作る
+    """
+    sets = []
+    for i in range(count):
+        start = today + datetime.timedelta(days=rng.randrange(7, 90))
+        sets.append({'id': i + 1, 'name': f'ベンチ{i + 1}', 'start_date': start.isoformat(),
+                     'nights': rng.randint(1, 2), 'auto_reserve': False})
+    start = today + datetime.timedelta(days=rng.randrange(14, 60))
+    sets.append({'id': count + 1, 'name': 'ベンチ自動予約', 'start_date': start.isoformat(), 'nights': 1,
+                 'auto_reserve': True, 'adults': 2, 'children': 0, 'preschoolers': 0})
+    return sets
+
+
+def set_dates(n_set):
+    start = datetime.date.fromisoformat(n_set['start_date'])
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(n_set.get('nights', 1))]
+
+
+def configure_monitor(monitor, site, work_dir, notification_sets, workers, lean=False):
+    """
+    監視プログラムのログ・設定・通知・ブラウザのプロファイルを一時ディレクトリに向ける
+    """
+    from config_watcher import ConfigWatcher, write_config
+    from availability_events import EventLog
+    from history_store import HistoryStore
+    from line_dispatcher import LineDispatcher
+    from month_pool import MonthFetchPool
+    from notification_router import NotificationRouter, QuotaTracker
+    from metrics import metrics
+    import tenants
+
+    config_path = os.path.join(work_dir, 'config', 'config.json')
+    write_config({'check_interval': 600, 'parallel_workers': workers, 'line_monthly_quota': 100000,
+                  'lean_browser': lean, 'notification_sets': notification_sets}, config_path)
+    profile_dir = os.path.join(work_dir, 'chrome_data')
+    tenants.DEFAULT_PROFILE_DIR = profile_dir
+
+    metrics.metrics_file = os.path.join(work_dir, 'metrics.json')
+    metrics.cycles_file = os.path.join(work_dir, 'cycles.jsonl')
+
+    monitor.EMAIL_ADDRESS = MOCK_EMAIL
+    monitor.PASSWORD = MOCK_PASSWORD
+    monitor.config_watcher = ConfigWatcher(config_path)
+    monitor.event_log = EventLog(os.path.join(work_dir, 'events'))
+    monitor.history_store = HistoryStore(os.path.join(work_dir, 'history.db'))
+    monitor.line_dispatcher = LineDispatcher('mock-token', api_base=site.url,
+                                             outbox_dir=os.path.join(work_dir, 'line_outbox'))
+    monitor.notification_router = NotificationRouter(monitor.line_dispatcher,
+                                                     QuotaTracker(os.path.join(work_dir, 'line_quota.json')))
+    if workers > 1:
+        # 作業用プロファイルも一時ディレクトリに作る（本番の chrome_data_workers を上書きしない）
+        monitor.month_pool = MonthFetchPool(workers, base_profile_dir=profile_dir,
+                                            profiles_dir=os.path.join(work_dir, 'chrome_data_workers'), lean=lean)
+
+
+def first_notification_after(site, name, since):
+    for notification in site.notifications:
+        if notification['received_at'] < since:
+            continue
+        texts = [message.get('text', '') for message in notification['body'].get('messages', [])]
+        if any(name in text for text in texts):
+            return notification['received_at']
+    return None
+
+
+def run(cycles=20, sets=10, latency=0.0, workers=1, lean=False, seed=1, work_dir=None):
+    """
+    ベンチマークを実行して結果の dict を返す
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    notification_sets = make_sets(sets, rng, today)
+    notify_sets = [n_set for n_set in notification_sets if not n_set['auto_reserve']]
+    auto_set = notification_sets[-1]
+    auto_cycle = max(1, cycles // 2)
+
+    site = MockReserveSite(email=MOCK_EMAIL, password=MOCK_PASSWORD).start()
+    site.set_latency(calendar=latency, page=latency / 2)
+    # 監視プログラムを読み込む前に予約サイトの向き先を変える
+    os.environ['RESERVE_BASE_URL'] = site.url
+    import fumotoppara_monitor as monitor
+
+    temp_dir = None
+    if work_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix='fumotoppara-bench-')
+        work_dir = temp_dir.name
+    configure_monitor(monitor, site, work_dir, notification_sets, workers, lean)
+    monitor.line_dispatcher.start()
+
+    cycle_seconds = []
+    memory = []
+    opened = []  # [(セット名, 空きになった時刻)]
+    try:
+        for cycle in range(cycles):
+            if cycle == auto_cycle:
+                site.set_statuses({date_str: '△ 残1' for date_str in set_dates(auto_set)})
+            elif cycle > 0 and notify_sets:
+                # 毎サイクル1セット分の空きを出し、前に出した空きをいくつか埋める
+                n_set = notify_sets[(cycle - 1) % len(notify_sets)]
+                dates = set_dates(n_set)
+                if not all(is_open(site.status(date_str)) for date_str in dates):
+                    site.set_statuses({date_str: '〇' for date_str in dates})
+                    # 最後の1泊が空いた時点でセットとして空きになる
+                    opened.append((n_set['name'], max(site.opened_at[(DEFAULT_PLAN, d)] for d in dates)))
+                for other in rng.sample(notify_sets, min(2, len(notify_sets))):
+                    if other is not n_set:
+                        site.set_statuses({date_str: '×' for date_str in set_dates(other)})
+
+            started = time.perf_counter()
+            monitor.check_calendar_once()
+            cycle_seconds.append(time.perf_counter() - started)
+            memory.append(memory_snapshot())
+            print(f"サイクル {cycle + 1}/{cycles}: {cycle_seconds[-1]:.2f}秒")
+
+        monitor.line_dispatcher.flush(30)
+        phases = {phase: histogram['quantiles'] for phase, histogram in monitor.metrics.snapshot()['histograms'].items()}
+    finally:
+        monitor.close_tenants()
+        if monitor.month_pool:
+            monitor.month_pool.close()
+            monitor.month_pool = None
+        monitor.line_dispatcher.stop()
+        monitor.history_store.close()
+        site.stop()
+        if temp_dir:
+            temp_dir.cleanup()
+
+    vacancy_to_confirm = []
+    auto_opened = [site.opened_at[(DEFAULT_PLAN, d)] for d in set_dates(auto_set) if (DEFAULT_PLAN, d) in site.opened_at]
+    for reservation in site.reservations:
+        if reservation['date'] == auto_set['start_date'] and auto_opened:
+            vacancy_to_confirm.append(reservation['confirmed_at'] - max(auto_opened))
+
+    vacancy_to_notify = []
+    for name, opened_at in opened:
+        received_at = first_notification_after(site, name, opened_at)
+        if received_at is not None:
+            vacancy_to_notify.append(received_at - opened_at)
+
+    return {
+        'cycles': cycles,
+        'sets': sets,
+        'latency': latency,
+        'workers': workers,
+        'lean': lean,
+        'first_cycle_seconds': cycle_seconds[0] if cycle_seconds else None,
+        # 初回はブラウザの起動とログインを含むので、分けて集計する
+        'cycle_seconds': summarize(cycle_seconds[1:]),
+        'vacancy_to_confirm_seconds': summarize(vacancy_to_confirm),
+        'vacancy_to_notify_seconds': summarize(vacancy_to_notify),
+        # 段階ごとの所要時間（直近のパーセンタイル）
+        'phases': phases,
+        'reservations': len(site.reservations),
+        'requests': dict(site.request_counts),
+        'memory_mb': {
+            'python_peak': max((m['python_mb'] for m in memory), default=0.0),
+            'browser_peak': max((m['browser_mb'] for m in memory), default=0.0),
+            'total_last': (memory[-1]['python_mb'] + memory[-1]['browser_mb']) if memory else 0.0,
+        },
+    }
+
+
+def format_summary(label, summary):
+    if not summary.get('count'):
+        return f"{label}: 計測なし"
+    return (f"{label}: p50 {summary['p50']:.2f}秒 / p90 {summary['p90']:.2f}秒 / p99 {summary['p99']:.2f}秒"
+            f" / 最大 {summary['max']:.2f}秒（{summary['count']}回）")
+
+
+def print_report(result):
+    print("\n===== ベンチマーク結果 =====")
+    print(f"セット数 {result['sets']} / サイクル数 {result['cycles']} / 遅延 {result['latency']}秒 / ブラウザ {result['workers']}個"
+          f"{' / 軽量モード' if result['lean'] else ''}")
+    if result['first_cycle_seconds'] is not None:
+        print(f"初回サイクル（起動・ログイン込み）: {result['first_cycle_seconds']:.2f}秒")
+    print(format_summary("サイクル", result['cycle_seconds']))
+    print(format_summary("空き→確定クリック", result['vacancy_to_confirm_seconds']))
+    print(format_summary("空き→LINE通知", result['vacancy_to_notify_seconds']))
+    memory = result['memory_mb']
+    print(f"メモリ: Python 最大 {memory['python_peak']:.0f}MB / Chrome 最大 {memory['browser_peak']:.0f}MB"
+          f" / 最後 合計 {memory['total_last']:.0f}MB")
+    print(f"予約サイトへのリクエスト数: {result['requests']}")
+    print("段階ごとの所要時間（p50 / p90）:")
+    for phase, quantiles in sorted(result['phases'].items()):
+        print(f"  {phase}: {quantiles['0.5']:.3f}秒 / {quantiles['0.9']:.3f}秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模擬予約サイトで監視プログラムの速度を測る')
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--sets', type=int, default=10, help='通知セットの数（別に自動予約セットを1つ作る）')
+    parser.add_argument('--latency', type=float, default=0.0, help='カレンダー取得の遅延（秒）。画面の読み込みはこの半分')
+    parser.add_argument('--workers', type=int, default=1, help='parallel_workers（ブラウザの数）')
+    parser.add_argument('--lean', action='store_true', help='軽量モード（lean_browser）のブラウザで測る')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'logs', 'benchmark.json'))
+    args = parser.parse_args()
+
+    result = run(cycles=args.cycles, sets=args.sets, latency=args.latency, workers=args.workers, lean=args.lean,
+                 seed=args.seed)
+    print_report(result)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"結果を保存しました: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
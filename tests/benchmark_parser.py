@@ -0,0 +1,69 @@
+"""
+保存したページ（web/popup_page.html）と模擬サイトのカレンダー表を calendar_parser で繰り返し読み取り、1回あたりの時間を表示する
+パーサーを変更する前後で実行して比べる（ブラウザは不要）
+
+    python tests/benchmark_parser.py --repeat 200
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+sys.path.insert(0, TESTS_DIR)
+
+from benchmark_monitor import summarize  # noqa: E402
+from calendar_extractor import build_plan_statuses  # noqa: E402
+from calendar_parser import parse_calendar  # noqa: E402
+from mock_reserve_site import MockReserveSite  # noqa: E402
+
+SAVED_PAGE = os.path.join(BASE_DIR, 'web', 'popup_page.html')
+
+
+def sample_pages():
+    """
+    {名前: (HTML, 表示中の年, 月)}
+    """
+    pages = {}
+    with open(SAVED_PAGE, 'r', encoding='utf-8') as f:
+        pages['popup_page.html'] = (f.read(), 2026, 2)
+    site = MockReserveSite(today=datetime.date(2026, 3, 10))
+    pages['mock_table'] = (site.render_table(2026, 4), 2026, 4)
+    return pages
+
+
+def measure(html, year, month, repeat):
+    parse_times = []
+    total_times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        grid = parse_calendar(html)
+        parsed = time.perf_counter()
+        build_plan_statuses(grid, year, month)
+        parse_times.append(parsed - started)
+        total_times.append(time.perf_counter() - started)
+    return {'bytes': len(html.encode('utf-8')), 'parse': summarize(parse_times), 'parse_and_build': summarize(total_times)}
+
+
+def run(repeat):
+    return {name: measure(html, year, month, repeat) for name, (html, year, month) in sample_pages().items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='カレンダーのHTMLパーサーの速度を測る')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    for name, result in run(args.repeat).items():
+        print(f"{name}（{result['bytes'] // 1024}KB）")
+        for key in ('parse', 'parse_and_build'):
+            stats = result[key]
+            print(f"  {key:16s} p50 {stats['p50'] * 1000:.2f}ms  p90 {stats['p90'] * 1000:.2f}ms  "
+                  f"max {stats['max'] * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
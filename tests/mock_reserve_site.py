@@ -0,0 +1,610 @@
+"""
+reserve.fumotoppara.net の代わりに使うローカルの模擬予約サイト
+・ログイン → 予約日選択（カレンダー） → 泊数選択のポップアップ → 予約内容入力 → 確認 → 完了 の画面を返す
+・空き状況、応答の遅延、エラーや強制ログアウトをテストやベンチマークから自由に変えられる
+・LINE Messaging API の送信先（/v2/bot/message/...）も兼ねており、届いた通知を記録する
+
+監視プログラムを手で向ける場合:
+    python tests/mock_reserve_site.py --port 8765
+    RESERVE_BASE_URL=http://127.0.0.1:8765 LINE_API_BASE=http://127.0.0.1:8765 python3 src/fumotoppara_monitor.py
+空き状況などは POST /mock/control（JSON）で変更し、GET /mock/state で記録を確認する
+"""
+import argparse
+import datetime
+import html
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PLAN = 'キャンプ宿泊'
+# 実際のサイトと同じく、キャンプ宿泊の上に別の施設の行がある
+DEFAULT_PLANS = ('コテージ', DEFAULT_PLAN)
+
+WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+ARRIVAL_TIMES = ["08:30 ～ 10:59", "11:00 ～ 13:59", "14:00 ～ 16:45"]
+
+# 1回の表示に含まれる日数（実際のサイトは選んだ月の1日から約4か月分）
+DEFAULT_CALENDAR_DAYS = 120
+
+SESSION_COOKIE = 'mock_session'
+
+STYLE = """
+body { font-family: sans-serif; }
+.el-loading-mask { position: fixed; top: 0; left: 0; right: 0; bottom: 0; background: rgba(255,255,255,.9); }
+.el-dialog__wrapper { position: fixed; top: 20%; left: 20%; background: #fff; border: 1px solid #888; padding: 16px; }
+.el-select-dropdown { border: 1px solid #888; }
+.el-select-dropdown__item { padding: 4px; cursor: pointer; }
+td.selection { cursor: pointer; }
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>ログイン</title><style>{style}</style></head>
+<body><main class="el-main"><h1>ログイン</h1>
+<form class="el-form" method="post" action="/login">
+<div class="el-form-item"><label>メールアドレス</label><input type="text" name="email" placeholder="メールアドレス" class="el-input__inner"></div>
+<div class="el-form-item"><label>パスワード</label><input type="password" name="password" placeholder="パスワード" class="el-input__inner"></div>
+<p class="error">{error}</p>
+<button type="submit" class="el-button el-button--primary"><span> ログイン </span></button>
+</form></main></body></html>
+"""
+
+CALENDAR_SCRIPT = """
+var mask = document.querySelector('.el-loading-mask');
+var frame = document.querySelector('.calendar-frame');
+var dialog = document.querySelector('.reserved-selection-dialog');
+var selected = null;
+
+function loadMonth(year, month) {
+    mask.style.display = 'block';
+    fetch('/mock/api/calendar?year=' + year + '&month=' + month, {credentials: 'same-origin'})
+        .then(function (res) {
+            if (res.status === 401) { location.href = '/'; return null; }
+            if (!res.ok) { throw new Error('HTTP ' + res.status); }
+            return res.text();
+        })
+        .then(function (text) { if (text !== null) { frame.innerHTML = text; } })
+        .catch(function (e) { document.querySelector('.error').textContent = '取得に失敗しました: ' + e.message; })
+        .then(function () { mask.style.display = 'none'; });
+}
+
+var buttons = document.querySelectorAll('.month-button');
+for (var i = 0; i < buttons.length; i++) {
+    buttons[i].addEventListener('click', function () {
+        loadMonth(this.getAttribute('data-year'), this.getAttribute('data-month'));
+    });
+}
+
+frame.addEventListener('click', function (e) {
+    var td = e.target.closest('td.selection');
+    if (!td) { return; }
+    selected = td;
+    var nights = parseInt(td.getAttribute('data-nights'), 10);
+    var group = dialog.querySelector('.el-radio-group');
+    group.innerHTML = '';
+    for (var n = 1; n <= nights; n++) {
+        group.insertAdjacentHTML('beforeend',
+            '<label role="radio" class="el-radio is-bordered"><span class="el-radio__input">'
+            + '<input type="radio" name="nights" class="el-radio__original" value="' + n + '"' + (n === 1 ? ' checked' : '') + '>'
+            + '</span><span class="el-radio__label"> ' + n + '泊 </span></label>');
+    }
+    dialog.querySelector('.el-dialog__title').textContent = td.getAttribute('data-date').replace(/-0?/g, '/');
+    dialog.style.display = 'block';
+});
+
+dialog.querySelector('.el-dialog__footer button').addEventListener('click', function () {
+    dialog.style.display = 'none';
+});
+
+dialog.querySelector('.reserved-button button').addEventListener('click', function () {
+    var checked = dialog.querySelector('input[name=nights]:checked');
+    location.href = '/reserved/reserved-edit?date=' + selected.getAttribute('data-date')
+        + '&plan=' + encodeURIComponent(selected.getAttribute('data-plan'))
+        + '&nights=' + (checked ? checked.value : 1);
+});
+"""
+
+CALENDAR_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>予約日選択</title><style>{style}</style></head>
+<body><main class="el-main"><h1>予約日選択</h1>
+<form class="el-form">
+<div class="el-dialog__wrapper reserved-selection-dialog" style="display: none;">
+<div class="el-dialog__header"><span class="el-dialog__title"></span></div>
+<div class="el-dialog__body">
+<div class="el-form-item stay-count"><div role="radiogroup" class="el-radio-group"></div></div>
+<div class="el-form-item reserved-button"><button type="button" class="el-button el-button--success"><span> 予約する </span></button></div>
+</div>
+<div class="el-dialog__footer"><button type="button" class="el-button"><span> 閉じる </span></button></div>
+</div>
+<div class="calendar-area">
+<div class="calendar-button">{month_buttons}</div>
+<p class="error"></p>
+<div class="calendar-frame">{table}</div>
+</div>
+</form>
+<div class="el-loading-mask" style="display: none;"><div class="el-loading-spinner"></div></div>
+</main>
+<script>{script}</script>
+</body></html>
+"""
+
+DETAIL_SCRIPT = """
+var select = document.querySelector('.el-select');
+var dropdown = select.querySelector('.el-select-dropdown');
+var arrival = select.querySelector('input');
+select.addEventListener('click', function (e) {
+    var item = e.target.closest('.el-select-dropdown__item');
+    if (item) {
+        arrival.value = item.textContent.trim();
+        dropdown.style.display = 'none';
+        e.stopPropagation();
+        return;
+    }
+    dropdown.style.display = dropdown.style.display === 'none' ? 'block' : 'none';
+});
+
+document.querySelector('.next-button').addEventListener('click', function () {
+    if (!arrival.value) {
+        document.querySelector('.error').textContent = '到着時刻を選択してください';
+        return;
+    }
+    var params = new URLSearchParams(location.search);
+    params.set('arrival', arrival.value);
+    var inputs = document.querySelectorAll('.party input');
+    for (var i = 0; i < inputs.length; i++) {
+        params.set(inputs[i].getAttribute('name'), inputs[i].value || '0');
+    }
+    location.href = '/reserved/reserved-confirm?' + params.toString();
+});
+"""
+
+DETAIL_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>ご予約内容入力</title><style>{style}</style></head>
+<body><main class="el-main"><h1>ご予約内容入力</h1>
+<form class="el-form reserved-edit-form">
+<div class="el-form-item"><label class="el-form-item__label">予約日</label>
+<div class="el-form-item__content"> {date} <label>（ {nights} 泊 ）</label></div></div>
+<div class="el-form-item"><label class="el-form-item__label">予約施設</label><div class="el-form-item__content"> {plan} </div></div>
+<div class="el-form-item is-required"><label class="el-form-item__label">到着時刻</label>
+<div class="el-form-item__content"><div class="el-select">
+<div class="el-input el-input--suffix"><input type="text" readonly="readonly" placeholder="時刻" class="el-input__inner"></div>
+<div class="el-select-dropdown el-popper" style="display: none;"><ul class="el-select-dropdown__list">{arrival_items}</ul></div>
+</div></div></div>
+<h4>人数</h4>
+<div class="party">{party_items}</div>
+<p class="error"></p>
+<button type="button" class="el-button el-button--primary next-button"><span> 次へ </span></button>
+</form></main>
+<script>{script}</script>
+</body></html>
+"""
+
+CONFIRM_SCRIPT = """
+document.querySelector('.confirm-button').addEventListener('click', function () {
+    var button = this;
+    button.disabled = true;
+    var params = new URLSearchParams(location.search);
+    var body = {};
+    params.forEach(function (value, key) { body[key] = value; });
+    fetch('/mock/api/reserve', {method: 'POST', credentials: 'same-origin',
+                                headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)})
+        .then(function (res) { return res.json().then(function (data) { return {ok: res.ok, data: data}; }); })
+        .then(function (result) {
+            if (result.ok) {
+                location.href = '/reserved/reserved-complete?id=' + result.data.id;
+            } else {
+                document.querySelector('.error').textContent = result.data.message;
+                button.disabled = false;
+            }
+        })
+        .catch(function (e) {
+            document.querySelector('.error').textContent = '通信に失敗しました: ' + e.message;
+            button.disabled = false;
+        });
+});
+"""
+
+CONFIRM_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>ご予約内容確認</title><style>{style}</style></head>
+<body><main class="el-main"><h1>ご予約内容確認</h1>
+<dl>{summary}</dl>
+<p class="error"></p>
+<button type="button" class="el-button el-button--primary confirm-button"><span> 予約を確定する </span></button>
+</main>
+<script>{script}</script>
+</body></html>
+"""
+
+COMPLETE_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>予約完了</title></head>
+<body><main class="el-main"><h1>予約完了</h1><p>ご予約を受け付けました。予約が完了しました。（予約番号 {id}）</p></main></body></html>
+"""
+
+ERROR_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>エラー</title></head>
+<body><h1>{status}</h1><p>只今アクセスが集中しております。</p></body></html>
+"""
+
+
+def is_open(status):
+    return '〇' in status or '△' in status
+
+
+def month_year(month, today):
+    """
+    月ボタンの月が今年か来年か（今月より前の月は来年）
+    """
+    return today.year if month >= today.month else today.year + 1
+
+
+class MockReserveSite:
+    """
+    模擬予約サイト
+    ・set_status / set_statuses で日付ごとの空き状況を変え、空きになった時刻を opened_at に記録する
+    ・set_latency で画面（page）・カレンダー取得（calendar）・予約確定（reserve）の応答を遅らせる
+    ・fail_next で次の何回かのリクエストをエラーにし、expire_sessions で全員をログアウトさせる
+    ・確定ボタンが押された時刻と内容は reservations に、届いたLINE通知は notifications に記録する
+    時刻はすべて time.perf_counter()（同じプロセスのベンチマークから比べるため）
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, plans=DEFAULT_PLANS, calendar_days=DEFAULT_CALENDAR_DAYS,
+                 email=None, password=None, today=None):
+        self.plans = list(plans)
+        self.calendar_days = calendar_days
+        # email / password を指定しなければ、空でなければ誰でもログインできる
+        self.email = email
+        self.password = password
+        self.today = today
+
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.opened_at = {}
+        self.latency = {'page': 0.0, 'calendar': 0.0, 'reserve': 0.0}
+        self.failures = {}
+        self.sessions = set()
+        self.request_counts = {}
+        self.reservations = []
+        self.notifications = []
+
+        site = self
+
+        class Handler(MockSiteHandler):
+            pass
+
+        Handler.site = site
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-reserve-site', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---- 空き状況・障害の設定 ----
+
+    def current_date(self):
+        return self.today or datetime.date.today()
+
+    def status(self, date_str, plan=DEFAULT_PLAN):
+        if date_str < self.current_date().isoformat():
+            return 'ー'
+        return self.statuses.get((plan, date_str), '×')
+
+    def set_status(self, date_str, status, plan=DEFAULT_PLAN):
+        self.set_statuses({date_str: status}, plan)
+
+    def set_statuses(self, statuses, plan=DEFAULT_PLAN):
+        now = time.perf_counter()
+        with self.lock:
+            for date_str, status in statuses.items():
+                was_open = is_open(self.status(date_str, plan))
+                self.statuses[(plan, date_str)] = status
+                if is_open(status) and not was_open:
+                    self.opened_at[(plan, date_str)] = now
+
+    def set_latency(self, **latency):
+        with self.lock:
+            self.latency.update(latency)
+
+    def fail_next(self, kind, count=1, status=500):
+        """
+        kind（page / calendar / reserve）の次の count 回のリクエストを status で失敗させる
+        """
+        with self.lock:
+            self.failures.setdefault(kind, []).extend([status] * count)
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def state(self):
+        with self.lock:
+            return {
+                'requests': dict(self.request_counts),
+                'reservations': list(self.reservations),
+                'notifications': len(self.notifications),
+                'sessions': len(self.sessions),
+            }
+
+    # ---- リクエスト処理から使う ----
+
+    def begin(self, kind):
+        """
+        リクエストを数え、遅延を入れる。失敗させる場合はステータスコードを返す
+        """
+        with self.lock:
+            self.request_counts[kind] = self.request_counts.get(kind, 0) + 1
+            delay = self.latency.get(kind, 0.0)
+            queued = self.failures.get(kind)
+            failure = queued.pop(0) if queued else None
+        if delay:
+            time.sleep(delay)
+        return failure
+
+    def open_nights(self, date_str, plan, limit=7):
+        """
+        その日から何泊続けて空いているか（ポップアップに出す泊数）
+        """
+        day = datetime.date.fromisoformat(date_str)
+        nights = 0
+        while nights < limit and is_open(self.status((day + datetime.timedelta(days=nights)).isoformat(), plan)):
+            nights += 1
+        return nights
+
+    def render_table(self, year, month):
+        start = datetime.date(year, month, 1)
+        days = [start + datetime.timedelta(days=i) for i in range(self.calendar_days)]
+        parts = ['<table border="0" cellspacing="0" cellpadding="0" class="calendar-table"><thead><tr>',
+                 '<th class="cell-corner"> &nbsp; </th>']
+        for day in days:
+            parts.append(f'<th class="cell-date"><p> {day.month}/{day.day} </p> <p> {WEEKDAYS[day.weekday()]} </p></th>')
+        parts.append('</tr></thead><tbody>')
+        with self.lock:
+            for plan in self.plans:
+                parts.append(f'<tr><th class="cell-site"><p> {html.escape(plan)} </p></th>')
+                for day in days:
+                    date_str = day.isoformat()
+                    status = self.status(date_str, plan)
+                    if is_open(status):
+                        parts.append(
+                            f'<td class="cell-date selection" data-date="{date_str}" data-plan="{html.escape(plan)}" '
+                            f'data-nights="{self.open_nights(date_str, plan)}"><a class="el-link is-underline">'
+                            f'<span class="el-link--inner"><p> {html.escape(status)} </p></span></a></td>')
+                    else:
+                        parts.append(f'<td class="cell-date"><p> {html.escape(status)} </p></td>')
+                parts.append('</tr>')
+        parts.append('</tbody></table>')
+        return ''.join(parts)
+
+    def month_buttons(self):
+        today = self.current_date()
+        buttons = []
+        for i in range(12):
+            month = (today.month - 1 + i) % 12 + 1
+            buttons.append(f'<button type="button" class="el-button month-button" data-year="{month_year(month, today)}" '
+                           f'data-month="{month}"><span><span>{month}月</span></span></button>')
+        return ''.join(buttons)
+
+    def login(self, email, password):
+        if not email or not password:
+            return None
+        if self.email is not None and (email, password) != (self.email, self.password):
+            return None
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions.add(token)
+        return token
+
+    def reserve(self, request):
+        """
+        確定ボタンが押されたときの処理（全泊が空いていれば予約し、その日の空きを1つ減らす）
+        """
+        confirmed_at = time.perf_counter()
+        date_str = request.get('date', '')
+        plan = request.get('plan', DEFAULT_PLAN)
+        nights = int(request.get('nights', 1))
+        with self.lock:
+            dates = [(datetime.date.fromisoformat(date_str) + datetime.timedelta(days=i)).isoformat()
+                     for i in range(nights)]
+            if not all(is_open(self.status(d, plan)) for d in dates):
+                return None
+            for d in dates:
+                self.statuses[(plan, d)] = '×'
+            reservation = {
+                'id': len(self.reservations) + 1,
+                'date': date_str,
+                'plan': plan,
+                'nights': nights,
+                'arrival': request.get('arrival'),
+                'party': {key: int(request.get(key, 0) or 0) for key in ('adults', 'children', 'preschoolers')},
+                'confirmed_at': confirmed_at,
+            }
+            self.reservations.append(reservation)
+        return reservation
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    site = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def session_token(self):
+        for part in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == SESSION_COOKIE:
+                return value
+        return None
+
+    def logged_in(self):
+        return self.session_token() in self.site.sessions
+
+    def send_body(self, body, content_type='text/html; charset=utf-8', status=200, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200):
+        self.send_body(json.dumps(data, ensure_ascii=False), 'application/json; charset=utf-8', status)
+
+    def redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8')
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        path = parsed.path
+        site = self.site
+
+        if path == '/mock/state':
+            self.send_json(site.state())
+            return
+        if path == '/mock/api/calendar':
+            failure = site.begin('calendar')
+            if not self.logged_in():
+                self.send_json({'message': 'ログインしてください'}, status=401)
+            elif failure:
+                self.send_json({'message': 'エラー'}, status=failure)
+            else:
+                self.send_body(site.render_table(int(params['year']), int(params['month'])))
+            return
+
+        failure = site.begin('page')
+        if failure:
+            self.send_body(ERROR_PAGE.format(status=failure), status=failure)
+            return
+        if path in ('/', '/login'):
+            self.send_body(LOGIN_PAGE.format(style=STYLE, error=''))
+            return
+        if not path.startswith('/reserved/'):
+            self.send_body(ERROR_PAGE.format(status=404), status=404)
+            return
+        if not self.logged_in():
+            self.redirect('/')
+            return
+
+        if path == '/reserved/reserved-date-selection':
+            today = site.current_date()
+            self.send_body(CALENDAR_PAGE.format(style=STYLE, month_buttons=site.month_buttons(),
+                                                table=site.render_table(today.year, today.month),
+                                                script=CALENDAR_SCRIPT))
+        elif path == '/reserved/reserved-edit':
+            arrival_items = ''.join(f'<li class="el-select-dropdown__item"><span>{t}</span></li>' for t in ARRIVAL_TIMES)
+            party_items = ''.join(
+                f'<div class="el-form-item is-required"><label class="el-form-item__label">{label}</label>'
+                f'<div class="el-form-item__content"><input type="text" name="{name}" class="el-input__inner"></div></div>'
+                for label, name in (('大人（中学生以上）', 'adults'), ('小学生', 'children'), ('未就学児', 'preschoolers')))
+            self.send_body(DETAIL_PAGE.format(style=STYLE, date=html.escape(params.get('date', '')),
+                                              nights=html.escape(params.get('nights', '1')),
+                                              plan=html.escape(params.get('plan', DEFAULT_PLAN)),
+                                              arrival_items=arrival_items, party_items=party_items,
+                                              script=DETAIL_SCRIPT))
+        elif path == '/reserved/reserved-confirm':
+            summary = ''.join(f'<dt>{html.escape(key)}</dt><dd>{html.escape(value)}</dd>' for key, value in params.items())
+            self.send_body(CONFIRM_PAGE.format(style=STYLE, summary=summary, script=CONFIRM_SCRIPT))
+        elif path == '/reserved/reserved-complete':
+            self.send_body(COMPLETE_PAGE.format(id=html.escape(params.get('id', ''))))
+        else:
+            self.send_body(ERROR_PAGE.format(status=404), status=404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        site = self.site
+
+        if path == '/login':
+            form = {key: values[0] for key, values in parse_qs(self.read_body()).items()}
+            token = site.login(form.get('email'), form.get('password'))
+            if token is None:
+                self.send_body(LOGIN_PAGE.format(style=STYLE, error='メールアドレスまたはパスワードが違います'))
+                return
+            self.redirect('/reserved/reserved-date-selection',
+                          {'Set-Cookie': f'{SESSION_COOKIE}={token}; Path=/; HttpOnly'})
+        elif path == '/mock/api/reserve':
+            request = json.loads(self.read_body() or '{}')
+            failure = site.begin('reserve')
+            if not self.logged_in():
+                self.send_json({'message': 'ログインしてください'}, status=401)
+            elif failure:
+                self.send_json({'message': f'エラーが発生しました（{failure}）'}, status=failure)
+            else:
+                reservation = site.reserve(request)
+                if reservation is None:
+                    self.send_json({'message': '満室のため予約できませんでした'}, status=409)
+                else:
+                    self.send_json({'id': reservation['id']})
+        elif path == '/mock/control':
+            self.control(json.loads(self.read_body() or '{}'))
+            self.send_json(site.state())
+        elif path.startswith('/v2/bot/message/'):
+            body = json.loads(self.read_body() or '{}')
+            with site.lock:
+                site.notifications.append({'endpoint': path.rsplit('/', 1)[-1], 'body': body,
+                                           'received_at': time.perf_counter()})
+            self.send_json({})
+        else:
+            self.send_json({'message': 'Not found'}, status=404)
+
+    def control(self, command):
+        """
+        {"statuses": {"2026-05-02": "〇"}, "plan": "キャンプ宿泊", "latency": {"calendar": 0.5},
+         "fail": {"calendar": 2}, "expire_sessions": true}
+        """
+        site = self.site
+        if 'statuses' in command:
+            site.set_statuses(command['statuses'], command.get('plan', DEFAULT_PLAN))
+        if 'latency' in command:
+            site.set_latency(**command['latency'])
+        for kind, count in command.get('fail', {}).items():
+            site.fail_next(kind, count)
+        if command.get('expire_sessions'):
+            site.expire_sessions()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ふもとっぱら予約サイトの模擬サーバー')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='カレンダー取得の遅延（秒）')
+    args = parser.parse_args()
+
+    site = MockReserveSite(port=args.port)
+    site.set_latency(calendar=args.latency)
+    print(f"模擬予約サイトを起動しました: {site.url}")
+    print("停止するには Ctrl+C を押してください。")
+    try:
+        site.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n模擬予約サイトを停止しました。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from availability_client import AvailabilityClient, AvailabilityApiError, parse_availability
+
+
+class FakeReserveApi(BaseHTTPRequestHandler):
+    # テストごとに差し替える応答 (ステータスコード, JSON)
+    response = (200, {})
+    requests_seen = []
+
+    def do_GET(self):
+        FakeReserveApi.requests_seen.append((self.path, self.headers.get('Cookie')))
+        status, body = FakeReserveApi.response
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    FakeReserveApi.requests_seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FakeReserveApi)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cookies_file(tmp_path):
+    path = tmp_path / 'session_cookies.json'
+    path.write_text(json.dumps([{'name': 'SESSION', 'value': 'abc', 'domain': '127.0.0.1', 'path': '/'}]))
+    return str(path)
+
+
+def make_client(base_url, cookies_file):
+    return AvailabilityClient({'url': base_url + '/api/calendar', 'params': {'year': '{year}', 'month': '{month}'}},
+                              cookies_path=cookies_file)
+
+
+def test_fetch_month_returns_date_status_map(api_server, cookies_file):
+    FakeReserveApi.response = (200, [
+        {'date': '2026-03-27', 'plan': 'キャンプ宿泊', 'status': '〇'},
+        {'date': '2026-03-28', 'plan': 'キャンプ宿泊', 'remaining': 2},
+        {'date': '2026-03-27', 'plan': 'キャンプ日帰り', 'status': '×'},
+    ])
+    client = make_client(api_server, cookies_file)
+
+    statuses = client.fetch_month(2026, 3)
+
+    assert statuses == {'2026-03-27': '〇', '2026-03-28': '△ 残2'}
+    path, cookie = FakeReserveApi.requests_seen[0]
+    assert path == '/api/calendar?year=2026&month=3'
+    assert cookie == 'SESSION=abc'
+
+
+def test_fetch_months_reuses_connection(api_server, cookies_file):
+    FakeReserveApi.response = (200, {'dates': {'2026-03-27': '×'}})
+    client = make_client(api_server, cookies_file)
+
+    client.fetch_months([(2026, 3), (2026, 4)])
+
+    assert len(FakeReserveApi.requests_seen) == 2
+    pool = client.session.get_adapter(api_server).poolmanager
+    assert len(pool.pools) == 1
+
+
+@pytest.mark.parametrize('status, body', [
+    (302, {}),
+    (401, {}),
+    (500, {}),
+    (200, {'unexpected': [1, 2]}),
+    (200, []),
+])
+def test_unusable_responses_raise_for_fallback(api_server, cookies_file, status, body):
+    FakeReserveApi.response = (status, body)
+    client = make_client(api_server, cookies_file)
+
+    with pytest.raises(AvailabilityApiError):
+        client.fetch_month(2026, 3)
+
+
+def test_parse_calendar_grid_shape():
+    grid = {
+        'headers': ['', '3/27 金', '3/28 土'],
+        'rows': [
+            {'label': 'キャンプ日帰り', 'row_index': 1, 'cells': ['〇', '〇']},
+            {'label': 'キャンプ宿泊', 'row_index': 2, 'cells': ['△ 残2', '×']},
+        ],
+    }
+    assert parse_availability(grid, 2026, 3) == {'2026-03-27': '△ 残2', '2026-03-28': '×'}
@@ -0,0 +1,74 @@
+import datetime
+
+from availability_events import EventLog, diff_snapshots, format_event
+
+
+def test_diff_emits_only_transitions():
+    previous = {'2026-03-27': '×', '2026-03-28': '〇', '2026-04-01': '×'}
+    current = {'2026-03-27': '△ 残2', '2026-03-28': '〇'}
+
+    events = diff_snapshots(previous, current)
+
+    assert events == [{'date': '2026-03-27', 'plan': 'キャンプ宿泊', 'from': '×', 'to': '△ 残2'}]
+    assert format_event(events[0]) == '2026-03-27 × -> △ 残2'
+
+    day_trip = diff_snapshots(previous, current, plan='キャンプ日帰り')
+    assert format_event(day_trip[0]) == '[キャンプ日帰り] 2026-03-27 × -> △ 残2'
+
+
+def test_state_can_be_rebuilt_at_any_point(tmp_path):
+    log = EventLog(str(tmp_path))
+    state = {}
+    snapshots = [
+        (datetime.datetime(2026, 3, 1, 9, 0), {'2026-03-27': '×', '2026-03-28': '×'}),
+        (datetime.datetime(2026, 3, 1, 9, 10), {'2026-03-27': '×', '2026-03-28': '×'}),
+        (datetime.datetime(2026, 3, 1, 23, 50), {'2026-03-27': '△ 残1', '2026-03-28': '×'}),
+        (datetime.datetime(2026, 3, 2, 8, 0), {'2026-03-27': '×', '2026-03-28': '〇'}),
+    ]
+    for observed_at, snapshot in snapshots:
+        log.append(diff_snapshots(state, snapshot), observed_at=observed_at)
+        state.update(snapshot)
+
+    # 変化のないチェックは何も書かない
+    assert len(list(log.iter_events())) == 5
+    assert [p[-16:] for p in log.files()] == ['2026-03-01.jsonl', '2026-03-02.jsonl']
+
+    assert log.state_at(datetime.datetime(2026, 3, 1, 12, 0)) == {'2026-03-27': '×', '2026-03-28': '×'}
+    assert log.state_at('2026-03-01T23:59:59') == {'2026-03-27': '△ 残1', '2026-03-28': '×'}
+    assert log.state_at() == {'2026-03-27': '×', '2026-03-28': '〇'}
+
+    log.append(diff_snapshots({}, {'2026-03-28': '〇'}, plan='キャンプ日帰り'), observed_at=datetime.datetime(2026, 3, 2, 9, 0))
+    assert log.state_at() == {'2026-03-27': '×', '2026-03-28': '〇'}
+    assert log.plan_states_at() == {'キャンプ宿泊': {'2026-03-27': '×', '2026-03-28': '〇'},
+                                    'キャンプ日帰り': {'2026-03-28': '〇'}}
+
+
+def test_state_is_replayed_on_top_of_a_snapshot(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append([{'date': '2026-03-27', 'plan': 'キャンプ宿泊', 'from': None, 'to': '×'}],
+               observed_at=datetime.datetime(2026, 3, 1, 9, 0))
+    log.append([{'date': '2026-03-28', 'plan': 'キャンプ宿泊', 'from': '×', 'to': '〇'}],
+               observed_at=datetime.datetime(2026, 3, 2, 9, 0))
+    # 3/1 のファイルは読まない（スナップショットの内容がそのまま残る）
+    snapshot = {'キャンプ宿泊': {'2026-03-26': '〇', '2026-03-27': '△ 残1', '2026-03-28': '×'}}
+    states = log.plan_states_at(base=snapshot, since=datetime.datetime(2026, 3, 2, 0, 0), target_from='2026-03-27')
+    assert states == {'キャンプ宿泊': {'2026-03-27': '△ 残1', '2026-03-28': '〇'}}
+    assert snapshot['キャンプ宿泊']['2026-03-28'] == '×'
+
+
+def test_tail_reads_newest_file_from_the_end(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.append([{'date': '2026-03-27', 'plan': 'キャンプ宿泊', 'from': None, 'to': '×'}],
+               observed_at=datetime.datetime(2026, 3, 1, 9, 0))
+    start = datetime.datetime(2026, 3, 2, 0, 0)
+    for i in range(500):
+        log.append([{'date': '2026-03-28', 'plan': 'キャンプ宿泊', 'from': '×', 'to': f'△ 残{i}'}],
+                   observed_at=start + datetime.timedelta(seconds=i))
+
+    # ブロックの境目をまたいで読んでも行が欠けない
+    events = log.tail(300)
+    assert len(events) == 300
+    assert events[0]['to'] == '△ 残499'
+    assert events[-1]['to'] == '△ 残200'
+    assert len(log.tail(1000)) == 500
+    assert EventLog(str(tmp_path / 'none')).tail() == []
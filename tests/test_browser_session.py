@@ -0,0 +1,63 @@
+from selenium.common.exceptions import WebDriverException
+
+import browser_session
+from browser_session import LEAN_BLOCKED_URLS, BrowserSession, block_resources, build_chrome_options
+
+
+class FakeDriver:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        if self.fail:
+            raise WebDriverException('cdp unavailable')
+        self.commands.append((command, params))
+
+
+def test_lean_options_disable_gpu_extensions_and_cap_cache(tmp_path):
+    full = build_chrome_options(str(tmp_path)).arguments
+    lean = build_chrome_options(str(tmp_path), lean=True).arguments
+    assert '--disable-gpu' not in full
+    for argument in ('--disable-gpu', '--disable-extensions', '--blink-settings=imagesEnabled=false'):
+        assert argument in lean
+    assert any(argument.startswith('--disk-cache-size=') for argument in lean)
+    assert f'--user-data-dir={tmp_path}' in lean
+
+
+def test_block_resources_sends_blocked_urls():
+    driver = FakeDriver()
+    assert block_resources(driver)
+    assert driver.commands == [('Network.enable', {}), ('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})]
+    assert '*googletagmanager.com*' in LEAN_BLOCKED_URLS
+    assert not block_resources(FakeDriver(fail=True))
+
+
+def test_falls_back_to_full_browser_once(tmp_path, monkeypatch):
+    started = []
+
+    def fake_chrome(options):
+        started.append(options.arguments)
+        driver = FakeDriver()
+        driver.current_window_handle = 'main'
+        driver.set_page_load_timeout = lambda seconds: None
+        driver.set_script_timeout = lambda seconds: None
+        driver.quit = lambda: None
+        return driver
+
+    monkeypatch.setattr(browser_session.webdriver, 'Chrome', fake_chrome)
+    session = BrowserSession(user_data_dir=str(tmp_path), lean=True)
+    driver = session.start()
+    assert '--disable-gpu' in started[0]
+    assert driver.commands[-1][0] == 'Network.setBlockedURLs'
+
+    assert session.fall_back_to_full("カレンダーが表示されませんでした")
+    assert '--disable-gpu' not in started[1]
+    assert session.driver.commands == []
+    assert not session.fall_back_to_full("カレンダーが表示されませんでした")
+    assert len(started) == 2
+
+    # 設定で軽量モードを切り替えたら、次に使うときに起動し直す
+    session.set_lean(False)
+    assert session.driver is None
+    assert not session.lean
@@ -0,0 +1,156 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import browser_watchdog
+from browser_watchdog import BrowserWatchdog, is_orphan, read_processes, reap_orphans, tree_usage
+
+pytestmark = pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason='/proc がない環境')
+
+SLEEP_CODE = 'import time; time.sleep(30)'
+
+
+@pytest.fixture
+def chrome(tmp_path):
+    """
+    プロセス名が chrome になる Python（シンボリックリンク経由で起動するとプロセス名がリンク名になる）
+    """
+    path = tmp_path / 'chrome'
+    os.symlink(sys.executable, path)
+    return str(path)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def is_running(pid):
+    return pid in read_processes()
+
+
+def test_tree_usage_counts_descendants():
+    code = f'import subprocess, sys, time; subprocess.Popen([sys.executable, "-c", {SLEEP_CODE!r}]); time.sleep(30)'
+    parent = subprocess.Popen([sys.executable, '-c', code])
+    try:
+        assert wait_until(lambda: (tree_usage(parent.pid) or {}).get('processes') == 2)
+        usage = tree_usage(parent.pid)
+        assert usage['pid'] == parent.pid and usage['rss'] > 1024 * 1024
+        assert tree_usage(2 ** 22 + 1) is None
+    finally:
+        for pid in browser_watchdog.descendants(parent.pid, read_processes()):
+            os.kill(pid, 9)
+        parent.kill()
+        parent.wait()
+
+
+def test_orphan_is_decided_by_who_launched_the_chrome_chain():
+    processes = {
+        1: (0, 'init'),
+        100: (1, 'python3'), 101: (100, 'chromedriver'), 102: (101, 'chrome'), 103: (102, 'chrome'),
+        201: (1, 'chromedriver'), 202: (201, 'chrome'),
+        302: (1, 'chrome'),
+    }
+    assert not is_orphan(103, processes)
+    assert is_orphan(202, processes)
+    assert is_orphan(302, processes)
+    assert browser_watchdog.find_owner(202, processes) == (201, 1)
+
+
+def test_reaps_orphans_of_the_profile_and_stale_locks(tmp_path, chrome):
+    profile = tmp_path / 'chrome_data'
+    profile.mkdir()
+    # 起動したシェルがすぐ終わるので、Chrome（役）は孤児になる
+    subprocess.run(['sh', '-c', f'"{chrome}" -c "{SLEEP_CODE}" --user-data-dir={profile} >/dev/null 2>&1 &'],
+                   check=True)
+    # 監視プログラムから起動中の（孤児ではない）もの・別のプロファイルのものは残す
+    owned = subprocess.Popen([chrome, '-c', SLEEP_CODE, f'--user-data-dir={profile}'])
+    other = subprocess.Popen([chrome, '-c', SLEEP_CODE, f'--user-data-dir={tmp_path / "other"}'])
+    try:
+        assert wait_until(lambda: len(browser_watchdog.profile_pids(str(profile), read_processes())) == 2)
+        orphans = [pid for pid in browser_watchdog.profile_pids(str(profile), read_processes()) if pid != owned.pid]
+        if not is_orphan(orphans[0], read_processes()):
+            pytest.skip('孤児が init 以外のプロセスに引き取られる環境')
+
+        os.symlink(f'{socket.gethostname()}-{orphans[0]}', profile / 'SingletonLock')
+        (profile / 'SingletonCookie').write_text('')
+        assert reap_orphans(str(profile)) == 1
+        assert wait_until(lambda: not is_running(orphans[0]))
+        assert is_running(owned.pid) and is_running(other.pid)
+        assert not os.path.lexists(profile / 'SingletonLock') and not (profile / 'SingletonCookie').exists()
+
+        # 生きている Chrome のロックは消さない
+        os.symlink(f'{socket.gethostname()}-{owned.pid}', profile / 'SingletonLock')
+        assert reap_orphans(str(profile)) == 0
+        assert os.path.lexists(profile / 'SingletonLock')
+    finally:
+        for process in (owned, other):
+            process.kill()
+            process.wait()
+
+
+class FakeSession:
+    def __init__(self, pid, checks=0, fail=False):
+        self.pid = pid
+        self.checks = checks
+        self.fail = fail
+        self.restarts = 0
+        self.quits = 0
+
+    def driver_pid(self):
+        return self.pid
+
+    def restart(self):
+        self.restarts += 1
+        self.checks = 0
+        if self.fail:
+            raise RuntimeError('chrome not reachable')
+
+    def reset_page(self):
+        pass
+
+    def quit(self):
+        self.quits += 1
+        self.pid = None
+
+
+def test_watchdog_recycles_on_check_count_and_memory():
+    process = subprocess.Popen([sys.executable, '-c', SLEEP_CODE])
+    try:
+        sessions = {'main': FakeSession(process.pid, checks=5), 'idle': FakeSession(None)}
+        watchdog = BrowserWatchdog(max_checks=10, max_memory_mb=0)
+        usage = watchdog.supervise(sessions)
+        assert list(usage) == ['main'] and usage['main']['processes'] == 1
+        assert sessions['main'].restarts == 0
+
+        sessions['main'].checks = 10
+        watchdog.supervise(sessions)
+        assert sessions['main'].restarts == 1
+
+        watchdog.configure_from({'browser_max_checks': 0, 'browser_max_memory_mb': 1})
+        watchdog.supervise(sessions)
+        assert sessions['main'].restarts == 2 and watchdog.recycle_count == 2
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_watchdog_keeps_going_when_the_browser_fails_to_start():
+    process = subprocess.Popen([sys.executable, '-c', SLEEP_CODE])
+    try:
+        sessions = {'main': FakeSession(process.pid, checks=10, fail=True), 'next': FakeSession(process.pid, checks=10)}
+        watchdog = BrowserWatchdog(max_checks=10, max_memory_mb=0)
+        watchdog.supervise(sessions)
+        assert sessions['main'].quits == 1 and sessions['main'].driver_pid() is None
+        assert sessions['next'].restarts == 1
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,65 @@
+import datetime
+import os
+
+from benchmark_parser import SAVED_PAGE, run
+from calendar_extractor import build_date_statuses, build_plan_statuses, locate_cell
+from calendar_parser import parse_calendar, parse_page, parse_status
+from mock_reserve_site import MockReserveSite
+
+
+def load_saved_page():
+    with open(SAVED_PAGE, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_saved_page_grid():
+    grid = parse_calendar(load_saved_page())
+    assert len(grid['headers']) == 121
+    assert grid['headers'][:2] == ['', '2/1 日'] and grid['headers'][-1] == '5/31 日'
+    assert [row['label'] for row in grid['rows']] == [
+        'キャンプ日帰り', 'キャンプ宿泊', 'コテージ柏', '翠山荘', '毛無山荘', '金山キャビン', 'コロッケ']
+    assert all(len(row['cells']) == 120 for row in grid['rows'])
+    assert grid['rows'][5]['cells'][:3] == ['ー', '△ 残1', '×']
+
+    # 保存したページの内容（変わったらパーサーの変更で読み取り方が変わったということ）
+    statuses = parse_page(load_saved_page(), 2026, 2)
+    assert len(statuses) == 120
+    assert statuses['2026-02-01'] == '〇'
+    assert statuses['2026-02-07'] == '△'
+    assert statuses['2026-02-14'] == '×'
+    assert statuses['2026-02-22'] == '△ 残1'
+    assert statuses['2026-05-31'] == 'ー'
+    assert locate_cell(grid, datetime.date(2026, 3, 27)) == (2, 54)
+
+    # 1回の表示から全プランの行を読み取る（宿泊の行は parse_page と同じ）
+    plans = build_plan_statuses(grid, 2026, 2)
+    assert list(plans) == [row['label'] for row in grid['rows']]
+    assert plans['キャンプ宿泊'] == statuses
+    assert all(len(plan_statuses) == 120 for plan_statuses in plans.values())
+    assert locate_cell(grid, datetime.date(2026, 3, 27), 'キャンプ日帰り') == (1, 54)
+
+
+def test_matches_mock_site_and_rolls_over_the_year():
+    site = MockReserveSite(plans=('コテージ', 'キャンプ宿泊'), today=datetime.date(2026, 11, 10))
+    site.set_statuses({'2026-11-20': '〇', '2027-01-02': '△ 残2'})
+    grid = parse_calendar('<html><body><p>前置き</p>' + site.render_table(2026, 11) + '<table></table></body></html>')
+    statuses = build_date_statuses(grid, 2026, 11)
+    assert statuses['2026-11-20'] == '〇'
+    assert statuses['2027-01-02'] == '△ 残2'
+    assert statuses['2026-11-21'] == site.status('2026-11-21')
+    assert set(build_plan_statuses(grid, 2026, 11)) == {'コテージ', 'キャンプ宿泊'}
+
+
+def test_missing_table_and_status_types():
+    assert parse_calendar('<html><body>メンテナンス中</body></html>') is None
+    assert parse_status('〇') == ('〇', 999)
+    assert parse_status('△\n残3') == ('△', 3)
+    assert parse_status('△') == ('△', 1)
+    assert parse_status('ー') == ('×', 0)
+
+
+def test_parser_speed_is_guarded():
+    # 1ページ（約400KB）を読むのにかかる時間の上限。遅い環境でも通る程度に余裕を持たせてある
+    result = run(repeat=5)
+    assert result['popup_page.html']['parse_and_build']['p50'] < 0.5
+    assert os.path.getsize(SAVED_PAGE) == result['popup_page.html']['bytes']
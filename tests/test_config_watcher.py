@@ -0,0 +1,118 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+import config_watcher
+from config_watcher import ConfigWatcher, changed_sets, validate_config, write_config
+from poll_scheduler import PollScheduler, month_targets
+
+
+def make_config(start_date='2026-05-02', nights=2):
+    return {'check_interval': 600,
+            'notification_sets': [{'id': 1, 'name': 'GW', 'start_date': start_date, 'nights': nights}]}
+
+
+def test_get_reads_only_when_file_changes(tmp_path):
+    path = tmp_path / 'config.json'
+    write_config(make_config(), str(path))
+    watcher = ConfigWatcher(str(path))
+
+    first = watcher.get()
+    assert first['notification_sets'][0]['name'] == 'GW'
+    assert watcher.get() is first
+
+    write_config(make_config(nights=3), str(path))
+    second = watcher.get()
+    assert second is not first
+    assert second['notification_sets'][0]['nights'] == 3
+
+    # 壊れた設定を書かれても前回の設定を使い続ける
+    path.write_text('{"notification_sets": [', encoding='utf-8')
+    assert watcher.get() is second
+
+
+def test_validate_config_rejects_bad_sets():
+    validate_config(make_config())
+    with pytest.raises(ValueError):
+        validate_config(make_config(start_date='2026/05/02'))
+    with pytest.raises(ValueError):
+        validate_config(make_config(nights=0))
+    day_trip = make_config()
+    day_trip['notification_sets'][0]['plan'] = 'キャンプ日帰り'
+    validate_config(day_trip)
+    day_trip['notification_sets'][0]['plan'] = ' '
+    with pytest.raises(ValueError):
+        validate_config(day_trip)
+    with pytest.raises(ValueError):
+        validate_config({'notification_sets': {}})
+    with pytest.raises(ValueError):
+        validate_config({**make_config(), 'browser_max_memory_mb': -1})
+    for accounts in ('sub', ['sub'], [{'name': 'sub', 'notification_sets': {}}]):
+        with pytest.raises(ValueError):
+            validate_config({**make_config(), 'accounts': accounts})
+    validate_config({**make_config(), 'line_broadcast_audience': 35})
+    with pytest.raises(ValueError):
+        validate_config({**make_config(), 'line_broadcast_audience': 0})
+
+
+def test_validate_config_checks_range_sets():
+    range_set = {'id': 2, 'name': '週末', 'type': 'range', 'range_start': '2026-03-01', 'range_end': '2026-05-31',
+                 'nights': 2, 'weekdays': ['金', '土'], 'min_remaining': 2}
+    validate_config({'notification_sets': [range_set]})
+    for bad in ({'range_end': '2026-03-01'}, {'weekdays': ['Fri']}, {'min_remaining': 0}, {'auto_reserve': True}):
+        with pytest.raises(ValueError):
+            validate_config({'notification_sets': [{**range_set, **bad}]})
+
+
+@pytest.mark.parametrize('mode', ['inotify', 'poll'])
+def test_wait_wakes_up_on_atomic_write(tmp_path, monkeypatch, mode):
+    path = tmp_path / 'config.json'
+    write_config(make_config(), str(path))
+    watcher = ConfigWatcher(str(path), poll_interval=0.05)
+    watcher.get()
+    if mode == 'poll':
+        # inotify が使えない環境と同じく、更新時刻の定期確認に切り替わる
+        def unavailable(*args):
+            raise OSError("inotify を使えません")
+        monkeypatch.setattr(config_watcher, 'Inotify', unavailable)
+    watcher.start()
+    try:
+        assert watcher.mode in (mode, 'poll')
+        assert not watcher.wait(0.1)
+
+        timer = threading.Timer(0.1, write_config, args=(make_config(nights=3), str(path)))
+        timer.start()
+        started = time.monotonic()
+        assert watcher.wait(5)
+        assert time.monotonic() - started < 3
+        assert watcher.get()['notification_sets'][0]['nights'] == 3
+        timer.join()
+    finally:
+        watcher.stop()
+
+
+def test_changed_sets_expedites_only_edited_months():
+    old_sets = [
+        {'id': 1, 'name': 'GW', 'start_date': '2026-05-02', 'nights': 2},
+        {'id': 2, 'name': '夏', 'start_date': '2026-08-10', 'nights': 1},
+    ]
+    new_sets = [
+        dict(old_sets[0]),
+        {'id': 2, 'name': '夏', 'start_date': '2026-08-10', 'nights': 2},
+        {'id': 3, 'name': '秋', 'start_date': '2026-10-10', 'nights': 1},
+    ]
+    edited = changed_sets(old_sets, new_sets)
+    assert [n_set['id'] for n_set in edited] == [2, 3]
+
+    today = datetime.date(2026, 4, 1)
+    scheduler = PollScheduler()
+    scheduler.set_targets(new_sets, today=today)
+    now = 1000.0
+    for state in scheduler.months.values():
+        state.next_due = now + 600
+    scheduler.expedite(month_targets(edited, today=today), now=now)
+    assert {month: state.next_due for month, state in scheduler.months.items()} == {
+        (2026, 5): now + 600, (2026, 8): now, (2026, 10): now,
+    }
@@ -0,0 +1,62 @@
+import datetime
+
+from history_store import HistoryStore
+
+
+def make_store():
+    store = HistoryStore(':memory:')
+    store.write_events([
+        {'date': '2026-03-27', 'from': None, 'to': '×'},
+        {'date': '2026-03-28', 'from': None, 'to': '×'},
+    ], observed_at=datetime.datetime(2026, 3, 1, 9, 0))
+    store.write_events([
+        {'date': '2026-03-27', 'from': '×', 'to': '△ 残2'},
+    ], observed_at=datetime.datetime(2026, 3, 2, 10, 0))
+    store.write_events([
+        {'date': '2026-03-27', 'from': '△ 残2', 'to': '×'},
+        {'date': '2026-03-28', 'from': '×', 'to': '〇', 'plan': 'キャンプ日帰り'},
+    ], observed_at=datetime.datetime(2026, 3, 3, 11, 0))
+    return store
+
+
+def test_range_queries_by_target_date_and_observation_time():
+    store = make_store()
+
+    by_target = store.query(target_from='2026-03-27', target_to='2026-03-27')
+    assert [row['status'] for row in by_target] == ['×', '△ 残2', '×']
+
+    by_time = store.query(observed_from='2026-03-02T00:00:00', observed_to='2026-03-03T00:00:00')
+    assert by_time == [{'observed_at': '2026-03-02T10:00:00', 'target_date': '2026-03-27', 'plan': 'キャンプ宿泊',
+                        'status': '△ 残2', 'prev_status': '×'}]
+
+    assert len(store.query(plan='キャンプ日帰り')) == 1
+
+
+def test_state_at_point_in_time():
+    store = make_store()
+    assert store.state_at('2026-03-02T12:00:00') == {'2026-03-27': '△ 残2', '2026-03-28': '×'}
+    assert store.state_at() == {'2026-03-27': '×', '2026-03-28': '×'}
+    assert store.state_at(plan='キャンプ日帰り') == {'2026-03-28': '〇'}
+    assert store.plan_states_at('2026-03-02T12:00:00') == {'キャンプ宿泊': {'2026-03-27': '△ 残2', '2026-03-28': '×'}}
+    assert store.plan_states_at() == {'キャンプ宿泊': {'2026-03-27': '×', '2026-03-28': '×'},
+                                      'キャンプ日帰り': {'2026-03-28': '〇'}}
+    assert store.plan_states_at(target_from='2026-03-28') == {'キャンプ宿泊': {'2026-03-28': '×'},
+                                                            'キャンプ日帰り': {'2026-03-28': '〇'}}
+
+
+def test_import_csv_keeps_only_transitions_and_skips_mismatched_rows(tmp_path):
+    csv_path = tmp_path / '2026-03-01.csv'
+    csv_path.write_text(
+        'Timestamp,2026-03-27,2026-03-28\n'
+        '09:00:00,×,×\n'
+        '09:10:00,×,×\n'
+        '09:20:00,△ 残1,×\n'
+        '09:30:00,×,×,〇\n',
+        encoding='utf-8')
+    store = HistoryStore(':memory:')
+
+    imported, skipped = store.import_csv([str(csv_path)])
+
+    assert (imported, skipped) == (3, 1)
+    assert len(store.query()) == 3
+    assert store.state_at() == {'2026-03-27': '△ 残1', '2026-03-28': '×'}
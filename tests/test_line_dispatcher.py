@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from line_dispatcher import LineDispatcher
+
+
+class FakeLine:
+    """
+    LINE Messaging API の代わりに、決めておいたステータスを順に返す
+    """
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.requests = []
+        self.insight = {'status': 'ready', 'followers': 120, 'targetedReaches': 100, 'blocks': 20}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append({'path': self.path, 'body': body,
+                                      'retry_key': self.headers.get('X-Line-Retry-Key'),
+                                      'auth': self.headers.get('Authorization')})
+                status = fake.statuses.pop(0) if fake.statuses else 200
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def do_GET(self):
+                fake.requests.append({'path': self.path, 'auth': self.headers.get('Authorization')})
+                body = json.dumps(fake.insight).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def fake_line():
+    fake = FakeLine()
+    yield fake
+    fake.close()
+
+
+def make_dispatcher(url, outbox):
+    return LineDispatcher('token', api_base=url, outbox_dir=str(outbox), base_delay=0.01, max_delay=0.05)
+
+
+def test_retries_with_same_retry_key_until_accepted(fake_line, tmp_path):
+    fake_line.statuses = [500, 429, 200]
+    dispatcher = make_dispatcher(fake_line.url, tmp_path)
+    dispatcher.broadcast('空きが出ました')
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert len(fake_line.requests) == 3
+    assert {r['path'] for r in fake_line.requests} == {'/v2/bot/message/broadcast'}
+    assert len({r['retry_key'] for r in fake_line.requests}) == 1
+    assert fake_line.requests[0]['auth'] == 'Bearer token'
+    assert fake_line.requests[0]['body'] == {'messages': [{'type': 'text', 'text': '空きが出ました'}]}
+    assert not any(name.endswith('.json') for name in os.listdir(tmp_path))
+
+
+def test_client_errors_are_not_retried(fake_line, tmp_path):
+    fake_line.statuses = [400]
+    dispatcher = make_dispatcher(fake_line.url, tmp_path)
+    dispatcher.push('U123', 'テスト')
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+
+    assert len(fake_line.requests) == 1
+    assert fake_line.requests[0]['body']['to'] == 'U123'
+    assert len(os.listdir(tmp_path / 'failed')) == 1
+
+
+def test_outbox_survives_restart(fake_line, tmp_path):
+    # 送信先に届かないまま終了する
+    offline = make_dispatcher('http://127.0.0.1:9', tmp_path)
+    offline.broadcast('1通目')
+    offline.broadcast('2通目')
+    offline.stop(timeout=0.1)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.json')]) == 2
+
+    dispatcher = make_dispatcher(fake_line.url, tmp_path)
+    dispatcher.start()
+    assert dispatcher.flush(timeout=5)
+    dispatcher.stop()
+    assert [r['body']['messages'][0]['text'] for r in fake_line.requests] == ['1通目', '2通目']
+
+
+def test_multicast_is_batched_by_recipients_and_messages(fake_line, tmp_path):
+    dispatcher = make_dispatcher(fake_line.url, tmp_path)
+    recipients = [f'U{i:04d}' for i in range(1200)]
+    dispatcher.multicast(recipients, [f'メッセージ{i}' for i in range(6)])
+    assert dispatcher.flush(timeout=10)
+    dispatcher.stop()
+
+    assert len(fake_line.requests) == 6
+    assert {r['path'] for r in fake_line.requests} == {'/v2/bot/message/multicast'}
+    assert sorted(len(r['body']['to']) for r in fake_line.requests) == [200, 200, 500, 500, 500, 500]
+    assert sorted(len(r['body']['messages']) for r in fake_line.requests) == [1, 1, 1, 5, 5, 5]
+
+
+def test_follower_count_reads_targeted_reaches(fake_line, tmp_path):
+    dispatcher = make_dispatcher(fake_line.url, tmp_path / 'outbox')
+    assert dispatcher.follower_count(datetime.date(2026, 3, 9)) == 100
+    assert fake_line.requests[-1]['path'] == '/v2/bot/insight/followers?date=20260309'
+    assert fake_line.requests[-1]['auth'] == 'Bearer token'
+
+    # まだ集計されていない日は分からない
+    fake_line.insight = {'status': 'unready'}
+    assert dispatcher.follower_count() is None
@@ -0,0 +1,55 @@
+import json
+
+from metrics import Metrics, render_prometheus
+
+
+def make_metrics(tmp_path):
+    return Metrics(metrics_file=str(tmp_path / 'metrics.json'), cycles_file=str(tmp_path / 'cycles.jsonl'))
+
+
+def test_cycle_record_sums_phases_and_skips_background_work(tmp_path):
+    metrics = make_metrics(tmp_path)
+    metrics.begin_cycle()
+    metrics.observe('month_navigation', 0.2)
+    metrics.observe('month_navigation', 0.3)
+    metrics.observe('extract', 0.05)
+    with metrics.span('notify'):
+        pass
+    metrics.observe('line_request', 1.5, in_cycle=False)
+    record = metrics.end_cycle(months=2, error=None)
+
+    assert record['phases']['month_navigation'] == 0.5
+    assert record['phases']['extract'] == 0.05
+    assert 'notify' in record['phases']
+    assert 'line_request' not in record['phases']
+    assert record['months'] == 2
+
+    lines = (tmp_path / 'cycles.jsonl').read_text(encoding='utf-8').splitlines()
+    assert json.loads(lines[0]) == record
+    # サイクルの外で計った時間はヒストグラムにだけ入る
+    metrics.observe('login', 2.0)
+    assert metrics.end_cycle() is None
+    assert metrics.snapshot()['counters'] == {'cycles': 1}
+
+
+def test_prometheus_text_has_cumulative_buckets(tmp_path):
+    metrics = make_metrics(tmp_path)
+    for seconds in (0.02, 0.2, 0.2, 3.0, 500.0):
+        metrics.observe('extract', seconds)
+    metrics.inc('status_changes', 4)
+    metrics.set_gauge_series('browser_rss_bytes', [({'browser': 'default'}, 300 * 1024 * 1024)])
+    metrics.save()
+
+    text = render_prometheus(json.loads((tmp_path / 'metrics.json').read_text(encoding='utf-8')))
+    lines = text.splitlines()
+    assert '# TYPE fumotoppara_phase_seconds histogram' in lines
+    assert 'fumotoppara_phase_seconds_bucket{phase="extract",le="0.025"} 1' in lines
+    assert 'fumotoppara_phase_seconds_bucket{phase="extract",le="0.25"} 3' in lines
+    assert 'fumotoppara_phase_seconds_bucket{phase="extract",le="120"} 4' in lines
+    assert 'fumotoppara_phase_seconds_bucket{phase="extract",le="+Inf"} 5' in lines
+    assert 'fumotoppara_phase_seconds_count{phase="extract"} 5' in lines
+    assert 'fumotoppara_phase_recent_seconds{phase="extract",quantile="0.5"} 0.2' in lines
+    assert 'fumotoppara_status_changes_total 4' in lines
+    assert 'fumotoppara_browser_rss_bytes{browser="default"} 314572800' in lines
+    assert any(line.startswith('fumotoppara_metrics_updated_timestamp_seconds ') for line in lines)
+    assert render_prometheus({}) == '\n'
@@ -0,0 +1,115 @@
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from benchmark_monitor import percentile, summarize
+from mock_reserve_site import MockReserveSite
+
+TODAY = datetime.date(2026, 3, 10)
+
+
+@pytest.fixture
+def site():
+    with MockReserveSite(email='me@example.com', password='pw', today=TODAY) as mock:
+        yield mock
+
+
+def login(site):
+    session = requests.Session()
+    response = session.post(f'{site.url}/login', data={'email': 'me@example.com', 'password': 'pw'})
+    assert response.url.endswith('/reserved/reserved-date-selection')
+    return session
+
+
+def test_calendar_requires_login_and_redirects_after_it(site):
+    response = requests.get(f'{site.url}/reserved/reserved-date-selection')
+    assert response.url == f'{site.url}/'
+    assert 'type="password"' in response.text
+
+    bad = requests.post(f'{site.url}/login', data={'email': 'me@example.com', 'password': 'wrong'})
+    assert 'パスワードが違います' in bad.text
+
+    session = login(site)
+    page = session.get(f'{site.url}/reserved/reserved-date-selection').text
+    assert '>4月</span>' in page and '>2月</span>' in page
+    assert '<th class="cell-date"><p> 3/10 </p> <p> 火 </p></th>' in page
+
+    site.expire_sessions()
+    assert session.get(f'{site.url}/reserved/reserved-date-selection').url == f'{site.url}/'
+    assert session.get(f'{site.url}/mock/api/calendar?year=2026&month=4').status_code == 401
+
+
+def test_scripted_statuses_latency_and_failures(site):
+    session = login(site)
+    site.set_statuses({'2026-04-03': '〇', '2026-04-04': '△ 残1'})
+    site.set_latency(calendar=0.2)
+
+    started = time.perf_counter()
+    table = session.get(f'{site.url}/mock/api/calendar?year=2026&month=4').text
+    assert time.perf_counter() - started >= 0.2
+    assert table.count('<tr>') == 3
+    assert 'data-date="2026-04-03" data-plan="キャンプ宿泊" data-nights="2"' in table
+    assert '<p> △ 残1 </p>' in table
+    assert ('キャンプ宿泊', '2026-04-03') in site.opened_at
+
+    site.set_latency(calendar=0.0)
+    site.fail_next('calendar', 2, status=503)
+    assert [session.get(f'{site.url}/mock/api/calendar?year=2026&month=4').status_code for _ in range(3)] == [503, 503, 200]
+    assert site.state()['requests']['calendar'] == 4
+
+    # 操作用のHTTP API（監視プログラムを別プロセスで動かすとき用）
+    state = requests.post(f'{site.url}/mock/control', json={'statuses': {'2026-04-05': '〇'}}).json()
+    assert state['sessions'] == 1
+    assert site.status('2026-04-05') == '〇'
+    assert site.status('2026-03-01') == 'ー'
+
+
+def test_reserve_records_confirm_time_and_rejects_sold_out(site):
+    session = login(site)
+    site.set_statuses({'2026-04-03': '〇', '2026-04-04': '〇'})
+    opened_at = site.opened_at[('キャンプ宿泊', '2026-04-03')]
+
+    detail = session.get(f'{site.url}/reserved/reserved-edit?date=2026-04-03&plan=キャンプ宿泊&nights=2').text
+    assert '大人（中学生以上）' in detail and '11:00 ～ 13:59' in detail
+
+    body = {'date': '2026-04-03', 'plan': 'キャンプ宿泊', 'nights': '2', 'arrival': '11:00 ～ 13:59', 'adults': '2'}
+    response = session.post(f'{site.url}/mock/api/reserve', json=body)
+    assert response.json() == {'id': 1}
+    reservation = site.reservations[0]
+    assert reservation['party'] == {'adults': 2, 'children': 0, 'preschoolers': 0}
+    assert reservation['confirmed_at'] >= opened_at
+    assert site.status('2026-04-04') == '×'
+
+    response = session.post(f'{site.url}/mock/api/reserve', json=body)
+    assert response.status_code == 409
+    assert '予約が完了しました' in session.get(f'{site.url}/reserved/reserved-complete?id=1').text
+
+
+def test_line_endpoints_are_recorded(site):
+    requests.post(f'{site.url}/v2/bot/message/broadcast', json={'messages': [{'type': 'text', 'text': '空き'}]})
+    assert site.notifications[0]['endpoint'] == 'broadcast'
+    assert site.notifications[0]['body']['messages'][0]['text'] == '空き'
+
+
+def test_percentiles():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert summarize([])['count'] == 0
+    assert summarize([2.0, 1.0])['max'] == 2.0
+
+
+@pytest.mark.skipif(not (shutil.which('chromedriver') and (shutil.which('google-chrome') or shutil.which('chromium'))),
+                    reason='Chrome と chromedriver が必要です')
+def test_benchmark_runs_against_mock_site(tmp_path):
+    output = tmp_path / 'benchmark.json'
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_monitor.py')
+    subprocess.run([sys.executable, script, '--cycles', '4', '--sets', '3', '--output', str(output)],
+                   check=True, timeout=600)
+    assert output.exists()
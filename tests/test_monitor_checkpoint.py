@@ -0,0 +1,80 @@
+import json
+
+from monitor_checkpoint import (build_checkpoint, load_checkpoint, pack_statuses, restore_tenant, save_checkpoint,
+                                unpack_statuses)
+from notification_router import NotificationRouter, QuotaTracker
+from poll_scheduler import PollScheduler
+from tenants import Tenant
+
+SETS = [
+    {'id': 1, 'name': 'GW', 'start_date': '2027-05-02', 'nights': 2},
+    {'id': 1700000000000, 'name': '週末', 'type': 'range', 'range_start': '2027-05-01', 'range_end': '2027-05-31',
+     'nights': 2, 'plan': 'キャンプ日帰り'},
+    {'id': 3, 'name': '夏休み', 'start_date': '2027-08-10', 'nights': 1},
+]
+
+
+def make_tenant(tmp_path):
+    tenant = Tenant('default', 'me@example.com', 'pw', str(tmp_path / 'chrome_data'))
+    tenant.notification_sets = [dict(n_set) for n_set in SETS]
+    return tenant
+
+
+def test_statuses_are_packed_per_plan_and_restored_exactly():
+    statuses = {
+        'キャンプ宿泊': {'2026-04-30': '×', '2026-05-01': '△ 残2', '2026-05-04': '〇'},
+        'キャンプ日帰り': {'2026-12-31': '〇', '2027-01-01': '×'},
+        'コテージ柏': {},
+    }
+    packed = pack_statuses(statuses)
+    assert packed['キャンプ宿泊'] == ['2026-04-30', ['×', '△ 残2', None, None, '〇']]
+    assert unpack_statuses(json.loads(json.dumps(packed))) == {k: v for k, v in statuses.items() if v}
+
+
+def test_checkpoint_round_trip_restores_notified_sets_and_schedule(tmp_path):
+    tenant = make_tenant(tmp_path)
+    tenant.previous_ok_sets = {1, 1700000000000, 3}
+    tenant.previous_windows = {1700000000000: {'2027-05-02', '2027-05-09'}}
+    tenant.get_session().logged_in_at = 1234.5
+    scheduler = PollScheduler()
+    scheduler.set_targets(SETS)
+    scheduler.record((2027, 5), changed=False, now=1000.0)
+    path = str(tmp_path / 'logs' / 'checkpoint.json')
+
+    router = NotificationRouter(None, QuotaTracker(str(tmp_path / 'quota.json')))
+    router.pending[None] = ['GW の空き']
+    checkpoint = build_checkpoint({'default': tenant}, {'キャンプ宿泊': {'2027-05-02': '〇'}}, scheduler, router)
+    assert save_checkpoint(checkpoint, path)
+    checkpoint = load_checkpoint(path)
+    assert unpack_statuses(checkpoint['statuses']) == {'キャンプ宿泊': {'2027-05-02': '〇'}}
+    assert checkpoint['notifications']['pending'] == [[None, ['GW の空き']]]
+
+    # 停止中に「夏休み」の日付が変わった
+    restarted = make_tenant(tmp_path)
+    restarted.notification_sets[2]['start_date'] = '2027-08-11'
+    restore_tenant(restarted, checkpoint['tenants']['default'])
+    assert restarted.previous_ok_sets == {1, 1700000000000}
+    assert restarted.previous_windows == {1700000000000: {'2027-05-02', '2027-05-09'}}
+    assert restarted.session.logged_in_at == 1234.5 and restarted.session.driver is None
+
+    # 古い状態からは通知済みのセットを引き継がない
+    stale = make_tenant(tmp_path)
+    restore_tenant(stale, checkpoint['tenants']['default'], notified=False)
+    assert stale.previous_ok_sets == set() and stale.session.logged_in_at == 1234.5
+
+    resumed = PollScheduler()
+    resumed.restore_state(checkpoint['scheduler'])
+    resumed.set_targets(SETS)
+    assert resumed.months[(2027, 5)].unchanged_streak == 1
+    assert resumed.months[(2027, 5)].next_due == round(scheduler.months[(2027, 5)].next_due, 3)
+    assert resumed.months[(2027, 8)].next_due == 0.0
+
+
+def test_missing_broken_or_old_checkpoints_are_ignored(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    assert load_checkpoint(str(path)) is None
+    path.write_text('{"version": 1, "statuses"', encoding='utf-8')
+    assert load_checkpoint(str(path)) is None
+    path.write_text('{"version": 0}', encoding='utf-8')
+    assert load_checkpoint(str(path)) is None
+    assert not (tmp_path / 'checkpoint.json.tmp').exists()
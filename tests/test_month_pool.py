@@ -0,0 +1,28 @@
+from month_pool import MonthFetchPool, split_months
+
+
+def test_split_months_keeps_consecutive_chunks():
+    months = [(2027, m) for m in range(1, 8)]
+    assert split_months(months, 3) == [months[:3], months[3:5], months[5:]]
+    assert split_months(months[:1], 4) == [months[:1]]
+
+
+def test_failed_chunks_are_returned_to_the_caller(tmp_path):
+    pool = MonthFetchPool(2, base_profile_dir=str(tmp_path / 'chrome_data'), profiles_dir=str(tmp_path / 'workers'))
+    months = [(2027, 5), (2027, 6), (2027, 7), (2027, 8)]
+    seen = []
+
+    def fetch(session, chunk):
+        if (2027, 7) in chunk:
+            raise RuntimeError('timeout')
+        # 表示できなかった月は読み取れた月に含めない
+        read = [month for month in chunk if month != (2027, 6)]
+        return {'キャンプ宿泊': {f'{year}-{month:02d}-01': '〇' for year, month in read}}, read
+
+    try:
+        statuses, failed = pool.fetch(months, fetch, on_result=lambda result: seen.append(dict(result)))
+    finally:
+        pool.close()
+    assert statuses == {'キャンプ宿泊': {'2027-05-01': '〇'}}
+    assert failed == [(2027, 6), (2027, 7), (2027, 8)]
+    assert len(seen) == 1
@@ -0,0 +1,107 @@
+import datetime
+import json
+
+from notification_router import NotificationRouter, QuotaTracker
+
+
+class RecordingDispatcher:
+    quota_exhausted_month = None
+
+    def __init__(self, followers=None):
+        self.sent = []
+        self.followers = followers
+        self.follower_requests = 0
+
+    def follower_count(self):
+        self.follower_requests += 1
+        return self.followers
+
+    def broadcast(self, texts):
+        self.sent.append(('broadcast', None, texts))
+
+    def multicast(self, to, texts):
+        self.sent.append(('multicast', sorted(to), texts))
+
+
+NOW = datetime.datetime(2026, 3, 10, 12, 0).timestamp()
+
+
+def make_router(tmp_path, **config):
+    router = NotificationRouter(RecordingDispatcher(), QuotaTracker(str(tmp_path / 'quota.json')))
+    router.configure(**config)
+    return router
+
+
+def test_messages_are_grouped_per_recipient(tmp_path):
+    router = make_router(tmp_path)
+    router.send([
+        (['U1', 'U2'], 'セットA'),
+        (['U2'], 'セットB'),
+        (['U3'], 'セットA'),
+        (None, 'セットC'),
+    ], footer='\n\n予約はこちら', now=NOW)
+
+    assert router.dispatcher.sent == [
+        ('multicast', ['U1', 'U3'], 'セットA\n\n予約はこちら'),
+        ('multicast', ['U2'], 'セットA\n\nセットB\n\n予約はこちら'),
+        ('broadcast', None, 'セットC\n\n予約はこちら'),
+    ]
+    # 1通 × 送信先の人数で数える
+    assert router.quota.used_this_month(NOW) == 4
+
+
+def test_near_limit_collapses_into_digest(tmp_path):
+    router = make_router(tmp_path, monthly_quota=10, digest_threshold=0.2, digest_interval=600)
+    router.quota.record(8, now=NOW)
+
+    router.send([(['U1'], 'セットA')], now=NOW)
+    router.send([(['U1'], 'セットB')], now=NOW + 60)
+    # 自動予約の結果などの急ぎの通知はためない
+    router.send([(['U1'], '自動予約完了')], urgent=True, now=NOW + 60)
+    assert [texts for _, _, texts in router.dispatcher.sent] == ['自動予約完了']
+
+    assert router.flush_digest(now=NOW + 120)
+    assert router.dispatcher.sent[-1] == ('multicast', ['U1'], '【まとめ通知】2件の空き情報があります\n\nセットA\n\nセットB')
+    assert not router.flush_digest(now=NOW + 180)
+
+
+def test_quota_resets_each_month_and_survives_restart(tmp_path):
+    path = str(tmp_path / 'quota.json')
+    QuotaTracker(path).record(5, now=NOW)
+    assert QuotaTracker(path).used_this_month(NOW + 60) == 5
+    next_month = datetime.datetime(2026, 4, 1, 0, 0).timestamp()
+    assert QuotaTracker(path).used_this_month(next_month) == 0
+
+
+def test_broadcast_is_counted_per_follower(tmp_path):
+    router = NotificationRouter(RecordingDispatcher(followers=40), QuotaTracker(str(tmp_path / 'quota.json')))
+    # 送るときには LINE に問い合わせない（取得済みの人数がなければ1人分）
+    router.send([(None, 'セットA')], now=NOW)
+    assert router.dispatcher.follower_requests == 0
+    assert router.quota.used_this_month(NOW) == 1
+
+    router.refresh_audience(now=NOW)
+    router.refresh_audience(now=NOW + 60)
+    router.send([(None, 'セットB')], now=NOW + 60)
+    assert router.quota.used_this_month(NOW + 60) == 41
+    # 友だちの人数は1日に1回だけ取り直す
+    assert router.dispatcher.follower_requests == 1
+
+    # 設定した人数が優先される
+    router.configure(broadcast_audience=150)
+    router.send([(None, 'セットC')], now=NOW + 120)
+    assert router.quota.used_this_month(NOW + 120) == 191
+    assert router.near_limit(NOW + 120)
+
+
+def test_pending_digest_survives_restart(tmp_path):
+    router = make_router(tmp_path, monthly_quota=10, digest_threshold=0.2)
+    router.quota.record(9, now=NOW)
+    router.send([(['U1'], 'セットA'), (None, 'セットB')], now=NOW)
+    state = json.loads(json.dumps(router.export_state()))
+
+    restarted = make_router(tmp_path, monthly_quota=10, digest_threshold=0.2)
+    restarted.restore_state(state)
+    assert restarted.pending == {'U1': ['セットA'], None: ['セットB']}
+    assert restarted.flush_digest(now=NOW + 3600)
+    assert [kind for kind, _, _ in restarted.dispatcher.sent] == ['multicast', 'broadcast']
@@ -0,0 +1,61 @@
+import datetime
+
+from poll_scheduler import PollScheduler, month_targets
+
+TODAY = datetime.date(2026, 3, 1)
+
+
+def make_scheduler(sets, **kwargs):
+    scheduler = PollScheduler(base_interval=600, min_interval=60, max_interval=3600, jitter=0, **kwargs)
+    scheduler.set_targets(sets, today=TODAY)
+    return scheduler
+
+
+def test_month_targets_tracks_nearest_date_and_auto_reserve():
+    sets = [
+        {'id': 1, 'start_date': '2026-03-30', 'nights': 3},
+        {'id': 2, 'start_date': '2026-03-05', 'nights': 1, 'auto_reserve': True},
+    ]
+    targets = month_targets(sets, today=TODAY)
+    assert targets[(2026, 3)] == {'nearest_days': 4, 'auto_reserve': True}
+    assert targets[(2026, 4)] == {'nearest_days': 31, 'auto_reserve': False}
+
+    # 期間のセットは期間に含まれる月をすべてチェックする（過ぎた日付は除く）
+    targets = month_targets([{'id': 3, 'type': 'range', 'range_start': '2026-02-20', 'range_end': '2026-04-02',
+                              'nights': 2}], today=TODAY)
+    assert targets == {(2026, 3): {'nearest_days': 0, 'auto_reserve': False},
+                       (2026, 4): {'nearest_days': 31, 'auto_reserve': False}}
+
+
+def test_near_and_auto_reserve_months_are_polled_faster():
+    scheduler = make_scheduler([
+        {'id': 1, 'start_date': '2026-03-05', 'nights': 1, 'auto_reserve': True},
+        {'id': 2, 'start_date': '2026-06-10', 'nights': 1},
+    ])
+    assert scheduler.interval_for((2026, 3)) == 75
+    assert scheduler.interval_for((2026, 6)) == 600
+
+
+def test_unchanged_months_back_off_and_changes_reset():
+    scheduler = make_scheduler([{'id': 1, 'start_date': '2026-06-10', 'nights': 1}])
+    month = (2026, 6)
+    for i in range(12):
+        scheduler.record(month, changed=False, now=1000 + i)
+    assert scheduler.interval_for(month) == 2400
+
+    scheduler.record(month, changed=True, now=2000)
+    assert scheduler.interval_for(month) == 600
+    assert scheduler.months[month].next_due == 2600
+
+
+def test_budget_limits_checks_per_hour():
+    scheduler = make_scheduler([
+        {'id': 1, 'start_date': '2026-04-10', 'nights': 1},
+        {'id': 2, 'start_date': '2026-05-10', 'nights': 1},
+        {'id': 3, 'start_date': '2026-06-10', 'nights': 1},
+    ], max_checks_per_hour=2)
+
+    assert scheduler.due_months(now=1000) == [(2026, 4), (2026, 5)]
+    assert scheduler.due_months(now=1001) == []
+    assert scheduler.seconds_until_next(now=1001) == 3599
+    assert scheduler.due_months(now=4600) == [(2026, 4), (2026, 6)]
@@ -0,0 +1,197 @@
+import itertools
+
+import pytest
+
+import reservation_lane
+from reservation_lane import ReservationLane, ReservationTimer
+
+N_SET = {'id': 1, 'name': 'GW', 'start_date': '2027-05-02', 'nights': 1, 'auto_reserve': True}
+
+GRID = {
+    'headers': ['', '5/1 土', '5/2 日'],
+    'rows': [
+        {'label': 'キャンプ日帰り', 'row_index': 1, 'cells': ['〇', '〇']},
+        {'label': 'キャンプ宿泊', 'row_index': 2, 'cells': ['×', '〇']},
+    ],
+}
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        assert handle in self.driver.window_handles
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind):
+        handle = f'tab{next(self.driver.tab_ids)}'
+        self.driver.window_handles.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """
+    タブの切り替えと読み込んだURLだけを記録する WebDriver の代わり
+    """
+
+    def __init__(self, tab_ids):
+        self.window_handles = ['main']
+        self.current_window_handle = 'main'
+        self.switch_to = FakeSwitchTo(self)
+        self.tab_ids = tab_ids
+        self.loaded = []
+        self.screenshots = []
+
+    def get(self, url):
+        self.loaded.append(self.current_window_handle)
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def save_screenshot(self, path):
+        self.screenshots.append(path)
+
+
+class FakeSession:
+    max_page_age = 1800
+
+    def __init__(self):
+        self.started = itertools.count(1)
+        self.tab_ids = itertools.count(1)
+        self.driver = None
+        self.started_at = None
+        self.start()
+
+    def start(self):
+        self.driver = FakeDriver(self.tab_ids)
+        self.started_at = next(self.started)
+        return self.driver
+
+    def get_driver(self):
+        return self.driver
+
+    def configure_tab(self, driver):
+        pass
+
+
+@pytest.fixture
+def page(monkeypatch, tmp_path):
+    """
+    カレンダーの操作を記録だけするものに差し替え、どのタブで何をしたかを返す
+    """
+    calls = []
+    results = {'calendar_redrawn': True}
+
+    def wait_for(driver, condition, *args, **kwargs):
+        calls.append((driver.current_window_handle, condition))
+        return results.get(condition, True)
+
+    monkeypatch.setattr(reservation_lane, 'BASE_DIR', str(tmp_path))
+    monkeypatch.setattr(reservation_lane, 'wait_for', wait_for)
+    monkeypatch.setattr(reservation_lane, 'extract_calendar', lambda driver: GRID)
+    monkeypatch.setattr(reservation_lane, 'click_month_button',
+                        lambda driver, month: calls.append((driver.current_window_handle, f'{month}月')) or True)
+    monkeypatch.setattr(reservation_lane, 'watch_calendar_redraw',
+                        lambda driver: calls.append((driver.current_window_handle, 'watch')))
+    monkeypatch.setattr(reservation_lane, 'click_cell',
+                        lambda driver, *cell: calls.append((driver.current_window_handle, ('cell',) + cell)))
+    monkeypatch.setattr(reservation_lane, 'complete_reservation',
+                        lambda driver, nights, party, timer: calls.append((driver.current_window_handle, 'complete')) or True)
+    return calls, results
+
+
+def test_prepare_parks_a_tab_and_reuses_it(page):
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+    assert not lane.is_ready()
+
+    lane.prepare()
+    driver = session.driver
+    assert lane.handle == 'tab1' and lane.cell == (2, 1)
+    assert lane.is_ready()
+    assert driver.current_window_handle == 'main'
+    assert driver.loaded == ['tab1']
+
+    # 準備し直しても同じタブを使う
+    lane.prepare()
+    assert driver.window_handles == ['main', 'tab1'] and driver.loaded == ['tab1', 'tab1']
+
+    lane.invalidate()
+    assert not lane.is_ready()
+
+    lane.prepare()
+    lane.prepared_at -= session.max_page_age + 1
+    assert not lane.is_ready()
+
+
+def test_tab_is_recreated_after_browser_restart(page):
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+    lane.prepare()
+
+    # 再起動した新しいブラウザに同じハンドルがあっても、前のブラウザのタブとしては使わない
+    session.start()
+    session.driver.window_handles.append('tab1')
+    assert not lane.is_ready()
+
+    lane.prepare()
+    assert lane.handle == 'tab2' and lane.is_ready()
+    assert session.driver.window_handles == ['main', 'tab1', 'tab2']
+    assert session.driver.current_window_handle == 'main'
+
+
+def test_fire_clicks_the_prepared_cell_after_redraw_and_returns_to_main(page):
+    calls, _ = page
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+    lane.prepare()
+    calls.clear()
+
+    assert lane.fire(ReservationTimer())
+    assert calls == [('tab1', 'watch'), ('tab1', '5月'), ('tab1', 'calendar_redrawn'),
+                     ('tab1', ('cell', 2, 1)), ('tab1', 'complete')]
+    assert session.driver.current_window_handle == 'main'
+    # 予約の後はページが変わっているので準備し直す
+    assert not lane.is_ready()
+
+
+def test_fire_reloads_when_the_calendar_is_not_redrawn(page):
+    calls, results = page
+    results['calendar_redrawn'] = False
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+    lane.prepare()
+    session.driver.loaded.clear()
+
+    timer = ReservationTimer()
+    assert lane.fire(timer)
+    assert session.driver.loaded == ['tab1']
+    assert ('tab1', ('cell', 2, 1)) in calls
+    assert [name for name, _ in timer.phases][0] == 'カレンダー更新'
+
+
+def test_fire_prepares_first_and_returns_to_main_on_failure(page, monkeypatch):
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+
+    def fail(driver, nights, party, timer):
+        raise Exception('確定ボタンが見つかりません')
+
+    monkeypatch.setattr(reservation_lane, 'complete_reservation', fail)
+    timer = ReservationTimer()
+    with pytest.raises(Exception, match='確定ボタン'):
+        lane.fire(timer)
+    assert [name for name, _ in timer.phases][:2] == ['タブ準備', 'カレンダー更新']
+    assert session.driver.current_window_handle == 'main'
+    assert len(session.driver.screenshots) == 1
+    assert not lane.is_ready()
+
+
+def test_close_closes_only_the_lane_tab(page):
+    session = FakeSession()
+    lane = ReservationLane(session, N_SET)
+    lane.prepare()
+    lane.close()
+    assert session.driver.window_handles == ['main']
+    assert session.driver.current_window_handle == 'main'
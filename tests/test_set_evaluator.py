@@ -0,0 +1,168 @@
+import datetime
+import random
+
+from calendar_extractor import DEFAULT_PLAN
+from set_evaluator import SetEvaluator, find_windows, has_remaining, is_open, nights_of, range_days, set_dates
+
+STATUSES = ['〇', '△ 残1', '×', '×']
+
+
+def make_sets(n, seed=1):
+    rng = random.Random(seed)
+    start = datetime.date(2026, 3, 1)
+    return [{
+        'id': i,
+        'name': f'セット{i}',
+        'start_date': (start + datetime.timedelta(days=rng.randrange(60))).isoformat(),
+        'nights': rng.randint(1, 4),
+    } for i in range(n)]
+
+
+def brute_force(notification_sets, statuses):
+    return {n_set['id'] for n_set in notification_sets
+            if all(is_open(statuses.get(date_str)) for date_str, _ in nights_of(n_set))}
+
+
+def test_incremental_updates_match_full_evaluation():
+    rng = random.Random(2)
+    notification_sets = make_sets(2000)
+    evaluator = SetEvaluator()
+    statuses = {}
+    evaluator.load(notification_sets, statuses)
+    dates = sorted({date_str for _, date_str in evaluator.date_bits})
+
+    for _ in range(50):
+        events = []
+        for date_str in rng.sample(dates, 5):
+            new = rng.choice(STATUSES)
+            if statuses.get(date_str) != new:
+                events.append({'date': date_str, 'from': statuses.get(date_str), 'to': new})
+                statuses[date_str] = new
+        before = {n_set['id'] for n_set in evaluator.available_sets()}
+        flipped = {n_set['id'] for n_set in evaluator.sets_in(evaluator.apply(events))}
+        after = {n_set['id'] for n_set in evaluator.available_sets()}
+
+        assert after == brute_force(notification_sets, statuses)
+        assert flipped == before ^ after
+
+
+def test_expired_dates_leave_the_index_and_close_their_sets():
+    notification_sets = [
+        {'id': 1, 'name': '過ぎた', 'start_date': '2026-03-01', 'nights': 2},
+        {'id': 2, 'name': 'これから', 'start_date': '2026-03-10', 'nights': 1},
+        {'id': 3, 'name': '期間', 'type': 'range', 'range_start': '2026-03-01', 'range_end': '2026-03-03', 'nights': 1},
+    ]
+    statuses = {DEFAULT_PLAN: {'2026-03-01': '〇', '2026-03-02': '〇', '2026-03-03': '×', '2026-03-10': '〇'}}
+    evaluator = SetEvaluator()
+    evaluator.load(notification_sets, statuses)
+    assert len(evaluator.available_sets()) == 3
+
+    expired = [{'date': '2026-03-01', 'plan': DEFAULT_PLAN, 'from': '〇'}]
+    flipped = evaluator.expire(expired)
+    assert [n_set['id'] for n_set in evaluator.sets_in(flipped)] == [1]
+    assert (DEFAULT_PLAN, '2026-03-01') not in evaluator.date_bits
+    assert '2026-03-01' not in evaluator.statuses[DEFAULT_PLAN]
+    assert evaluator.windows[3] == ['2026-03-02']
+    assert [n_set['id'] for n_set in evaluator.available_sets()] == [2, 3]
+
+
+def test_load_rebuilds_only_when_sets_change():
+    notification_sets = make_sets(3)
+    statuses = {DEFAULT_PLAN: {date_str: '〇' for n_set in notification_sets for date_str, _ in nights_of(n_set)}}
+    evaluator = SetEvaluator()
+    assert evaluator.load(notification_sets, statuses)
+    assert not evaluator.load([dict(n_set) for n_set in notification_sets], statuses)
+    assert len(evaluator.available_sets()) == 3
+
+    notification_sets[0]['nights'] += 1
+    assert evaluator.load(notification_sets, statuses)
+    assert [n_set['id'] for n_set in evaluator.available_sets()] == [1, 2]
+    assert evaluator.target_months == sorted({(int(d[:4]), int(d[5:7])) for _, d in evaluator.date_bits})
+
+
+def test_sets_are_evaluated_against_their_own_plan():
+    day_trip = {'id': 1, 'name': '日帰り', 'plan': 'キャンプ日帰り', 'start_date': '2026-03-07', 'nights': 1}
+    overnight = {'id': 2, 'name': '宿泊', 'start_date': '2026-03-07', 'nights': 1}
+    evaluator = SetEvaluator()
+    evaluator.load([day_trip, overnight], {'キャンプ日帰り': {'2026-03-07': '〇'}, DEFAULT_PLAN: {'2026-03-07': '×'}})
+    assert [n_set['id'] for n_set in evaluator.available_sets()] == [1]
+
+    # 同じ日付でも、変化したプランのセットだけが判定し直される
+    flipped = evaluator.apply([{'date': '2026-03-07', 'plan': DEFAULT_PLAN, 'from': '×', 'to': '△ 残1'},
+                               {'date': '2026-03-07', 'plan': 'コテージ柏', 'from': '×', 'to': '〇'}])
+    assert [n_set['id'] for n_set in evaluator.sets_in(flipped)] == [2]
+    assert [n_set['id'] for n_set in evaluator.available_sets()] == [1, 2]
+    assert evaluator.target_months == [(2026, 3)]
+
+
+def test_nights_of_lists_dates_with_weekdays():
+    assert nights_of({'start_date': '2026-03-27', 'nights': 2}) == (('2026-03-27', '金'), ('2026-03-28', '土'))
+
+
+def make_range_sets(n, seed=3):
+    rng = random.Random(seed)
+    start = datetime.date(2026, 3, 1)
+    sets = []
+    for i in range(n):
+        first = start + datetime.timedelta(days=rng.randrange(40))
+        sets.append({
+            'id': 1000 + i,
+            'name': f'期間{i}',
+            'type': 'range',
+            'range_start': first.isoformat(),
+            'range_end': (first + datetime.timedelta(days=rng.randint(3, 30))).isoformat(),
+            'nights': rng.randint(1, 3),
+            'weekdays': rng.choice([[], ['金', '土'], ['土']]),
+            'min_remaining': rng.choice([1, 2]),
+        })
+    return sets
+
+
+def brute_force_windows(n_set, statuses):
+    windows = []
+    for start, weekday in range_days(n_set['range_start'], n_set['range_end']):
+        stay = nights_of({'start_date': start, 'nights': n_set['nights']})
+        if stay[-1][0] > n_set['range_end'] or (n_set['weekdays'] and weekday not in n_set['weekdays']):
+            continue
+        if all(has_remaining(statuses.get(date_str), n_set['min_remaining']) for date_str, _ in stay):
+            windows.append(start)
+    return windows
+
+
+def test_find_windows_slides_over_the_range():
+    n_set = {'id': 1, 'type': 'range', 'range_start': '2026-03-05', 'range_end': '2026-03-15',
+             'nights': 2, 'weekdays': ['金', '土'], 'min_remaining': 2}
+    statuses = {'2026-03-06': '〇', '2026-03-07': '△ 残2', '2026-03-08': '〇',
+                '2026-03-13': '△ 残1', '2026-03-14': '〇', '2026-03-15': '〇'}
+    # range_end は最後の泊。3/13(金)は残1なので候補にならず、3/8(日)は曜日が合わない
+    assert find_windows(n_set, statuses) == ['2026-03-06', '2026-03-07', '2026-03-14']
+    n_set['range_end'] = '2026-03-14'
+    assert find_windows(n_set, statuses) == ['2026-03-06', '2026-03-07']
+    assert set_dates(n_set)[0] == ('2026-03-05', '木') and len(set_dates(n_set)) == 10
+
+
+def test_range_sets_update_incrementally_with_fixed_sets():
+    rng = random.Random(4)
+    range_sets = make_range_sets(50)
+    notification_sets = make_sets(200) + range_sets
+    evaluator = SetEvaluator()
+    statuses = {}
+    evaluator.load(notification_sets, statuses)
+    dates = sorted({date_str for _, date_str in evaluator.date_bits})
+
+    for _ in range(50):
+        events = []
+        for date_str in rng.sample(dates, 8):
+            new = rng.choice(STATUSES + ['△ 残3'])
+            if statuses.get(date_str) != new:
+                events.append({'date': date_str, 'from': statuses.get(date_str), 'to': new})
+                statuses[date_str] = new
+        before = {n_set['id'] for n_set in evaluator.available_sets()}
+        flipped = {n_set['id'] for n_set in evaluator.sets_in(evaluator.apply(events))}
+        after = {n_set['id'] for n_set in evaluator.available_sets()}
+
+        expected = {n_set['id'] for n_set in range_sets if brute_force_windows(n_set, statuses)}
+        assert after == brute_force(make_sets(200), statuses) | expected
+        assert flipped == before ^ after
+        for n_set in range_sets:
+            assert evaluator.windows[n_set['id']] == brute_force_windows(n_set, statuses)
@@ -0,0 +1,188 @@
+import datetime
+import functools
+import gzip
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.parse import quote
+
+import pytest
+
+import settings_server
+from availability_events import EventLog
+from history_store import HistoryStore
+from http_cache import CachedFile
+from metrics import Metrics
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    for hour in range(5):
+        store.write_events([
+            {'date': '2026-03-27', 'from': '×', 'to': f'△ 残{hour + 1}'},
+            {'date': '2026-03-28', 'from': '×', 'to': '〇'},
+        ], observed_at=datetime.datetime(2026, 3, 1, 9 + hour, 0))
+    event_log = EventLog(str(tmp_path / 'events'))
+    event_log.append([{'date': '2026-03-27', 'plan': 'キャンプ宿泊', 'from': None, 'to': '×'}],
+                     observed_at=datetime.datetime(2026, 3, 1, 9, 0))
+    for i in range(300):
+        event_log.append([{'date': '2026-03-28', 'plan': 'キャンプ宿泊', 'from': '×', 'to': f'△ 残{i}'}],
+                         observed_at=datetime.datetime(2026, 3, 2, 9, 0, 0) + datetime.timedelta(seconds=i))
+    monkeypatch.setattr(settings_server, 'history_store', store)
+    monkeypatch.setattr(settings_server, 'event_log', event_log)
+    monkeypatch.setattr(settings_server, 'config_file', CachedFile(str(tmp_path / 'config.json'), default=b'{}'))
+
+    handler = functools.partial(settings_server.ConfigHandler, directory=settings_server.WEB_DIR)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+    store.close()
+
+
+def get(address, path, headers=None):
+    conn = http.client.HTTPConnection(*address, timeout=5)
+    conn.request('GET', path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_logs_are_paged_with_cursor(server):
+    items = []
+    cursor = ''
+    pages = 0
+    while True:
+        _, body = get(server, f'/api/logs?target_date=2026-03-27&limit=2&cursor={cursor}')
+        page = json.loads(body)
+        items.extend(page['items'])
+        pages += 1
+        if not page['next_cursor']:
+            break
+        cursor = quote(page['next_cursor'])
+    assert pages == 3
+    assert [item['status'] for item in items] == ['△ 残1', '△ 残2', '△ 残3', '△ 残4', '△ 残5']
+
+
+def test_logs_page_rejects_limits_below_one(server):
+    for limit in ('0', '-5'):
+        response, body = get(server, f'/api/logs?limit={limit}')
+        assert response.status == 400
+        assert 'limit' in json.loads(body)['error']
+    response, body = get(server, '/api/logs?limit=1')
+    assert response.status == 200 and len(json.loads(body)['items']) == 1
+
+
+def test_latest_logs_reject_counts_below_one(server):
+    for n in ('0', '-3'):
+        response, body = get(server, f'/api/logs/latest?n={n}')
+        assert response.status == 400
+        assert 'n' in json.loads(body)['error']
+    response, body = get(server, '/api/logs/latest?n=2')
+    assert response.status == 200 and len(json.loads(body)['events']) == 2
+
+
+def test_logs_stream_is_chunked_json_lines(server):
+    response, body = get(server, '/api/logs/stream?from=2026-03-01T10:00:00&plan=' + quote('キャンプ宿泊'))
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    assert len(rows) == 8
+    assert rows[0]['observed_at'] == '2026-03-01T10:00:00'
+
+
+def test_bad_cursor_is_rejected(server):
+    response, _ = get(server, '/api/logs?cursor=not-a-cursor')
+    assert response.status == 400
+
+
+def test_latest_tails_newest_file(server):
+    _, body = get(server, '/api/logs/latest?n=3')
+    events = json.loads(body)['events']
+    assert [event['to'] for event in events] == ['△ 残299', '△ 残298', '△ 残297']
+
+
+def test_config_is_answered_with_304_until_it_changes(server, tmp_path):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text('{"check_interval": 600}', encoding='utf-8')
+    response, body = get(server, '/api/config')
+    etag = response.getheader('ETag')
+    assert json.loads(body) == {'check_interval': 600}
+    assert response.getheader('Last-Modified')
+
+    response, body = get(server, '/api/config', {'If-None-Match': etag})
+    assert response.status == 304
+    assert body == b''
+
+    config_path.write_text('{"check_interval": 300}', encoding='utf-8')
+    os.utime(config_path, ns=(os.stat(config_path).st_mtime_ns + 10**9,) * 2)
+    response, body = get(server, '/api/config', {'If-None-Match': etag})
+    assert response.status == 200
+    assert json.loads(body) == {'check_interval': 300}
+
+
+def test_static_assets_are_precompressed_and_cached(server):
+    response, body = get(server, '/', {'Accept-Encoding': 'gzip'})
+    assert response.status == 200
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert response.getheader('Cache-Control') == 'no-cache'
+    assert b'/vendor/vue-2.6.11.min.js' in gzip.decompress(body)
+
+    response, body = get(server, '/vendor/vue-2.6.11.min.js')
+    assert response.getheader('Content-Encoding') is None
+    assert 'immutable' in response.getheader('Cache-Control')
+    assert body.startswith(b'/*!')
+
+    response, _ = get(server, '/vendor/vue-2.6.11.min.js', {'If-Modified-Since': response.getheader('Last-Modified')})
+    assert response.status == 304
+
+    response, _ = get(server, '/missing.js')
+    assert response.status == 404
+
+
+def test_config_post_is_validated_and_replaced_atomically(server, tmp_path, monkeypatch):
+    config_path = tmp_path / 'config.json'
+    monkeypatch.setattr(settings_server, 'CONFIG_FILE', str(config_path))
+
+    def post(payload):
+        conn = http.client.HTTPConnection(*server, timeout=5)
+        conn.request('POST', '/api/config', body=payload.encode('utf-8'),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = json.loads(response.read())
+        conn.close()
+        return response.status, body
+
+    config = {'check_interval': 600,
+              'notification_sets': [{'id': 1, 'name': 'GW', 'start_date': '2026-05-02', 'nights': 2}]}
+    assert post(json.dumps(config)) == (200, {'status': 'success'})
+    assert json.loads(config_path.read_text(encoding='utf-8')) == config
+    assert not os.path.exists(str(config_path) + '.tmp')
+
+    # 日付のおかしいセットは保存せず、前の設定を残す
+    config['notification_sets'][0]['start_date'] = '2026-13-01'
+    status, body = post(json.dumps(config))
+    assert status == 400
+    assert body['status'] == 'error'
+    assert json.loads(config_path.read_text(encoding='utf-8'))['notification_sets'][0]['start_date'] == '2026-05-02'
+
+    assert post('{broken')[0] == 400
+
+
+def test_metrics_are_served_in_prometheus_format(server, tmp_path, monkeypatch):
+    metrics_path = tmp_path / 'metrics.json'
+    monkeypatch.setattr(settings_server, 'metrics_file', CachedFile(str(metrics_path), default=b'{}'))
+    response, body = get(server, '/metrics')
+    assert response.status == 200
+    assert response.getheader('Content-type').startswith('text/plain; version=0.0.4')
+
+    metrics = Metrics(metrics_file=str(metrics_path), cycles_file=str(tmp_path / 'cycles.jsonl'))
+    metrics.observe('login', 1.2)
+    metrics.save()
+    _, body = get(server, '/metrics')
+    assert 'fumotoppara_phase_seconds_count{phase="login"} 1' in body.decode()
@@ -0,0 +1,121 @@
+import datetime
+import time
+
+import pytest
+import requests
+
+import site_login
+from mock_reserve_site import MockReserveSite, SESSION_COOKIE
+
+
+@pytest.fixture
+def site():
+    with MockReserveSite(email='me@example.com', password='pw', today=datetime.date(2026, 3, 10)) as mock:
+        yield mock
+
+
+def browser_cookies(site):
+    session = requests.Session()
+    session.post(f'{site.url}/login', data={'email': 'me@example.com', 'password': 'pw'})
+    return [{'name': SESSION_COOKIE, 'value': session.cookies[SESSION_COOKIE]}]
+
+
+class FakeDriver:
+    def __init__(self, cookies, url):
+        self.cookies = cookies
+        self.current_url = url
+        self.visited = []
+
+    def get_cookies(self):
+        return self.cookies
+
+    def get(self, url):
+        self.visited.append(url)
+        self.current_url = url
+
+
+class FakeSession:
+    """
+    BrowserSession のうち site_login が使う部分だけ（ページは読み込み済みで使い回す）
+    """
+
+    def __init__(self, driver, max_page_age=1800):
+        self.driver = driver
+        self.max_page_age = max_page_age
+        self.page_loaded_at = time.time()
+        self.page_reused = True
+        self.verified_at = None
+        self.session_expires_at = None
+        self.reloads = 0
+
+    def is_alive(self):
+        return True
+
+    def reset_page(self):
+        self.page_loaded_at = None
+
+    def ensure_calendar_page(self):
+        if self.page_loaded_at is None:
+            self.reloads += 1
+            self.page_loaded_at = time.time()
+        return self.driver
+
+
+def test_probe_distinguishes_valid_expired_and_unknown(site):
+    url = f'{site.url}/reserved/reserved-date-selection'
+    cookies = browser_cookies(site)
+    assert site_login.probe_session(cookies, url) is True
+    assert site_login.probe_session([], url) is False
+
+    site.expire_sessions()
+    assert site_login.probe_session(cookies, url) is False
+    assert site_login.probe_session(cookies, 'http://127.0.0.1:9/reserved/reserved-date-selection', timeout=1) is None
+
+
+def test_cookie_expiry_ignores_analytics_and_session_cookies():
+    cookies = [{'name': 'sid', 'value': 'a', 'expiry': 2000},
+               {'name': '_gat_UA', 'value': '1', 'expiry': 100},
+               {'name': 'XSRF-TOKEN', 'value': 'b'}]
+    assert site_login.cookie_expiry(cookies) == 2000
+    assert site_login.cookie_expiry(cookies[1:]) is None
+
+
+def test_reused_page_is_probed_and_only_confirmed_logout_logs_in(site, monkeypatch):
+    monkeypatch.setattr(site_login, 'SESSION_PROBE_URL', f'{site.url}/reserved/reserved-date-selection')
+    logins = []
+    monkeypatch.setattr(site_login, 'login', lambda driver, email, password: logins.append(email) or True)
+
+    driver = FakeDriver(browser_cookies(site), f'{site.url}/reserved/reserved-date-selection')
+    session = FakeSession(driver)
+    assert site_login.ensure_login(session, 'me@example.com', 'pw') is driver
+    assert logins == [] and session.verified_at is not None
+    requests_before = site.state()['requests']['page']
+
+    # 確認済みのうちはサーバーに問い合わせない
+    site_login.ensure_login(session, 'me@example.com', 'pw')
+    assert site.state()['requests']['page'] == requests_before
+
+    site.expire_sessions()
+    session.verified_at = None
+    site_login.ensure_login(session, 'me@example.com', 'pw')
+    assert logins == ['me@example.com']
+    assert driver.visited == [site_login.LOGIN_URL]
+    assert session.logged_in_at is not None
+
+
+def test_refresh_reloads_only_when_page_or_cookie_is_about_to_expire(site, monkeypatch):
+    monkeypatch.setattr(site_login, 'SESSION_PROBE_URL', f'{site.url}/reserved/reserved-date-selection')
+    driver = FakeDriver(browser_cookies(site), f'{site.url}/reserved/reserved-date-selection')
+    session = FakeSession(driver)
+
+    assert site_login.refresh_session(session, 'me@example.com', 'pw') is False
+    assert session.reloads == 0
+
+    session.page_loaded_at -= session.max_page_age
+    assert site_login.refresh_session(session, 'me@example.com', 'pw') is True
+    assert session.reloads == 1
+
+    driver.cookies[0]['expiry'] = time.time() + 60
+    session.verified_at = None
+    assert site_login.refresh_session(session, 'me@example.com', 'pw') is True
+    assert session.reloads == 2
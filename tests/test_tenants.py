@@ -0,0 +1,73 @@
+import tenants
+from tenants import DEFAULT_TENANT, all_notification_sets, sync_tenants, tenant_specs
+
+
+def make_config():
+    return {
+        'notification_sets': [{'id': 1, 'name': 'わが家', 'start_date': '2026-03-27', 'nights': 1}],
+        'accounts': [
+            {'name': 'tanaka', 'recipients': ['U1'],
+             'notification_sets': [{'id': 2, 'name': '田中家', 'start_date': '2026-04-03', 'nights': 2}]},
+        ],
+    }
+
+
+def test_specs_keep_top_level_sets_for_env_account(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenants, 'BASE_DIR', str(tmp_path))
+    (tmp_path / '.env.tanaka').write_text('EMAIL_ADDRESS=tanaka@example.com\nPASSWORD=secret\n', encoding='utf-8')
+
+    specs = tenant_specs(make_config(), 'me@example.com', 'pw')
+    assert [spec['name'] for spec in specs] == [DEFAULT_TENANT, 'tanaka']
+    assert specs[0]['email'] == 'me@example.com'
+    assert specs[1]['email'] == 'tanaka@example.com'
+    assert specs[1]['profile_dir'] == str(tmp_path / 'chrome_data_tanaka')
+    assert [n_set['id'] for n_set in all_notification_sets(make_config())] == [1, 2]
+
+    assert not specs[1]['lean']
+    config = make_config()
+    config['lean_browser'] = True
+    assert all(spec['lean'] for spec in tenant_specs(config, 'me@example.com', 'pw'))
+
+    # accounts がなければ従来どおり .env のアカウントだけ
+    specs = tenant_specs({'notification_sets': []}, 'me@example.com', 'pw')
+    assert [spec['name'] for spec in specs] == [DEFAULT_TENANT]
+
+
+def test_sync_reuses_tenants_until_login_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenants, 'BASE_DIR', str(tmp_path))
+    env_file = tmp_path / '.env.tanaka'
+    env_file.write_text('EMAIL_ADDRESS=tanaka@example.com\nPASSWORD=secret\n', encoding='utf-8')
+
+    first = sync_tenants({}, tenant_specs(make_config(), 'me@example.com', 'pw'))
+    tanaka = first['tanaka']
+    tanaka.previous_ok_sets.add(2)
+    assert tanaka.recipients_for(tanaka.notification_sets[0]) == ['U1']
+    assert tanaka.label('空きが出ました') == '[tanaka] 空きが出ました'
+    assert first[DEFAULT_TENANT].label('空きが出ました') == '空きが出ました'
+
+    config = make_config()
+    config['accounts'][0]['notification_sets'].append({'id': 3, 'name': '追加', 'start_date': '2026-05-01'})
+    second = sync_tenants(first, tenant_specs(config, 'me@example.com', 'pw'))
+    assert second['tanaka'] is tanaka
+    assert len(tanaka.notification_sets) == 2
+
+    env_file.write_text('EMAIL_ADDRESS=tanaka@example.com\nPASSWORD=changed\n', encoding='utf-8')
+    third = sync_tenants(second, tenant_specs(config, 'me@example.com', 'pw'))
+    assert third['tanaka'] is not tanaka
+    assert third['tanaka'].previous_ok_sets == set()
+
+    config['accounts'] = []
+    assert list(sync_tenants(third, tenant_specs(config, 'me@example.com', 'pw'))) == [DEFAULT_TENANT]
+
+
+def test_shared_changes_fan_out_to_every_tenant(tmp_path, monkeypatch):
+    monkeypatch.setattr(tenants, 'BASE_DIR', str(tmp_path))
+    synced = sync_tenants({}, tenant_specs(make_config(), 'me@example.com', 'pw'))
+    for tenant in synced.values():
+        tenant.evaluator.load(tenant.notification_sets, {})
+
+    events = [{'date': date, 'from': '×', 'to': '〇'} for date in ('2026-03-27', '2026-04-03', '2026-04-04')]
+    for tenant in synced.values():
+        tenant.evaluator.apply(events)
+    assert [n_set['id'] for n_set in synced[DEFAULT_TENANT].evaluator.available_sets()] == [1]
+    assert [n_set['id'] for n_set in synced['tanaka'].evaluator.available_sets()] == [2]